@@ -0,0 +1,92 @@
+import os
+import wave
+import subprocess
+import tracing
+
+# codecs audio que l'on peut stream-copier dans chaque conteneur (sans réencodage)
+COPY_SAFE_CODECS = {
+    ".mp3": {"mp3"},
+    ".m4a": {"aac", "alac"},
+    ".mp4": {"aac", "alac", "mp3"},
+    ".aac": {"aac"},
+    ".flac": {"flac"},
+    ".wav": {"pcm_s16le", "pcm_s24le", "pcm_s32le", "pcm_f32le", "pcm_u8"},
+    ".ogg": {"vorbis", "opus", "flac"},
+    ".opus": {"opus"},
+    ".webm": {"opus", "vorbis"},
+}
+
+# format du cache PCM : ce qu'attend l'aligneur (wav2vec2), sans rééchantillonnage de son côté
+ALIGN_SAMPLE_RATE = 16000
+
+def probe_audio_codec(path):
+    """Retourne le nom du codec du premier flux audio (ou None si ffprobe KO)."""
+    proc = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "a:0",
+         "-show_entries", "stream=codec_name",
+         "-of", "default=noprint_wrappers=1:nokey=1", path],
+        capture_output=True, text=True
+    )
+    codec = proc.stdout.strip().lower()
+    return codec if proc.returncode == 0 and codec else None
+
+def _seek_args(start_s):
+    # -ss avant -i : seek dans le demuxer, seule la fenêtre demandée est lue/décodée
+    return ["-ss", f"{start_s:.6f}"] if start_s > 0 else []
+
+def _duration_args(start_s, end_s):
+    # après un seek en entrée les timestamps repartent de 0 : on passe une durée, pas -to
+    if end_s is None or end_s == -1:
+        return []
+    return ["-t", f"{max(0.0, end_s - max(0.0, start_s)):.6f}"]
+
+def trim_audio(src, dst, start_s=0.0, end_s=-1, stream_copy=True):
+    """
+    Découpe [start_s, end_s] de `src` vers `dst` avec ffmpeg (end_s = -1 : jusqu'à la fin).
+    - stream copy si le codec source est compatible avec le conteneur de dst (aucune perte, quasi instantané)
+    - sinon (ou si la copie échoue) : décodage/réencodage de la fenêtre seulement
+    Lève RuntimeError si ffmpeg échoue dans les deux cas.
+    """
+    window = _seek_args(start_s)
+    duration = _duration_args(start_s, end_s)
+    ext = os.path.splitext(dst)[1].lower()
+
+    if stream_copy and probe_audio_codec(src) in COPY_SAFE_CODECS.get(ext, ()):
+        cmd = ["ffmpeg", "-y", "-v", "error", *window, "-i", src, *duration,
+               "-map", "0:a:0", "-c:a", "copy", dst]
+        with tracing.current().subprocess("ffmpeg trim (copy)", cmd):
+            proc = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="replace")
+        if proc.returncode == 0 and os.path.isfile(dst) and os.path.getsize(dst) > 0:
+            return dst
+        print("[audio] stream copy impossible, réencodage de la fenêtre :", proc.stderr.strip()[-500:])
+
+    cmd = ["ffmpeg", "-y", "-v", "error", *window, "-i", src, *duration,
+           "-map", "0:a:0", "-q:a", "0", dst]
+    with tracing.current().subprocess("ffmpeg trim (réencodage)", cmd):
+        proc = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg n'a pas pu découper {src} : {proc.stderr.strip()[-500:]}")
+    return dst
+
+def decode_pcm(src, dst, sample_rate=ALIGN_SAMPLE_RATE):
+    """
+    Décode `src` une seule fois en wav PCM 16 bits mono à sample_rate (cache pour l'aligneur).
+    Retourne la durée exacte en secondes (nombre d'échantillons décodés).
+    """
+    cmd = ["ffmpeg", "-y", "-v", "error", "-i", src, "-map", "0:a:0",
+           "-ac", "1", "-ar", str(sample_rate), "-c:a", "pcm_s16le", dst]
+    with tracing.current().subprocess("ffmpeg décodage PCM", cmd):
+        proc = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg n'a pas pu décoder {src} : {proc.stderr.strip()[-500:]}")
+    return wav_duration(dst)
+
+def wav_duration(path):
+    with wave.open(path, "rb") as w:
+        return w.getnframes() / float(w.getframerate())
+
+def mux_audio_args(audio_path, container_ext=".mp4"):
+    """Options ffmpeg pour l'audio du mux : copie si le codec va dans le conteneur, sinon AAC."""
+    if probe_audio_codec(audio_path) in COPY_SAFE_CODECS.get(container_ext, ()):
+        return ["-c:a", "copy"]
+    return ["-c:a", "aac", "-b:a", "192k"]
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for main.py (cold start guard).
+
+    python benchmarks/bench_import.py            # measure and compare with the baseline
+    python benchmarks/bench_import.py --update   # store the current timing as the baseline
+
+Fails (exit 1) if `import main` gets slower than baseline * tolerance, or if a heavy
+dependency (torch, librosa, av, ...) is imported before the window can be shown.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_baseline.json")
+DEFAULT_TOLERANCE = 1.5
+
+# must never be loaded by `import main`
+FORBIDDEN = ("torch", "forcealign", "num2words", "librosa", "numba", "scipy", "av", "yt_dlp", "numpy", "PIL")
+
+def measure_import_ms(module="main"):
+    """Cumulative import time of `module` in a fresh interpreter, via -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    for line in proc.stderr.splitlines():
+        # "import time:      self [us] |  cumulative | imported package"
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000.0
+    raise RuntimeError(f"no importtime entry for {module}")
+
+def loaded_heavy_modules(module="main"):
+    code = (
+        f"import sys, json, {module}\n"
+        f"print(json.dumps(sorted(m for m in {FORBIDDEN!r} if m in sys.modules)))"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip())
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--update", action="store_true", help="write the measured time as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    # best of N: the first run also pays for .pyc compilation and a cold disk cache
+    ms = min(measure_import_ms() for _ in range(args.runs))
+    heavy = loaded_heavy_modules()
+    print(json.dumps({"main_import_ms": round(ms, 1), "heavy_modules_loaded": heavy}, indent=2))
+
+    if args.update:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump({"main_import_ms": round(ms, 1), "tolerance": args.tolerance or DEFAULT_TOLERANCE}, f, indent=2)
+        print(f"baseline written to {BASELINE_PATH}")
+        return 0
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        tolerance = args.tolerance or baseline.get("tolerance", DEFAULT_TOLERANCE)
+        limit = baseline["main_import_ms"] * tolerance
+        if ms > limit:
+            print(f"FAIL: import main took {ms:.1f} ms > {limit:.1f} ms (baseline x{tolerance})")
+            failed = True
+    else:
+        print("no baseline yet, run with --update to create one")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
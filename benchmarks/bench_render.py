@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Render benchmarks on synthetic fixtures: layout, frame drawing, lyric video, alignment, overlay.
+
+    python benchmarks/bench_render.py                       # run every case, compare with the baseline
+    python benchmarks/bench_render.py --update              # store the results as the new baseline
+    python benchmarks/bench_render.py --case draw_text_frame --out report.json
+
+Fixtures (a speech-like tone track, long and emoji-heavy transcripts with their LRC, a test-pattern
+background clip) are generated once in benchmarks/.fixtures from a fixed seed.
+Each case runs in its own interpreter so that its peak RSS is its own. Cases whose dependencies are
+missing (av, forcealign, ffmpeg) are reported as skipped. Fails (exit 1) if a case gets slower than
+baseline * tolerance.
+"""
+import os
+import sys
+import json
+import time
+import wave
+import shutil
+import platform
+import argparse
+import subprocess
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, ".fixtures")
+BASELINE_PATH = os.path.join(BENCH_DIR, "render_baseline.json")
+DEFAULT_TOLERANCE = 1.3
+FIXTURES_VERSION = 1
+
+SONG_SECONDS = 60.0
+SAMPLE_RATE = 22050
+BG_SECONDS = 20
+FPS = 30
+DRAW_FRAMES = 200
+
+VOCABULARY = (
+    "je te vois danser sous la pluie du soir et les lumieres de la ville brillent encore pour nous "
+    "quand la nuit tombe on chante plus fort que le vent qui souffle sur nos coeurs"
+).split()
+EMOJIS = ("😀", "🎶", "🔥", "❤️", "✨", "🌙")
+
+# ========== FIXTURES ==========
+def _write_wav(path, rng):
+    """Speech-like mono track: a vibrato voice with harmonics, syllables at ~4 Hz, pauses between phrases."""
+    import numpy as np
+    t = np.arange(int(SONG_SECONDS * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 180 + 30 * np.sin(2 * np.pi * 0.3 * t) + 6 * np.sin(2 * np.pi * 5.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    syllables = np.clip(np.sin(2 * np.pi * 4.0 * t), 0, None) ** 0.5
+    phrases = (np.sin(2 * np.pi * t / 6.0) > -0.6).astype(np.float64)
+    noise = 0.02 * rng.standard_normal(t.size)
+    signal = 0.3 * voice / 2.3 * syllables * phrases + noise
+    pcm = (np.clip(signal, -1, 1) * 32767).astype("<i2")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(pcm.tobytes())
+
+def _transcript(rng, n_words, emoji_every=0):
+    words = []
+    for i in range(n_words):
+        if emoji_every and i % emoji_every == emoji_every - 1:
+            words.append(EMOJIS[int(rng.integers(len(EMOJIS)))])
+        else:
+            words.append(VOCABULARY[int(rng.integers(len(VOCABULARY)))])
+    return words
+
+def _write_lyrics(base, words, rng):
+    """Transcript + LRC (and its .lrt sidecar) with word timings spread over the song, gaps between phrases."""
+    import numpy as np
+    sys.path.insert(0, ROOT)
+    from timings import timings_path, write_timings
+
+    durations = rng.uniform(0.15, 0.45, len(words))
+    gaps = np.where(np.arange(len(words)) % 8 == 7, rng.uniform(0.8, 2.0, len(words)), 0.05)
+    starts = np.concatenate([[0.5], np.cumsum(durations + gaps)[:-1] + 0.5])
+    starts *= (SONG_SECONDS - 2.0) / starts[-1]
+    ends = np.minimum(starts + durations, np.append(starts[1:], SONG_SECONDS))
+
+    with open(base + ".txt", "w", encoding="utf-8") as f:
+        f.write("\n".join(" ".join(words[i:i + 8]) for i in range(0, len(words), 8)))
+    with open(base + ".lrc", "w", encoding="utf-8") as f:
+        for start, word in zip(starts, words):
+            minutes = int(start // 60)
+            seconds = start - minutes * 60
+            f.write(f"[{minutes:02d}:{seconds:05.2f}]{word}\n")
+    write_timings(timings_path(base + ".lrc"), starts, ends, words)
+
+def _ffmpeg(args):
+    subprocess.run(["ffmpeg", "-y", "-v", "error", *args], check=True)
+
+def build_fixtures(fixtures_dir=FIXTURES_DIR):
+    """Generate the fixtures once (a stamp file records the fixture version)."""
+    import numpy as np
+    stamp = os.path.join(fixtures_dir, f"fixtures.v{FIXTURES_VERSION}")
+    if os.path.exists(stamp):
+        return fixtures_dir
+    os.makedirs(fixtures_dir, exist_ok=True)
+    rng = np.random.default_rng(0)
+
+    _write_wav(os.path.join(fixtures_dir, "song.wav"), rng)
+    _write_lyrics(os.path.join(fixtures_dir, "long"), _transcript(rng, 600), rng)
+    _write_lyrics(os.path.join(fixtures_dir, "emoji"), _transcript(rng, 200, emoji_every=3), rng)
+
+    if shutil.which("ffmpeg"):
+        _ffmpeg(["-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate={FPS}",
+                 "-f", "lavfi", "-i", "sine=frequency=220:sample_rate=44100",
+                 "-t", str(BG_SECONDS), "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+                 "-c:a", "aac", os.path.join(fixtures_dir, "bg.mp4")])
+        # green-screen foreground with a moving box, stands in for a lyric video
+        _ffmpeg(["-f", "lavfi", "-i", f"color=c=0x00ff00:size=1080x1080:rate={FPS}",
+                 "-vf", "drawbox=x='mod(n*8,900)':y=400:w=180:h=180:color=black:t=fill",
+                 "-t", str(BG_SECONDS), "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+                 os.path.join(fixtures_dir, "fg.mp4")])
+
+    open(stamp, "w").close()
+    return fixtures_dir
+
+# ========== CASES ==========
+# each case returns a dict of metrics and must include "seconds" (the compared value)
+
+def _layout(name, fixtures_dir, runs=3):
+    import generate_vid
+    words = generate_vid.load_lyric_words(os.path.join(fixtures_dir, name + ".lrc"))
+    font = generate_vid.load_font()
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        layout = generate_vid.layout_text(words, font)
+        best = min(best, time.perf_counter() - t0)
+    return words, font, layout, best
+
+def case_layout_text_long(fixtures_dir):
+    words, _, layout, seconds = _layout("long", fixtures_dir)
+    return {"seconds": seconds, "words": len(words), "pages": len(layout[2])}
+
+def case_layout_text_emoji(fixtures_dir):
+    words, _, layout, seconds = _layout("emoji", fixtures_dir)
+    return {"seconds": seconds, "words": len(words), "pages": len(layout[2])}
+
+def _draw(fixtures_dir, mode):
+    import numpy as np
+    import generate_vid
+    _, font, (word_positions, text_lines, pages), _ = _layout("long", fixtures_dir, runs=1)
+    times = np.linspace(0.0, SONG_SECONDS, DRAW_FRAMES)
+    cache = {}
+    t0 = time.perf_counter()
+    for t in times:
+        if mode == "highlight":
+            generate_vid.draw_highlight_frame(word_positions, text_lines, pages, t, font, 7, cache)
+        elif mode == "planes":
+            generate_vid.draw_text_planes(word_positions, text_lines, pages, t, font, 7)
+        else:
+            generate_vid.draw_text_frame(word_positions, text_lines, pages, t, font, 7)
+    seconds = time.perf_counter() - t0
+    return {"seconds": seconds, "frames": DRAW_FRAMES, "ms_per_frame": 1000 * seconds / DRAW_FRAMES,
+            "fps": DRAW_FRAMES / seconds}
+
+def case_draw_text_frame(fixtures_dir):
+    return _draw(fixtures_dir, "rgb")
+
+def case_draw_text_planes(fixtures_dir):
+    return _draw(fixtures_dir, "planes")
+
+def case_draw_highlight_frame(fixtures_dir):
+    return _draw(fixtures_dir, "highlight")
+
+def _lyrics_video(fixtures_dir, tmp_dir, **kwargs):
+    import generate_vid
+    lrc = os.path.join(tmp_dir, "long.lrc")
+    for ext in (".lrc", ".lrt"):
+        shutil.copy(os.path.join(fixtures_dir, "long" + ext), os.path.join(tmp_dir, "long" + ext))
+    out_path = os.path.join(tmp_dir, "lyrics.mp4")
+    events = []
+    t0 = time.perf_counter()
+    generate_vid.generate_lyrics_video(os.path.join(fixtures_dir, "song.wav"), lrc, out_path, fps=FPS,
+                                       font_gui="COMICBD", on_progress=events.append, **kwargs)
+    seconds = time.perf_counter() - t0
+    frames = events[-1]["frame"] if events else 0
+    return {"seconds": seconds, "frames": frames, "fps": frames / seconds}
+
+def case_generate_lyrics_video(fixtures_dir, tmp_dir):
+    return _lyrics_video(fixtures_dir, tmp_dir)
+
+def case_generate_lyrics_video_preview(fixtures_dir, tmp_dir):
+    return _lyrics_video(fixtures_dir, tmp_dir, preview=True)
+
+def case_generate_lrc(fixtures_dir, tmp_dir):
+    from force_align import generate_lrc
+    transcript = os.path.join(tmp_dir, "long.txt")
+    shutil.copy(os.path.join(fixtures_dir, "long.txt"), transcript)
+    t0 = time.perf_counter()
+    generate_lrc(os.path.join(fixtures_dir, "song.wav"), transcript, os.path.join(tmp_dir, "long.lrc"))
+    return {"seconds": time.perf_counter() - t0, "audio_seconds": SONG_SECONDS}
+
+def case_overlay_chroma(fixtures_dir, tmp_dir):
+    import chroma_video
+    t0 = time.perf_counter()
+    rc, log = chroma_video.overlay_chroma(os.path.join(fixtures_dir, "bg.mp4"), os.path.join(fixtures_dir, "fg.mp4"),
+                                          os.path.join(tmp_dir, "final.mp4"), start_time=0, speed=1.0)
+    seconds = time.perf_counter() - t0
+    if rc != 0:
+        raise RuntimeError(f"ffmpeg failed ({rc}), see {log}")
+    return {"seconds": seconds, "frames": BG_SECONDS * FPS, "fps": BG_SECONDS * FPS / seconds}
+
+# name -> (function, required modules, needs ffmpeg, needs a temp dir)
+CASES = {
+    "layout_text_long": (case_layout_text_long, ("numpy", "PIL"), False, False),
+    "layout_text_emoji": (case_layout_text_emoji, ("numpy", "PIL"), False, False),
+    "draw_text_frame": (case_draw_text_frame, ("numpy", "PIL"), False, False),
+    "draw_text_planes": (case_draw_text_planes, ("numpy", "PIL"), False, False),
+    "draw_highlight_frame": (case_draw_highlight_frame, ("numpy", "PIL"), False, False),
+    "generate_lyrics_video": (case_generate_lyrics_video, ("numpy", "PIL", "av"), True, True),
+    "generate_lyrics_video_preview": (case_generate_lyrics_video_preview, ("numpy", "PIL", "av"), True, True),
+    "generate_lrc": (case_generate_lrc, ("forcealign", "num2words"), False, True),
+    "overlay_chroma": (case_overlay_chroma, (), True, True),
+}
+
+def missing_requirements(name):
+    _, modules, needs_ffmpeg, _ = CASES[name]
+    missing = [m for m in modules if importlib.util.find_spec(m) is None]
+    if needs_ffmpeg and not shutil.which("ffmpeg"):
+        missing.append("ffmpeg")
+    return missing
+
+def _peak_rss_mb(children=False):
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    kb = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KiB, macOS: bytes
+    return round(kb / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _run_case_child(name, fixtures_dir):
+    """Child process side: run one case and print its metrics as the last line of stdout."""
+    import tempfile
+    sys.path.insert(0, ROOT)
+    func, _, _, needs_tmp = CASES[name]
+    if needs_tmp:
+        with tempfile.TemporaryDirectory(prefix="bench_") as tmp_dir:
+            metrics = func(fixtures_dir, tmp_dir)
+    else:
+        metrics = func(fixtures_dir)
+    metrics["peak_rss_mb"] = _peak_rss_mb()
+    # ffmpeg and other subprocesses
+    metrics["children_peak_rss_mb"] = _peak_rss_mb(children=True)
+    print(json.dumps(metrics))
+
+def run_case(name, fixtures_dir):
+    missing = missing_requirements(name)
+    if missing:
+        return {"skipped": "missing " + ", ".join(missing)}
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-case", name,
+                           "--fixtures", fixtures_dir], cwd=ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit code {proc.returncode}"
+        return {"error": tail}
+    metrics = json.loads(proc.stdout.strip().splitlines()[-1])
+    # includes interpreter start-up and imports, unlike "seconds"
+    metrics["wall_seconds"] = wall
+    return {name: round(v, 4) if isinstance(v, float) else v for name, v in metrics.items()}
+
+def machine_info():
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()}
+
+def compare(results, baseline, tolerance=None):
+    """List of regression messages (cases slower than baseline * tolerance)."""
+    failures = []
+    for name, metrics in results.items():
+        base = baseline.get("cases", {}).get(name)
+        if not base or "seconds" not in metrics or "seconds" not in base:
+            continue
+        limit = base["seconds"] * (tolerance or baseline.get("tolerance", DEFAULT_TOLERANCE))
+        if metrics["seconds"] > limit:
+            failures.append(f"{name}: {metrics['seconds']:.3f}s > {limit:.3f}s (baseline {base['seconds']:.3f}s)")
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="run only this case (repeatable)")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    parser.add_argument("--update", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=None)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help=argparse.SUPPRESS)
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        _run_case_child(args.run_case, args.fixtures)
+        return 0
+
+    build_fixtures(args.fixtures)
+    results = {name: run_case(name, args.fixtures) for name in (args.case or CASES)}
+    report = {"machine": machine_info(), "cases": results}
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.update:
+        measured = {name: m for name, m in results.items() if "seconds" in m}
+        baseline = {"machine": machine_info(), "tolerance": args.tolerance or DEFAULT_TOLERANCE, "cases": {}}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+                baseline["cases"] = json.load(f).get("cases", {})
+        baseline["cases"].update(measured)
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"baseline written to {BASELINE_PATH}")
+        return 0
+
+    failed = False
+    for name, metrics in results.items():
+        if "error" in metrics:
+            print(f"FAIL: {name}: {metrics['error']}")
+            failed = True
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("machine", {}).get("cpus") != os.cpu_count():
+            print("warning: the baseline was recorded on a different machine")
+        for message in compare(results, baseline, args.tolerance):
+            print("FAIL: " + message)
+            failed = True
+    else:
+        print("no baseline yet, run with --update to create one")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,9 @@ import subprocess
 import os
 import tempfile
 import shlex
+import threading
+from collections import deque
+import tracing
 
 # ====== DEFAULT CONFIG ======
 BG_COLOR = "00ff00"
@@ -13,18 +16,91 @@ DEFAULT_SPEED = 1.25
 DEFAULT_CRF = 18
 DEFAULT_PRESET = "ultrafast"
 DEFAULT_ENCODER = "libx264"
+LOG_RING_LINES = 200  # nb de lignes stderr ffmpeg conservées dans le log
 
-def run_cmd(cmd):
-    """Run a command and stream stderr (logging dans /tmp)."""
+def _ffmpeg_progress_args(cmd):
+    """Ajoute `-progress pipe:1 -nostats` juste après 'ffmpeg' (si absent)."""
+    if not cmd or os.path.basename(cmd[0]).split('.')[0] != 'ffmpeg' or '-progress' in cmd:
+        return list(cmd)
+    return [cmd[0], '-progress', 'pipe:1', '-nostats'] + list(cmd[1:])
+
+def _progress_event(block, total_duration):
+    """Convertit un bloc clé=valeur de `-progress` en événement frame/time/speed/percent/eta."""
+    try:
+        frame = int(block.get('frame', 0))
+    except ValueError:
+        frame = 0
+    # out_time_us (out_time_ms est aussi en µs, bug historique de ffmpeg)
+    raw_us = block.get('out_time_us') or block.get('out_time_ms') or '0'
+    try:
+        out_time = max(0.0, int(raw_us) / 1_000_000)
+    except ValueError:
+        out_time = 0.0
+    try:
+        speed = float(block.get('speed', '0').rstrip('x'))
+    except ValueError:
+        speed = 0.0
+
+    percent = None
+    eta = None
+    if total_duration:
+        percent = min(100.0, 100.0 * out_time / total_duration)
+        if speed > 0:
+            eta = max(0.0, (total_duration - out_time) / speed)
+    if block.get('progress') == 'end':
+        percent = 100.0 if total_duration else percent
+        eta = 0.0
+    return {
+        'frame': frame,
+        'time': out_time,
+        'speed': speed,
+        'percent': percent,
+        'eta': eta,
+        'done': block.get('progress') == 'end',
+    }
+
+def run_cmd(cmd, on_progress=None, total_duration=None, log_lines=LOG_RING_LINES):
+    """
+    Lance ffmpeg et lit la progression structurée (`-progress pipe:1`) au lieu de scraper stderr.
+    - on_progress(event) reçoit des dicts {frame, time, speed, percent, eta, done}
+    - stderr est gardé dans un buffer circulaire (log_lines dernières lignes), écrit dans /tmp à la fin
+    """
+    cmd = _ffmpeg_progress_args(cmd)
     logpath = os.path.join(tempfile.gettempdir(), f"ffmpeg_overlay_log_{os.getpid()}.txt")
-    with open(logpath, 'w', encoding='utf-8') as flog:
+    stderr_tail = deque(maxlen=log_lines)
+
+    with tracing.current().subprocess("ffmpeg", cmd):
         proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                        text=True, encoding='utf-8', errors='replace', bufsize=1)
-        # stream stderr lines to stdout and log file
-        for line in proc.stderr:
-            print(line.rstrip())
-            flog.write(line)
+                                text=True, encoding='utf-8', errors='replace', bufsize=1)
+
+        # stderr drainé dans un thread pour ne pas bloquer ffmpeg (pipe plein)
+        drain = threading.Thread(target=stderr_tail.extend, args=(proc.stderr,), daemon=True)
+        drain.start()
+
+        block = {}
+        try:
+            for line in proc.stdout:
+                key, sep, value = line.strip().partition('=')
+                if not sep:
+                    continue
+                block[key] = value
+                if key == 'progress':
+                    if on_progress is not None:
+                        on_progress(_progress_event(block, total_duration))
+                    block = {}
+        except BaseException:
+            # le callback peut lever (annulation) : on ne laisse pas ffmpeg tourner seul
+            proc.kill()
+            proc.wait()
+            raise
         proc.wait()
+        drain.join()
+
+    with open(logpath, 'w', encoding='utf-8') as flog:
+        flog.writelines(stderr_tail)
+    if proc.returncode != 0:
+        # en cas d'échec on affiche la fin du log (déjà bornée)
+        print(''.join(stderr_tail).rstrip())
     return proc.returncode, logpath
 
 def get_video_info(path):
@@ -66,26 +142,8 @@ def _is_audio_copy_safe(fg_path):
     codec = out.strip().lower()
     return codec in ("aac", "mp3", "opus", "vorbis")  # codecs que l'on peut généralement copier ou garder
 
-def overlay_chroma(bg_path, fg_path, out_path,
-                   start_time=DEFAULT_START, speed=DEFAULT_SPEED,
-                   similarity=DEFAULT_SIMILARITY, blend=DEFAULT_BLEND,
-                   bg_color=BG_COLOR, crf=DEFAULT_CRF, preset=DEFAULT_PRESET,
-                   encoder=DEFAULT_ENCODER, short_bg_action='extend_freeze',
-                   copy_audio_if_possible=True):
-    """
-    Overlay fg on bg with chroma key.
-    Optimisations pour la vitesse:
-      - preset ultrafast (par défaut)
-      - threads auto (-threads 0)
-      - filter_complex_threads 0 (parallélise les filtres)
-      - copie audio si possible pour éviter réencodage audio
-    Paramètre `encoder` permet d'indiquer un encodeur matériel (ex: 'h264_nvenc').
-    """
-
-    # Get video info
-    fg_dur, fg_fps, fg_w, fg_h = get_video_info(fg_path)
-    bg_total_dur, bg_fps, main_w, main_h = get_video_info(bg_path)
-
+def _bg_chain(bg_total_dur, fg_dur, start_time, speed, short_bg_action):
+    """Filtres du fond : extrait à partir de start_time, ralenti par speed, rallongé si trop court, durée du fg."""
     # Calculate available portion
     available_source = max(0.0, bg_total_dur - start_time)
     required_source_needed = fg_dur * speed
@@ -108,6 +166,60 @@ def overlay_chroma(bg_path, fg_path, out_path,
     # Après les trims, on adapte la vitesse du background pour produire exactement la durée du foreground.
     # On remet la durée finale sur fg_dur pour être certain.
     bg_chain += f",setpts=PTS/{speed},trim=duration={fg_dur:.6f},setpts=PTS-STARTPTS"
+    return bg_chain
+
+def _audio_args(fg_path, copy_audio_if_possible=True):
+    """Audio pris dans le fg : copié si possible pour éviter un réencodage, sinon AAC."""
+    try:
+        if copy_audio_if_possible and _is_audio_copy_safe(fg_path):
+            return ['-c:a', 'copy']
+    except Exception:
+        # en cas d'erreur d'inspection, on réencode pour garder la robustesse
+        pass
+    # on réencode en AAC (moins cher que certaines conversions)
+    return ['-c:a', 'aac', '-b:a', '192k']
+
+def _encoder_args(encoder, preset, crf, bitrate=None):
+    """
+    Options de l'encodeur vidéo. bitrate ("6M", ...) : débit visé (maxrate = bitrate, buffer 2x)
+    au lieu du crf.
+    """
+    args = ['-c:v', encoder]
+    # si libx264, on applique le preset rapide
+    if encoder.lower() in ('libx264', 'libx265', 'x264'):
+        args += ['-preset', preset]
+    if bitrate:
+        value = str(bitrate)
+        number = float(value.rstrip('kKmM'))
+        unit = value[len(value.rstrip('kKmM')):]
+        args += ['-b:v', value, '-maxrate', value, '-bufsize', f"{number * 2:g}{unit}"]
+    else:
+        # pour l'accélération matérielle le crf peut être ignoré selon l'encodeur
+        args += ['-crf', str(crf)]
+    return args
+
+def overlay_chroma(bg_path, fg_path, out_path,
+                   start_time=DEFAULT_START, speed=DEFAULT_SPEED,
+                   similarity=DEFAULT_SIMILARITY, blend=DEFAULT_BLEND,
+                   bg_color=BG_COLOR, crf=DEFAULT_CRF, preset=DEFAULT_PRESET,
+                   encoder=DEFAULT_ENCODER, short_bg_action='extend_freeze',
+                   copy_audio_if_possible=True, on_progress=None):
+    """
+    Overlay fg on bg with chroma key.
+    Optimisations pour la vitesse:
+      - preset ultrafast (par défaut)
+      - threads auto (-threads 0)
+      - filter_complex_threads 0 (parallélise les filtres)
+      - copie audio si possible pour éviter réencodage audio
+    Paramètre `encoder` permet d'indiquer un encodeur matériel (ex: 'h264_nvenc').
+    `on_progress` reçoit les événements de progression de run_cmd (durée totale = durée du fg).
+    """
+
+    # Get video info
+    fg_dur, fg_fps, fg_w, fg_h = get_video_info(fg_path)
+    bg_total_dur, bg_fps, main_w, main_h = get_video_info(bg_path)
+
+    bg_chain = _bg_chain(bg_total_dur, fg_dur, start_time, speed, short_bg_action)
 
     # Scale filter conservé : on scale le foreground pour qu'il tienne dans la résolution du bg (même logique que toi).
     main_ratio = float(main_w) / float(main_h) if main_h != 0 else 1.0
@@ -144,35 +256,11 @@ def overlay_chroma(bg_path, fg_path, out_path,
     ]
 
     # Audio handling: essayer de copy si possible pour éviter réencodage (plus rapide)
-    audio_copied = False
-    if copy_audio_if_possible:
-        try:
-            if _is_audio_copy_safe(fg_path):
-                cmd += ['-map', '1:a?', '-c:a', 'copy']
-                audio_copied = True
-            else:
-                # on map audio et on le réencode en AAC (moins cher que certaines conversions)
-                cmd += ['-map', '1:a?', '-c:a', 'aac', '-b:a', '192k']
-        except Exception:
-            # en cas d'erreur d'inspection, on réencode pour garder la robustesse
-            cmd += ['-map', '1:a?', '-c:a', 'aac', '-b:a', '192k']
-    else:
-        # on garde le comportement original (réencode en AAC)
-        cmd += ['-map', '1:a?', '-c:a', 'aac', '-b:a', '192k']
+    cmd += ['-map', '1:a?'] + _audio_args(fg_path, copy_audio_if_possible)
 
     # Video encoder selection: par défaut libx264 + preset ultrafast (très rapide).
     # Si l'utilisateur a passé un encodeur hardware (ex: h264_nvenc), il sera utilisé.
-    cmd += ['-c:v', encoder]
-
-    # si libx264, on applique le preset rapide et le crf
-    if encoder.lower() in ('libx264', 'libx265', 'x264'):
-        cmd += ['-preset', preset, '-crf', str(crf)]
-    else:
-        # pour accélération matérielle, on met des flags sûrs (éviter flags inconnus qui cassent)
-        # On met quand même le crf en option (peut être ignoré selon l'encodeur).
-        cmd += ['-crf', str(crf)]
-        # Note: si tu veux affiner les presets nvenc/vaapi, passe directement encoder='h264_nvenc'
-        # et modifie ici selon ton matériel.
+    cmd += _encoder_args(encoder, preset, crf)
 
     # accélération du démarrage pour web players
     cmd += ['-movflags', '+faststart']
@@ -183,7 +271,104 @@ def overlay_chroma(bg_path, fg_path, out_path,
     # Debug: affiche la commande (utile pour debug/optimisation)
     print("ffmpeg command:", " ".join(shlex.quote(x) for x in cmd))
 
-    return run_cmd(cmd)
+    return run_cmd(cmd, on_progress=on_progress, total_duration=fg_dur)
+
+
+def overlay_chroma_multi(bg_path, renditions,
+                         start_time=DEFAULT_START, speed=DEFAULT_SPEED,
+                         similarity=DEFAULT_SIMILARITY, blend=DEFAULT_BLEND,
+                         bg_color=BG_COLOR, crf=DEFAULT_CRF, preset=DEFAULT_PRESET,
+                         encoder=DEFAULT_ENCODER, short_bg_action='extend_freeze',
+                         copy_audio_if_possible=True, on_progress=None):
+    """
+    Plusieurs sorties en un seul passage ffmpeg : le fond est décodé et préparé une fois puis
+    dupliqué (split) vers chaque géométrie, recadré pour la remplir ; chaque fg (un par géométrie)
+    est incrusté une fois, et le résultat encodé pour chaque débit demandé.
+    renditions : [{"fg_path", "out_path", "size": (w, h), "bitrate": None ou "6M"}] ; les
+    renditions de même fg partagent la composition.
+    Mêmes options et retour (rc, log) qu'overlay_chroma.
+    """
+    fg_paths = list(dict.fromkeys(r["fg_path"] for r in renditions))
+    fg_dur = get_video_info(fg_paths[0])[0]
+    bg_total_dur = get_video_info(bg_path)[0]
+    bg_chain = _bg_chain(bg_total_dur, fg_dur, start_time, speed, short_bg_action)
+
+    graph = [f"[0:v]{bg_chain},split={len(fg_paths)}" + "".join(f"[bg{i}]" for i in range(len(fg_paths)))]
+    outputs = {}
+    for i, fg_path in enumerate(fg_paths):
+        users = [r for r in renditions if r["fg_path"] == fg_path]
+        w, h = users[0]["size"]
+        graph.append(f"[bg{i}]scale={w}:{h}:force_original_aspect_ratio=increase,crop={w}:{h},setsar=1[bgc{i}]")
+        graph.append(
+            f"[{i + 1}:v]scale={w}:{h}:force_original_aspect_ratio=decrease,"
+            f"chromakey=0x{bg_color}:{similarity}:{blend},format=rgba[fg{i}]"
+        )
+        labels = [f"out{i}_{k}" for k in range(len(users))]
+        graph.append(
+            f"[bgc{i}][fg{i}]overlay=(main_w-overlay_w)/2:(main_h-overlay_h)/2:shortest=1,"
+            f"split={len(users)}" + "".join(f"[{label}]" for label in labels)
+        )
+        outputs.update({id(r): label for r, label in zip(users, labels)})
+
+    cmd = ['ffmpeg', '-y', '-threads', '0', '-filter_complex_threads', '0', '-i', bg_path]
+    for fg_path in fg_paths:
+        cmd += ['-i', fg_path]
+    cmd += ['-filter_complex', ";".join(graph)]
+    audio = _audio_args(fg_paths[0], copy_audio_if_possible)
+    for r in renditions:
+        cmd += ['-map', f"[{outputs[id(r)]}]", '-map', '1:a?'] + audio
+        cmd += _encoder_args(encoder, preset, crf, r.get("bitrate"))
+        cmd += ['-movflags', '+faststart', '-shortest', r["out_path"]]
+
+    print("ffmpeg command:", " ".join(shlex.quote(x) for x in cmd))
+    return run_cmd(cmd, on_progress=on_progress, total_duration=fg_dur)
+
+
+def _filter_escape(value):
+    """Valeur d'option de filtre : échappée pour le parseur d'options puis pour celui du graphe."""
+    value = value.replace("\\", "/")  # chemins Windows
+    for ch in "\\':":
+        value = value.replace(ch, "\\" + ch)
+    for ch in "\\'[],;":
+        value = value.replace(ch, "\\" + ch)
+    return value
+
+def burn_subtitles(ass_path, audio_path, out_path, duration, size, fps=30, bg_path=None,
+                   start_time=DEFAULT_START, speed=DEFAULT_SPEED, bg_color=BG_COLOR,
+                   crf=DEFAULT_CRF, preset=DEFAULT_PRESET, encoder=DEFAULT_ENCODER,
+                   short_bg_action='extend_freeze', fonts_dir=None,
+                   copy_audio_if_possible=True, on_progress=None):
+    """
+    Incruste un script ASS (libass, filtre subtitles) en un seul passage ffmpeg, sans vidéo de
+    paroles intermédiaire : sur le fond (mêmes extrait/vitesse qu'overlay_chroma, recadré à size)
+    ou, sans fond, sur une couleur unie bg_color (la sortie reste incrustable).
+    L'audio vient de audio_path. Retour (rc, log) comme overlay_chroma.
+    """
+    w, h = size
+    subtitles = f"subtitles=filename={_filter_escape(ass_path)}"
+    if fonts_dir:
+        subtitles += f":fontsdir={_filter_escape(fonts_dir)}"
+
+    if bg_path:
+        bg_total_dur = get_video_info(bg_path)[0]
+        bg_chain = _bg_chain(bg_total_dur, duration, start_time, speed, short_bg_action)
+        inputs = ['-i', bg_path]
+        filter_complex = (
+            f"[0:v]{bg_chain},scale={w}:{h}:force_original_aspect_ratio=increase,"
+            f"crop={w}:{h},setsar=1,{subtitles}[outv]"
+        )
+    else:
+        inputs = ['-f', 'lavfi', '-i', f"color=c=0x{bg_color}:s={w}x{h}:r={fps}:d={duration:.6f}"]
+        filter_complex = f"[0:v]{subtitles}[outv]"
+
+    cmd = ['ffmpeg', '-y', '-threads', '0', '-filter_complex_threads', '0'] + inputs + ['-i', audio_path]
+    cmd += ['-filter_complex', filter_complex, '-map', '[outv]']
+    cmd += ['-map', '1:a?'] + _audio_args(audio_path, copy_audio_if_possible)
+    cmd += _encoder_args(encoder, preset, crf)
+    cmd += ['-pix_fmt', 'yuv420p', '-movflags', '+faststart', '-shortest', out_path]
+
+    print("ffmpeg command:", " ".join(shlex.quote(x) for x in cmd))
+    return run_cmd(cmd, on_progress=on_progress, total_duration=duration)
 
 
 # Exemple d'utilisation rapide (à adapter):
@@ -195,5 +380,10 @@ if __name__ == "__main__":
     bg, fg, out = sys.argv[1:4]
     # Par défaut rapide : preset ultrafast, libx264.
     # Si tu veux utiliser nvenc (NVIDIA), appelle overlay_chroma(..., encoder='h264_nvenc').
-    rc, log = overlay_chroma(bg, fg, out)
+    def _print_progress(ev):
+        if ev['percent'] is not None:
+            eta = f"{ev['eta']:.0f}s" if ev['eta'] is not None else "?"
+            print(f"\r{ev['percent']:5.1f}%  x{ev['speed']:.2f}  ETA {eta}", end="", flush=True)
+    rc, log = overlay_chroma(bg, fg, out, on_progress=_print_progress)
+    print()
     print("ffmpeg rc:", rc, "log:", log)
@@ -0,0 +1,146 @@
+import os
+import re
+import threading
+
+# ====== CACHE DE TÉLÉCHARGEMENTS ======
+# Les fichiers sont nommés "<titre> [<id>].<format>.<ext>" : le cache se résout sans réseau
+# (id extrait de l'URL) et sans index à maintenir. Un fichier n'est servi qu'avec son extension
+# finale et son marqueur "<fichier>.done", écrit une fois yt-dlp terminé (fusion/conversion comprises).
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "songs", ".cache", "youtube")
+
+AUDIO_FORMAT = "audio-mp3"
+VIDEO_FORMAT = "video-mp4"
+
+_YOUTUBE_RE = re.compile(r"(https?://)?(www\.)?(youtube\.com|youtu\.?be)/.+")
+_VIDEO_ID_RE = re.compile(r"(?:v=|/shorts/|/embed/|/live/|youtu\.be/)([A-Za-z0-9_-]{11})")
+AUDIO_EXT = ".mp3"
+VIDEO_EXT = ".mp4"
+DONE_SUFFIX = ".done"
+
+# un verrou par entrée du cache : deux jobs qui demandent la même vidéo ne la téléchargent qu'une fois
+_locks = {}
+_locks_guard = threading.Lock()
+
+def is_youtube_url(url):
+    return _YOUTUBE_RE.match(url or "") is not None
+
+def youtube_video_id(url):
+    match = _VIDEO_ID_RE.search(url or "")
+    return match.group(1) if match else None
+
+def video_format_key(start=None):
+    """Clé de format de la vidéo de fond ; une section [start, fin] est un fichier distinct."""
+    if start:
+        return f"{VIDEO_FORMAT}-from{float(start):g}s"
+    return VIDEO_FORMAT
+
+def cached_path(video_id, fmt_key, ext, cache_dir=CACHE_DIR):
+    """Retourne le fichier terminé en cache pour (id, format, extension finale) ou None."""
+    if not video_id or not os.path.isdir(cache_dir):
+        return None
+    suffix = f"[{video_id}].{fmt_key}{ext}"
+    names = set(os.listdir(cache_dir))
+    for name in sorted(names):
+        if name.endswith(suffix) and name + DONE_SUFFIX in names:
+            return os.path.join(cache_dir, name)
+    return None
+
+def _remove_stale(video_id, fmt_key, cache_dir):
+    """Restes d'un téléchargement interrompu (formats non fusionnés, source avant conversion, .part...)."""
+    marker = f"[{video_id}].{fmt_key}."
+    for name in os.listdir(cache_dir):
+        if marker in name:
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+
+def cache_title(path):
+    """Titre (déjà nettoyé par yt-dlp) d'un fichier du cache, sinon le nom du fichier sans extension."""
+    name = os.path.basename(path)
+    idx = name.rfind(" [")
+    if idx > 0:
+        return name[:idx]
+    return os.path.splitext(name)[0]
+
+def _ydl_hook(on_progress):
+    def hook(d):
+        if on_progress is None or d.get("status") != "downloading":
+            return
+        total = d.get("total_bytes") or d.get("total_bytes_estimate")
+        if total:
+            on_progress({
+                "frame": 0,
+                "time": 0.0,
+                "speed": 0.0,
+                "percent": 100.0 * d.get("downloaded_bytes", 0) / total,
+                "eta": d.get("eta"),
+                "done": False,
+            })
+    return hook
+
+def _entry_lock(key):
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+def _download(url, fmt_key, ydl_opts, final_ext, cache_dir, on_progress, ydl_factory, section=None):
+    video_id = youtube_video_id(url)
+    with _entry_lock((video_id or url, fmt_key)):
+        hit = cached_path(video_id, fmt_key, final_ext, cache_dir)
+        if hit:
+            return hit
+
+        if ydl_factory is None:
+            import yt_dlp
+            ydl_factory = yt_dlp.YoutubeDL
+
+        os.makedirs(cache_dir, exist_ok=True)
+        if video_id:
+            _remove_stale(video_id, fmt_key, cache_dir)
+        opts = {
+            "outtmpl": os.path.join(cache_dir, f"%(title)s [%(id)s].{fmt_key}.%(ext)s"),
+            "restrictfilenames": True,
+            "progress_hooks": [_ydl_hook(on_progress)],
+            "quiet": True,
+            "no_warnings": True,
+            **ydl_opts,
+        }
+        if section is not None:
+            from yt_dlp.utils import download_range_func
+            opts["download_ranges"] = download_range_func(None, [section])
+            opts["force_keyframes_at_cuts"] = True
+        with ydl_factory(opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+            filename = ydl.prepare_filename(info)
+        filename = os.path.splitext(filename)[0] + final_ext
+        if not os.path.exists(filename):
+            raise RuntimeError(f"téléchargement incomplet : {filename} absent")
+        # marqueur écrit en dernier : seul un téléchargement complet devient un hit
+        open(filename + DONE_SUFFIX, "w").close()
+        return filename
+
+def download_youtube_audio(url, cache_dir=CACHE_DIR, on_progress=None, ydl_factory=None):
+    """Télécharge (ou retrouve en cache) l'audio en mp3 320k."""
+    ydl_opts = {
+        "format": "bestaudio/best",
+        "postprocessors": [{
+            "key": "FFmpegExtractAudio",
+            "preferredcodec": "mp3",
+            "preferredquality": "320",
+        }],
+    }
+    return _download(url, AUDIO_FORMAT, ydl_opts, AUDIO_EXT, cache_dir, on_progress, ydl_factory)
+
+def download_youtube_video(url, cache_dir=CACHE_DIR, start=None, on_progress=None, ydl_factory=None):
+    """
+    Télécharge (ou retrouve en cache) la vidéo de fond en mp4.
+    Avec `start`, seule la section [start, fin] est téléchargée : le fichier obtenu commence à 0.
+    """
+    ydl_opts = {
+        "format": "bestvideo[ext=mp4]+bestaudio/best",
+        "merge_output_format": "mp4",
+    }
+    section = (float(start), float("inf")) if start else None
+    return _download(url, video_format_key(start), ydl_opts, VIDEO_EXT, cache_dir, on_progress, ydl_factory,
+                     section=section)
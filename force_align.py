@@ -1,7 +1,24 @@
 import os
 import re
-from num2words import num2words
-from forcealign import ForceAlign
+
+# num2words et forcealign (torch) sont importés à la première utilisation :
+# importer ce module ne coûte rien, warm_up() permet de les précharger en arrière-plan.
+
+def warm_up():
+    """Précharge les dépendances lourdes de l'aligneur (torch via forcealign)."""
+    import num2words  # noqa: F401
+    import forcealign  # noqa: F401
+
+def spell_numbers(text):
+    """Remplace les nombres par des mots (l'aligneur ne connaît que des lettres)."""
+    from num2words import num2words
+
+    # transformer tous les nombres en mots
+    def replace_number(match):
+        num = int(match.group(0))
+        return num2words(num)
+
+    return re.sub(r"\b\d+\b", replace_number, text)
 
 def preprocess_transcript(transcript_file, processed_file):
     """
@@ -10,23 +27,43 @@ def preprocess_transcript(transcript_file, processed_file):
     with open(transcript_file, "r", encoding="utf-8") as f:
         text = f.read()
 
-    # transformer tous les nombres en mots
-    def replace_number(match):
-        num = int(match.group(0))
-        return num2words(num)
-
-    processed_text = re.sub(r"\b\d+\b", replace_number, text)
+    processed_text = spell_numbers(text)
 
     os.makedirs(os.path.dirname(processed_file), exist_ok=True)
     with open(processed_file, "w", encoding="utf-8") as f:
         f.write(processed_text)
 
+def lrc_word(word):
+    """Mot tel qu'écrit dans le LRC : en minuscules, sans points ni virgules."""
+    return word.lower().replace(",", "").replace(".", "")
+
+def write_lrc(output_lrc, starts, ends, words):
+    """Écrit le LRC et son sidecar binaire (.lrt) ; les mots vides ne vont que dans le LRC."""
+    kept_starts, kept_ends, lrc_words = [], [], []
+    with open(output_lrc, "w", encoding="utf-8") as f:
+        for start, end, word in zip(starts, ends, words):
+            minutes = int(start // 60)
+            seconds = int(start % 60)
+            hundredths = int((start - minutes*60 - seconds) * 100)
+            timestamp = f"[{minutes:02d}:{seconds:02d}.{hundredths:02d}]"
+            f.write(f"{timestamp}{word}\n")
+
+            if word.strip():
+                kept_starts.append(start)
+                kept_ends.append(end)
+                lrc_words.append(word.strip())
+
+    # sidecar binaire : temps exacts (µs, début + fin) sans re-parser le texte au rendu
+    from timings import timings_path, write_timings
+    write_timings(timings_path(output_lrc), kept_starts, kept_ends, lrc_words)
+
 def generate_lrc(audio_file, transcript_file, output_lrc):
     # créer version preprocess pour ForceAlign
     preprocessed_transcript = transcript_file.replace(".txt", "_fa.txt")
     preprocess_transcript(transcript_file, preprocessed_transcript)
 
     # forcealign
+    from forcealign import ForceAlign
     aligner = ForceAlign(audio_file=audio_file, transcript=open(preprocessed_transcript, "r", encoding="utf-8").read())
     words = aligner.inference()
 
@@ -34,16 +71,99 @@ def generate_lrc(audio_file, transcript_file, output_lrc):
     with open(transcript_file, "r", encoding="utf-8") as f:
         original_words = [w for w in f.read().split() if w.strip()]
 
-    with open(output_lrc, "w", encoding="utf-8") as f:
-        for i, word in enumerate(words):
-            start = word.time_start
-            minutes = int(start // 60)
-            seconds = int(start % 60)
-            hundredths = int((start - minutes*60 - seconds) * 100)
-            timestamp = f"[{minutes:02d}:{seconds:02d}.{hundredths:02d}]"
-
-            # récupérer le mot original, en lower, en enlevant uniquement les points et virgules
-            orig_word = original_words[i].lower().replace(",", "").replace(".", "")
-            f.write(f"{timestamp}{orig_word}\n")
+    # récupérer le mot original, en lower, en enlevant uniquement les points et virgules
+    write_lrc(output_lrc, [w.time_start for w in words], [w.time_end for w in words],
+              [lrc_word(original_words[i]) for i in range(len(words))])
 
     print(f"Fichier LRC généré : {output_lrc}")
+
+# ====== RÉALIGNEMENT PARTIEL ======
+# Après une retouche des paroles (même audio), seuls les passages modifiés sont réalignés :
+# diff (difflib) entre les mots du LRC précédent et le nouveau transcript, puis alignement de
+# chaque passage modifié sur la fenêtre audio comprise entre ses mots voisins inchangés
+# (inclus comme ancres). Les autres mots gardent leurs temps.
+MAX_CHANGED_RATIO = 0.3
+
+def changed_regions(old_words, new_words):
+    """
+    Passages modifiés [(i1, i2, j1, j2)] (ancien[i1:i2] -> nouveau[j1:j2]), élargis d'un mot
+    inchangé de chaque côté et fusionnés quand ils se touchent.
+    """
+    import difflib
+    matcher = difflib.SequenceMatcher(None, old_words, new_words, autojunk=False)
+    regions = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        i1, j1 = max(0, i1 - 1), max(0, j1 - 1)
+        i2, j2 = min(len(old_words), i2 + 1), min(len(new_words), j2 + 1)
+        if regions and (i1 <= regions[-1][1] or j1 <= regions[-1][3]):
+            p1, _, q1, _ = regions.pop()
+            i1, j1 = p1, q1
+        regions.append((i1, i2, j1, j2))
+    return regions
+
+def _align_window(wav, tokens, start_s, end_s, tmp_dir):
+    """Aligne tokens sur [start_s, end_s] du wav ouvert ; temps absolus, None si le compte ne tombe pas juste."""
+    import wave
+    from forcealign import ForceAlign
+    rate = wav.getframerate()
+    wav.setpos(min(wav.getnframes(), int(start_s * rate)))
+    frames = wav.readframes(max(0, int(end_s * rate) - int(start_s * rate)))
+    window_path = os.path.join(tmp_dir, "window.wav")
+    with wave.open(window_path, "wb") as out:
+        out.setparams(wav.getparams())
+        out.writeframes(frames)
+    words = ForceAlign(audio_file=window_path, transcript=spell_numbers(" ".join(tokens))).inference()
+    if len(words) != len(tokens):
+        return None
+    return [(start_s + w.time_start, start_s + w.time_end) for w in words]
+
+def update_lrc(audio_file, transcript_file, output_lrc, max_changed=MAX_CHANGED_RATIO):
+    """
+    Met à jour output_lrc pour un transcript retouché, en ne réalignant que les passages modifiés.
+    audio_file doit être le wav PCM de l'alignement précédent (même audio). Retourne False quand
+    un alignement complet s'impose (pas de sidecar, trop de changements, comptes incohérents).
+    """
+    import wave
+    import tempfile
+    from timings import timings_path, read_timings
+
+    sidecar = timings_path(output_lrc)
+    if not audio_file.lower().endswith(".wav") or not os.path.isfile(sidecar):
+        return False
+    previous = read_timings(sidecar)
+    old_words = previous.words()
+    old_starts, old_ends = previous.starts.tolist(), previous.ends.tolist()
+
+    with open(transcript_file, "r", encoding="utf-8") as f:
+        tokens = [w for w in f.read().split() if lrc_word(w).strip()]
+    new_words = [lrc_word(w).strip() for w in tokens]
+    regions = changed_regions(old_words, new_words)
+    if sum(j2 - j1 for _, _, j1, j2 in regions) > max_changed * max(1, len(new_words)):
+        return False
+
+    # mots inchangés : temps repris tels quels
+    import difflib
+    starts, ends = [None] * len(new_words), [None] * len(new_words)
+    matcher = difflib.SequenceMatcher(None, old_words, new_words, autojunk=False)
+    for i, j, n in matcher.get_matching_blocks():
+        starts[j:j + n], ends[j:j + n] = old_starts[i:i + n], old_ends[i:i + n]
+
+    with wave.open(audio_file, "rb") as wav, tempfile.TemporaryDirectory(prefix="realign_") as tmp_dir:
+        duration = wav.getnframes() / float(wav.getframerate())
+        for i1, i2, j1, j2 in regions:
+            if j1 == j2:
+                continue  # suppression pure : rien à aligner
+            # du début de l'ancre gauche à la fin de l'ancre droite ; début/fin du morceau sans ancre
+            window_start = old_starts[i1] if i1 > 0 else 0.0
+            window_end = old_ends[i2 - 1] if i2 < len(old_words) else duration
+            aligned = _align_window(wav, tokens[j1:j2], window_start, window_end, tmp_dir)
+            if aligned is None:
+                return False
+            for j, (start, end) in zip(range(j1, j2), aligned):
+                starts[j], ends[j] = start, end
+
+    write_lrc(output_lrc, starts, ends, new_words)
+    print(f"Fichier LRC mis à jour ({len(regions)} passage(s) réaligné(s)) : {output_lrc}")
+    return True
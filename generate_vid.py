@@ -1,15 +1,18 @@
 import os
 import re
+import json
+import uuid
+import hashlib
 import subprocess
-import librosa
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-import av
 import sys
 import random
 import time
 import unicodedata
-random.seed(time.time())
+from fractions import Fraction
+import tracing
+import audio_tools
 
 # ========== CONFIG ==========
 VIDEO_SIZE = (1080, 1080)
@@ -21,35 +24,75 @@ FONT_PATH = os.path.join(FONTS_DIR, FONT_NAME)
 FONT_SIZE = 110
 TEXT_COLOR = (0, 0, 0)
 BG_COLOR = (0, 255, 0)
+SHADOW_COLOR = (255, 255, 255)
+HIGHLIGHT_COLOR = (255, 0, 0)
+HIGHLIGHT_FEATHER = 8  # width in px of the soft edge of the karaoke sweep
 MARGIN = 0
 LINE_SPACING = 80
 DEFAULT_FPS = 60
 EMOJI_TARGET_SIZE = FONT_SIZE
+LAST_WORD_HOLD = 1.0  # LRC has no end times: the last word "lasts" this long (seconds)
+REFERENCE_SIDE = 1080  # FONT_SIZE, LINE_SPACING, EMOJI_TARGET_SIZE and shadow are tuned for this short side
+# preview: low resolution, low fps, fastest x264 preset (same layout as the final render)
+PREVIEW_SCALE = 1/3
+PREVIEW_FPS = 12
+PREVIEW_X264_PRESET = "ultrafast"
+LAYOUT_CACHE_VERSION = 2
+# timing-aware pagination (paginate_by_timing)
+PAGINATION = "timing"  # or "random" (paginate_lines)
+PAGE_MIN_DURATION = 2.0  # seconds on screen
+PAGE_MAX_DURATION = 8.0
+PAGE_MAX_LINES = 3
+PAGE_GAP_WEIGHT = 1.0  # reward per second of vocal gap at a page break...
+PAGE_GAP_CAP = 2.0  # ...counted up to this many seconds
+PAGE_FLIP_COST = 0.1  # small cost per page: fewer flips when durations allow it
+
+def warm_up():
+    """Preload the heavy rendering dependencies and the default font."""
+    import av  # noqa: F401
+    load_font()
 
 # ========== UTILS ==========
+LRC_LINE_RE = re.compile(r"^\[(\d+):(\d+(?:\.\d+)?)\](.*?)\s*$", re.MULTILINE)
+
 def time_to_seconds(t):
     minutes, seconds = map(float, t.split(":"))
     return minutes * 60 + seconds
 
+def _with_end_times(starts, tokens):
+    # LRC only stores start times: a word ends when the next one starts
+    ends = starts[1:] + [starts[-1] + LAST_WORD_HOLD] if starts else []
+    return list(zip(starts, ends, tokens))
+
 def parse_lrc_words(lrc_path):
+    """(start, end, word) triples from a LRC file."""
+    # one regex pass over the whole file, timestamps converted in a single numpy op
     with open(lrc_path, encoding="utf-8") as f:
-        lines = f.readlines()
-    words = []
-    for line in lines:
-        match = re.match(r"\[(\d+:\d+\.\d+)](.*)", line)
-        if match:
-            timestamp, word = match.groups()
-            word = word.strip()
-            if word:
-                time = time_to_seconds(timestamp)
-                words.append((time, word))
-    return words
+        matches = [m for m in LRC_LINE_RE.findall(f.read()) if m[2].strip()]
+    if not matches:
+        return []
+    minutes = np.array([m[0] for m in matches], dtype=np.float64)
+    seconds = np.array([m[1] for m in matches], dtype=np.float64)
+    times = (minutes * 60 + seconds).tolist()
+    return _with_end_times(times, [m[2].strip() for m in matches])
+
+def load_lyric_words(lrc_path):
+    """
+    (start, end, word) triples for a LRC: from the .lrt sidecar (memory-mapped, µs precision,
+    real end times from the aligner) when it is up to date, else from the LRC text.
+    """
+    from timings import timings_path, read_timings
+    sidecar = timings_path(lrc_path)
+    if os.path.isfile(sidecar) and os.path.getmtime(sidecar) >= os.path.getmtime(lrc_path):
+        t = read_timings(sidecar)
+        return list(zip(t.starts.tolist(), t.ends.tolist(), t.words()))
+    return parse_lrc_words(lrc_path)
 
 def justify_text(words, font, max_width, draw):
     lines = []
     current_line = []
     current_width = 0
-    space_width = font.getsize("  ")[0]
+    space_width = int(font.getlength("  "))
     for word in words:
         bbox = draw.textbbox((0,0), word, font=font)
         word_width = bbox[2] - bbox[0]
@@ -71,7 +114,14 @@ def justify_text(words, font, max_width, draw):
         lines.append(current_line)
     return lines
 
-def paginate_lines(text_lines):
+def pagination_seed(text_lines):
+    """Default seed: a hash of the text, so the same lyrics always get the same pages."""
+    text = "\n".join(" ".join(line) for line in text_lines)
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:16], 16)
+
+def paginate_lines(text_lines, seed=None):
+    # 1-3 lines per page, never the same count twice in a row; reproducible for a given seed
+    rng = random.Random(pagination_seed(text_lines) if seed is None else seed)
     pages = {}
     page_index = 0
     start = 0
@@ -80,7 +130,7 @@ def paginate_lines(text_lines):
         choices = [1,2,3]
         if prev_count in choices:
             choices.remove(prev_count)
-        count = random.choice(choices)
+        count = rng.choice(choices)
         end = min(start + count, len(text_lines))
         pages[page_index] = (start,end)
         prev_count = count
@@ -88,6 +138,40 @@ def paginate_lines(text_lines):
         page_index += 1
     return pages
 
+def _page_cost(duration, min_duration, max_duration):
+    under = max(0.0, min_duration - duration)
+    over = max(0.0, duration - max_duration)
+    return under * under + over * over + PAGE_FLIP_COST
+
+def paginate_by_timing(line_starts, line_ends, min_duration=PAGE_MIN_DURATION, max_duration=PAGE_MAX_DURATION,
+                       max_lines=PAGE_MAX_LINES):
+    """
+    Pages of 1..max_lines lines chosen by dynamic programming over the lines. A page stays on screen
+    from its first word to the first word of the next page, which should last between min_duration
+    and max_duration seconds, and page breaks prefer the longest vocal gaps between lines.
+    line_starts / line_ends: start of the first word / end of the last word of every line.
+    """
+    n = len(line_starts)
+    best = [0.0] + [float("inf")] * n
+    cut = [0] * (n + 1)
+    for b in range(1, n + 1):
+        shown_until = line_starts[b] if b < n else line_ends[n - 1]
+        gap_bonus = 0.0
+        if b < n:
+            gap_bonus = PAGE_GAP_WEIGHT * min(max(line_starts[b] - line_ends[b - 1], 0.0), PAGE_GAP_CAP)
+        for a in range(max(0, b - max_lines), b):
+            cost = best[a] + _page_cost(shown_until - line_starts[a], min_duration, max_duration) - gap_bonus
+            if cost < best[b]:
+                best[b] = cost
+                cut[b] = a
+
+    bounds = []
+    b = n
+    while b > 0:
+        bounds.append((cut[b], b))
+        b = cut[b]
+    return dict(enumerate(reversed(bounds)))
+
 # ===== Emoji helpers =====
 def is_emoji_string(s):
     if not s:
@@ -117,13 +201,40 @@ def load_emoji_image_for_token(token):
     return None
 
 # ===== Layout & Drawing =====
-def layout_text(words, font):
-    img = Image.new("RGB", VIDEO_SIZE)
+def text_scale(video_size, scale=1.0):
+    """Size of the text relative to the 1080 reference, for a video_size canvas drawn at `scale`."""
+    return min(video_size) / REFERENCE_SIDE * scale
+
+def canvas_size(video_size, scale=1.0):
+    # yuv420p needs even dimensions
+    return tuple(max(2, int(round(side * scale / 2)) * 2) for side in video_size)
+
+# loaded fonts by (file, pixel size): a long-lived process (render pool, service) parses each once
+_FONT_CACHE = {}
+
+def load_font(font_gui=FONT_NAME, video_size=VIDEO_SIZE, scale=1.0):
+    font_name = (font_gui or "").strip()
+    if not font_name.endswith(".ttf"):
+        font_name += ".ttf"
+    key = (font_name, max(1, round(FONT_SIZE * text_scale(video_size, scale))))
+    font = _FONT_CACHE.get(key)
+    if font is None:
+        try:
+            font = ImageFont.truetype(os.path.join(FONTS_DIR, font_name), key[1])
+        except Exception:
+            font = ImageFont.load_default()
+        _FONT_CACHE[key] = font
+    return font
+
+def layout_text(words, font, video_size=VIDEO_SIZE, seed=None, pagination=PAGINATION):
+    """Word positions for a video_size canvas; `font` must be loaded for that size (load_font)."""
+    img = Image.new("RGB", video_size)
     draw = ImageDraw.Draw(img)
     word_positions = []
+    emoji_size = round(EMOJI_TARGET_SIZE * text_scale(video_size))
 
-    tokens = [w for _, w in words]
-    text_lines = justify_text(tokens, font, VIDEO_SIZE[0] - 2 * MARGIN, draw)
+    tokens = [w for _, _, w in words]
+    text_lines = justify_text(tokens, font, video_size[0] - 2 * MARGIN, draw)
     word_index = 0
 
     for line in text_lines:
@@ -131,133 +242,725 @@ def layout_text(words, font):
         space_count = len(line) - 1
         for w in line:
             if is_emoji_string(w):
-                word_w = EMOJI_TARGET_SIZE
+                word_w = emoji_size
             else:
                 bbox = draw.textbbox((0,0), w, font=font)
                 word_w = bbox[2] - bbox[0]
             total_word_width += word_w
 
-        space_width = max((VIDEO_SIZE[0] - 2*MARGIN - total_word_width)//max(space_count,1), 0)
+        space_width = max((video_size[0] - 2*MARGIN - total_word_width)//max(space_count,1), 0)
         x = MARGIN
         for w in line:
-            word_time, word_text = words[word_index]
+            word_start, word_end, word_text = words[word_index]
             if is_emoji_string(w):
-                word_bbox_w = EMOJI_TARGET_SIZE
+                word_bbox_w = emoji_size
             else:
                 bbox = draw.textbbox((0,0), w, font=font)
                 word_bbox_w = bbox[2] - bbox[0]
-            if x + word_bbox_w > VIDEO_SIZE[0] - MARGIN:
-                word_bbox_w = VIDEO_SIZE[0] - MARGIN - x
-            word_positions.append((word_time, word_text, x, 0, is_emoji_string(w)))
+            if x + word_bbox_w > video_size[0] - MARGIN:
+                word_bbox_w = video_size[0] - MARGIN - x
+            word_positions.append((word_start, word_end, word_text, x, 0, is_emoji_string(w)))
             x += word_bbox_w + space_width
             word_index += 1
 
-    pages = paginate_lines(text_lines)
+    if pagination == "random":
+        pages = paginate_lines(text_lines, seed)
+    else:
+        ends = np.cumsum([len(line) for line in text_lines])
+        line_starts = [words[e - len(line)][0] for e, line in zip(ends, text_lines)]
+        line_ends = [words[e - 1][1] for e in ends]
+        pages = paginate_by_timing(line_starts, line_ends)
     return word_positions, text_lines, pages
 
-def draw_text_frame(word_positions, text_lines, pages, current_time, font, shadow=7):
-    SHADOW_COLOR = (255,255,255)
-    SHADOW_OFFSET = shadow
+def layout_cache_path(lrc_path, video_size=VIDEO_SIZE):
+    return os.path.splitext(lrc_path)[0] + ".layout.%dx%d.json" % tuple(video_size)
 
-    img = Image.new("RGB", VIDEO_SIZE, BG_COLOR)
-    img_rgba = img.convert("RGBA")
-    draw = ImageDraw.Draw(img_rgba)
+def _layout_key(words, font_gui, video_size, seed, pagination):
+    payload = json.dumps([LAYOUT_CACHE_VERSION, font_gui, list(video_size), seed, pagination,
+                          FONT_SIZE, LINE_SPACING, MARGIN,
+                          PAGE_MIN_DURATION, PAGE_MAX_DURATION, PAGE_MAX_LINES,
+                          PAGE_GAP_WEIGHT, PAGE_GAP_CAP, PAGE_FLIP_COST,
+                          [[float(s), float(e), w] for s, e, w in words]], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
 
-    visible_word_indices = [i for i,(t,_,_,_,_) in enumerate(word_positions) if t <= current_time]
-    if not visible_word_indices:
-        return np.array(img_rgba.convert("RGB"))
+def cached_layout(words, font_gui=FONT_NAME, video_size=VIDEO_SIZE, cache_path=None, seed=None,
+                  pagination=PAGINATION):
+    """
+    layout_text() at full video_size, stored in a JSON sidecar (cache_path) keyed on the words,
+    the font, the geometry and the pagination settings: a preview and the final render share the same pages.
+    """
+    key = _layout_key(words, font_gui, video_size, seed, pagination)
+    if cache_path and os.path.isfile(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("key") == key:
+                word_positions = [tuple(p) for p in data["word_positions"]]
+                pages = {int(p): tuple(r) for p, r in data["pages"].items()}
+                return word_positions, data["text_lines"], pages
+        except (OSError, ValueError, KeyError):
+            pass
 
-    last_visible_word_idx = visible_word_indices[-1]
+    layout = layout_text(words, load_font(font_gui, video_size), video_size, seed, pagination)
+    if cache_path:
+        word_positions, text_lines, pages = layout
+        # unique temp name: farm workers may write the same sidecar on a shared store
+        tmp_path = f"{cache_path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "key": key,
+                "word_positions": [[float(s), float(e), w, int(x), int(y), bool(em)]
+                                   for s, e, w, x, y, em in word_positions],
+                "text_lines": text_lines,
+                "pages": {str(p): list(r) for p, r in pages.items()},
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    return layout
+
+def word_lines(text_lines):
+    """Line index of every word, in word order."""
     word_to_line = []
     for li, line in enumerate(text_lines):
         for _ in line:
             word_to_line.append(li)
-    max_line = word_to_line[last_visible_word_idx]
+    return word_to_line
 
-    page = None
+def page_of_line(pages, line_idx):
     for p,(start,end) in pages.items():
-        if start <= max_line < end:
-            page = p
-            break
+        if start <= line_idx < end:
+            return p
+    return None
+
+def page_geometry(font, start_line, end_line, video_size=VIDEO_SIZE, scale=1.0):
+    """(y of the first line, line height) for a page, vertically centered on the drawn canvas."""
+    spacing = round(LINE_SPACING * text_scale(video_size, scale))
+    ascent, descent = font.getmetrics()
+    line_height = ascent + descent + spacing
+    total_height = line_height*(end_line-start_line) - spacing
+    return (canvas_size(video_size, scale)[1]-total_height)//2, line_height
+
+def _draw_word(img_rgba, draw, word, x, y, line_height, is_emoji, font, shadow, fill=TEXT_COLOR,
+               emoji_size=EMOJI_TARGET_SIZE):
+    if is_emoji:
+        emoji_img = load_emoji_image_for_token(word)
+        if emoji_img:
+            w,h = emoji_img.size
+            scale = emoji_size / max(h,1)
+            new_w = int(w*scale)
+            new_h = int(h*scale)
+            emoji_resized = emoji_img.resize((new_w,new_h), Image.LANCZOS)
+            # vertical centering
+            line_center_y = y + line_height//2
+            emoji_y = line_center_y - new_h//2
+            img_rgba.paste(emoji_resized, (int(x), int(emoji_y)), emoji_resized)
+            return
+    draw.text((x+shadow, y), word, font=font, fill=SHADOW_COLOR)
+    draw.text((x, y), word, font=font, fill=fill)
+
+def _visible_page(word_positions, text_lines, pages, current_time):
+    """(start_line, end_line, [(word index, line index)] of the words shown) or None for a blank frame."""
+    visible_word_indices = [i for i,(t,_,_,_,_,_) in enumerate(word_positions) if t <= current_time]
+    if not visible_word_indices:
+        return None
+
+    word_to_line = word_lines(text_lines)
+    page = page_of_line(pages, word_to_line[visible_word_indices[-1]])
     if page is None:
-        return np.array(img_rgba.convert("RGB"))
+        return None
 
     start_line, end_line = pages[page]
-    ascent, descent = font.getmetrics()
-    line_height = ascent + descent + LINE_SPACING
-    total_height = line_height*(end_line-start_line) - LINE_SPACING
-    y_start = (VIDEO_SIZE[1]-total_height)//2
-
-    for i in visible_word_indices:
-        line_idx = word_to_line[i]
-        if start_line <= line_idx < end_line:
-            _, word, x, _, is_emoji = word_positions[i]
-            y = y_start + (line_idx-start_line)*line_height
-            if is_emoji:
-                emoji_img = load_emoji_image_for_token(word)
-                if emoji_img:
-                    w,h = emoji_img.size
-                    scale = EMOJI_TARGET_SIZE / max(h,1)
-                    new_w = int(w*scale)
-                    new_h = int(h*scale)
-                    emoji_resized = emoji_img.resize((new_w,new_h), Image.LANCZOS)
-                    # vertical centering
-                    line_center_y = y + line_height//2
-                    emoji_y = line_center_y - new_h//2
-                    img_rgba.paste(emoji_resized, (int(x), int(emoji_y)), emoji_resized)
-                else:
-                    draw.text((x+SHADOW_OFFSET, y), word, font=font, fill=SHADOW_COLOR)
-                    draw.text((x, y), word, font=font, fill=TEXT_COLOR)
-            else:
-                draw.text((x+SHADOW_OFFSET, y), word, font=font, fill=SHADOW_COLOR)
-                draw.text((x, y), word, font=font, fill=TEXT_COLOR)
+    shown = [(i, word_to_line[i]) for i in visible_word_indices if start_line <= word_to_line[i] < end_line]
+    return start_line, end_line, shown
+
+def draw_text_frame(word_positions, text_lines, pages, current_time, font, shadow=7,
+                    video_size=VIDEO_SIZE, scale=1.0):
+    # video_size is the layout geometry; the frame is drawn at `scale` of it with a matching font
+    k = text_scale(video_size, scale)
+    img = Image.new("RGB", canvas_size(video_size, scale), BG_COLOR)
+    img_rgba = img.convert("RGBA")
+    draw = ImageDraw.Draw(img_rgba)
+
+    visible = _visible_page(word_positions, text_lines, pages, current_time)
+    if visible is None:
+        return np.array(img_rgba.convert("RGB"))
+
+    start_line, end_line, shown = visible
+    y_start, line_height = page_geometry(font, start_line, end_line, video_size, scale)
+    for i, line_idx in shown:
+        _, _, word, x, _, is_emoji = word_positions[i]
+        y = y_start + (line_idx-start_line)*line_height
+        _draw_word(img_rgba, draw, word, round(x*scale), y, line_height, is_emoji, font,
+                   round(shadow*k), emoji_size=round(EMOJI_TARGET_SIZE*k))
 
     return np.array(img_rgba.convert("RGB"))
 
+# ===== Direct YUV rendering =====
+# A text frame only mixes three colours: BG_COLOR, SHADOW_COLOR under TEXT_COLOR. It is drawn as
+# two 8-bit coverage masks combined into one 16-bit code per pixel (shadow << 8 | text), and
+# 65536-entry lookup tables turn that code into Y, U and V directly: no RGB(A) frame and no swscale pass.
+# Coefficients are BT.601 limited range, like swscale's rgb24 -> yuv420p, so these frames
+# match the RGB fallback (emoji, highlight) in the same stream: same luma as the RGB path,
+# chroma within one level of its 2x2 average.
+_YUV_LUTS = {}
+
+def _rgb_to_yuv601(rgb):
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    y = 16 + (65.481 * r + 128.553 * g + 24.966 * b) / 255
+    u = 128 + (-37.797 * r - 74.203 * g + 112.0 * b) / 255
+    v = 128 + (112.0 * r - 93.786 * g - 18.214 * b) / 255
+    return [np.clip(np.round(c), 0, 255).astype(np.uint8) for c in (y, u, v)]
+
+def yuv_luts(bg=BG_COLOR, shadow=SHADOW_COLOR, text=TEXT_COLOR):
+    """Y, U, V tables (65536 entries each) indexed by shadow_coverage << 8 | text_coverage."""
+    key = (tuple(bg), tuple(shadow), tuple(text))
+    luts = _YUV_LUTS.get(key)
+    if luts is None:
+        code = np.arange(65536)
+        a_shadow = ((code >> 8) / 255.0)[:, None]
+        a_text = ((code & 0xFF) / 255.0)[:, None]
+        # each blend lands on 8-bit RGB, as in the RGBA path
+        rgb = np.round(np.array(bg, np.float64) * (1 - a_shadow) + np.array(shadow, np.float64) * a_shadow)
+        rgb = np.round(rgb * (1 - a_text) + np.array(text, np.float64) * a_text)
+        luts = _YUV_LUTS[key] = _rgb_to_yuv601(rgb)
+    return luts
+
+def _coverage_code(shadow_mask, text_mask):
+    code = np.asarray(shadow_mask).astype(np.uint16) << 8
+    code |= np.asarray(text_mask)
+    return code
+
+def _union_bbox(a, b):
+    if a is None or b is None:
+        return a or b
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+def draw_text_planes(word_positions, text_lines, pages, current_time, font, shadow=7,
+                     video_size=VIDEO_SIZE, scale=1.0):
+    """
+    Same frame as draw_text_frame, as a yuv420p array of shape (h*3/2, w) for
+    av.VideoFrame.from_ndarray(..., format="yuv420p"). Returns None when an emoji is shown
+    (colour bitmap): the caller falls back to draw_text_frame.
+    """
+    width, height = canvas_size(video_size, scale)
+    lut_y, lut_u, lut_v = yuv_luts()
+    k = text_scale(video_size, scale)
+    shadow = round(shadow*k)
+
+    shadow_mask = Image.new("L", (width, height), 0)
+    text_mask = Image.new("L", (width, height), 0)
+    visible = _visible_page(word_positions, text_lines, pages, current_time)
+    if visible is not None:
+        start_line, end_line, shown = visible
+        if any(word_positions[i][5] for i, _ in shown):
+            return None
+        y_start, line_height = page_geometry(font, start_line, end_line, video_size, scale)
+        draw_shadow = ImageDraw.Draw(shadow_mask)
+        draw_text = ImageDraw.Draw(text_mask)
+        for i, line_idx in shown:
+            word, x = word_positions[i][2], round(word_positions[i][3]*scale)
+            y = y_start + (line_idx-start_line)*line_height
+            draw_shadow.text((x+shadow, y), word, font=font, fill=255)
+            draw_text.text((x, y), word, font=font, fill=255)
+
+    out = np.empty((height * 3 // 2, width), dtype=np.uint8)
+    chroma = out[height:].reshape(2, height // 2, width // 2)
+    out[:height] = lut_y[0]
+    chroma[0] = lut_u[0]
+    chroma[1] = lut_v[0]
+
+    # only the text's bounding box (even-aligned for the 2x2 chroma blocks) differs from the background
+    box = _union_bbox(shadow_mask.getbbox(), text_mask.getbbox())
+    if box is None:
+        return out
+    x0, y0 = box[0] & ~1, box[1] & ~1
+    x1, y1 = min(width, (box[2] + 1) & ~1), min(height, (box[3] + 1) & ~1)
+    crop = (x0, y0, x1, y1)
+    sh = shadow_mask.crop(crop)
+    tx = text_mask.crop(crop)
+    code = _coverage_code(sh, tx)
+    out[y0:y1, x0:x1] = np.take(lut_y, code)
+
+    # chroma: full-resolution U/V averaged over each 2x2 block (U and V are linear in RGB, so this
+    # is the 2x2 RGB average converted once)
+    for plane, lut in ((0, lut_u), (1, lut_v)):
+        # uint16 before summing: NumPy 1.x keeps uint8 + scalar in uint8 and would wrap
+        full = np.take(lut, code).astype(np.uint16)
+        total = full[0::2, 0::2] + 2
+        total += full[0::2, 1::2]
+        total += full[1::2, 0::2]
+        total += full[1::2, 1::2]
+        chroma[plane, y0 // 2:y1 // 2, x0 // 2:x1 // 2] = total >> 2
+    return out
+
+# ===== Karaoke highlight =====
+def _page_tiles(word_positions, text_lines, pages, page, font, shadow, highlight_color, word_to_line,
+                video_size=VIDEO_SIZE, scale=1.0):
+    """
+    Render a page twice, once in TEXT_COLOR (base) and once in highlight_color, and keep the
+    bounding box of every text word. Both tiles are computed once per page.
+    """
+    start_line, end_line = pages[page]
+    y_start, line_height = page_geometry(font, start_line, end_line, video_size, scale)
+    size = canvas_size(video_size, scale)
+    k = text_scale(video_size, scale)
+    shadow = round(shadow*k)
+    emoji_size = round(EMOJI_TARGET_SIZE*k)
+    base = Image.new("RGB", size, BG_COLOR).convert("RGBA")
+    hi = base.copy()
+    draw_base = ImageDraw.Draw(base)
+    draw_hi = ImageDraw.Draw(hi)
+
+    indices = [i for i, li in enumerate(word_to_line) if start_line <= li < end_line]
+    boxes = {}
+    for i in indices:
+        _, _, word, x, _, is_emoji = word_positions[i]
+        x = round(x*scale)
+        y = y_start + (word_to_line[i]-start_line)*line_height
+        _draw_word(base, draw_base, word, x, y, line_height, is_emoji, font, shadow, emoji_size=emoji_size)
+        _draw_word(hi, draw_hi, word, x, y, line_height, is_emoji, font, shadow, fill=highlight_color,
+                   emoji_size=emoji_size)
+        if not is_emoji:
+            x0, y0, x1, y1 = draw_base.textbbox((x, y), word, font=font)
+            boxes[i] = (max(int(x0), 0), max(int(y0), 0),
+                        min(int(x1), size[0]), min(int(y1), size[1]))
+
+    return {
+        "page": page,
+        "indices": indices,
+        "boxes": boxes,
+        "hi": np.array(hi.convert("RGB")),
+        # states[n] = page with its first n words fully highlighted (built incrementally)
+        "states": [np.array(base.convert("RGB"))],
+    }
+
+def _sweep(out, hi, box, frac, feather=HIGHLIGHT_FEATHER):
+    """Column-wise blend of the highlighted tile into `out` up to `frac` of the word width."""
+    x0, y0, x1, y1 = box
+    if x1 <= x0 or y1 <= y0:
+        return
+    edge = x0 + frac * (x1 - x0)
+    solid = int(np.clip(edge - feather / 2, x0, x1))
+    soft_end = int(np.clip(np.ceil(edge + feather / 2), x0, x1))
+    out[y0:y1, x0:solid] = hi[y0:y1, x0:solid]
+    if soft_end > solid:
+        cols = np.arange(solid, soft_end, dtype=np.float32)
+        alpha = np.clip((edge - cols) / feather + 0.5, 0.0, 1.0)[None, :, None]
+        region = out[y0:y1, solid:soft_end].astype(np.float32)
+        target = hi[y0:y1, solid:soft_end].astype(np.float32)
+        out[y0:y1, solid:soft_end] = (region + (target - region) * alpha).astype(np.uint8)
+
+def draw_highlight_frame(word_positions, text_lines, pages, current_time, font, shadow=7,
+                         cache=None, highlight_color=HIGHLIGHT_COLOR, video_size=VIDEO_SIZE, scale=1.0):
+    """
+    Karaoke display: the whole page is shown as soon as its first word starts, and a colour
+    sweep crosses each word during [start, end). Page tiles and the "n words done" states are
+    cached in `cache` (one dict per render), so a frame only blends the active word(s).
+    """
+    if cache is None:
+        cache = {}
+    if "word_to_line" not in cache:
+        cache["word_to_line"] = word_lines(text_lines)
+        cache["starts"] = np.array([p[0] for p in word_positions], dtype=np.float64)
+        width, height = canvas_size(video_size, scale)
+        cache["blank"] = np.full((height, width, 3), BG_COLOR, dtype=np.uint8)
+    word_to_line = cache["word_to_line"]
+
+    started = int(np.searchsorted(cache["starts"], current_time, side="right"))
+    if started == 0:
+        return cache["blank"]
+    page = page_of_line(pages, word_to_line[started-1])
+    if page is None:
+        return cache["blank"]
+
+    tiles = cache.get("tiles")
+    if tiles is None or tiles["page"] != page:
+        tiles = cache["tiles"] = _page_tiles(word_positions, text_lines, pages, page, font, shadow,
+                                             highlight_color, word_to_line, video_size, scale)
+
+    indices = tiles["indices"]
+    done = 0
+    while done < len(indices) and word_positions[indices[done]][1] <= current_time:
+        done += 1
+
+    states = tiles["states"]
+    while len(states) <= done:
+        state = states[-1].copy()
+        box = tiles["boxes"].get(indices[len(states)-1])
+        if box is not None:
+            _sweep(state, tiles["hi"], box, 1.0, feather=1)
+        states.append(state)
+
+    active = [i for i in indices[done:] if word_positions[i][0] <= current_time < word_positions[i][1]]
+    if not active:
+        return states[done]
+
+    out = states[done].copy()
+    for i in active:
+        box = tiles["boxes"].get(i)
+        if box is not None:
+            start, end = word_positions[i][0], word_positions[i][1]
+            _sweep(out, tiles["hi"], box, (current_time - start) / max(end - start, 1e-6))
+    return out
+
+PREVIEW_MEMO_FRAMES = 256
+
+def preview_frame(word_positions, text_lines, pages, current_time, font, shadow=7, cache=None,
+                  highlight=False, highlight_color=HIGHLIGHT_COLOR, video_size=VIDEO_SIZE, scale=PREVIEW_SCALE):
+    """
+    One frame at any time, for scrubbing. Without highlight the frame only depends on how many
+    words have started, so frames are memoized on that count; with highlight the page tiles and
+    "n words done" states are reused through draw_highlight_frame's cache.
+    """
+    if cache is None:
+        cache = {}
+    if highlight:
+        return draw_highlight_frame(word_positions, text_lines, pages, current_time, font, shadow,
+                                    cache, highlight_color, video_size, scale)
+    if "starts" not in cache:
+        cache["starts"] = np.array([p[0] for p in word_positions], dtype=np.float64)
+        cache["frames"] = {}
+    started = int(np.searchsorted(cache["starts"], current_time, side="right"))
+    frames = cache["frames"]
+    frame = frames.get(started)
+    if frame is None:
+        if len(frames) >= PREVIEW_MEMO_FRAMES:
+            frames.clear()
+        frame = frames[started] = draw_text_frame(word_positions, text_lines, pages, current_time, font, shadow,
+                                                  video_size, scale)
+    return frame
+
+def _first_frames(times, fps):
+    """First frame index i with t <= i/fps for every t, using the same float test as the renderers."""
+    first = np.ceil(times * fps).astype(np.int64)
+    first = np.where((first - 1) / fps >= times, first - 1, first)
+    return np.where(first / fps < times, first + 1, first)
+
+def static_spans(word_positions, fps, num_frames, highlight=False, first_frame=0):
+    """
+    Split [first_frame, num_frames) into spans where the lyric frame cannot change.
+    The frame only changes when a word starts (it becomes visible, possibly flipping the page),
+    so span boundaries are the first frame index at or after each word start.
+    With highlight, every frame inside a word's [start, end) is its own span (the sweep moves)
+    and word ends are boundaries too.
+    Returns a list of (first_frame, end_frame) with end_frame exclusive.
+    """
+    starts = np.array([p[0] for p in word_positions], dtype=np.float64)
+    first = np.clip(_first_frames(starts, fps), 0, num_frames)
+    bounds = np.union1d(first, [0, num_frames])
+    if highlight:
+        ends = np.array([p[1] for p in word_positions], dtype=np.float64)
+        last = np.clip(_first_frames(ends, fps), 0, num_frames)
+        active = np.zeros(num_frames + 1, dtype=np.int64)
+        np.add.at(active, first, 1)
+        np.add.at(active, last, -1)
+        moving = np.nonzero(np.cumsum(active)[:num_frames] > 0)[0]
+        bounds = np.union1d(bounds, np.concatenate([last, moving, moving + 1]))
+    return [(max(int(a), first_frame), int(b)) for a, b in zip(bounds[:-1], bounds[1:])
+            if b > a and b > first_frame]
+
+# ===== Encoding plan =====
+# The lyric layer is flat and mostly still: keyframes go exactly where a page flips (clean cut
+# points for segments), x264's own scene-cut detection is switched off and GOPs can be long.
+MAX_GOP_SECONDS = 10.0
+RC_LOOKAHEAD = 20
+
+def page_first_frames(word_positions, text_lines, pages, fps):
+    """[(first_frame, start_line, end_line)] for every page that has words, in page order."""
+    line_first_word = np.concatenate([[0], np.cumsum([len(line) for line in text_lines])])
+    firsts = []
+    for start, end in pages.values():
+        if start < len(text_lines) and line_first_word[start] < len(word_positions):
+            firsts.append((int(line_first_word[start]), start, end))
+    times = np.array([word_positions[i][0] for i, _, _ in firsts], dtype=np.float64)
+    return [(int(f), start, end) for f, (_, start, end) in zip(_first_frames(times, fps), firsts)]
+
+def page_flip_frames(word_positions, text_lines, pages, fps):
+    """First frame of every page, i.e. the frame where its first word appears."""
+    return sorted({first for first, _, _ in page_first_frames(word_positions, text_lines, pages, fps)})
+
+def plan_encoding(word_positions, text_lines, pages, fps, first_frame=0, highlight=False, x264_preset=None):
+    """
+    {"keyframes": frame indices to encode as IDR, "options": libx264 options for the PyAV stream}.
+    Still pages get tune=stillimage; the highlight sweep moves every frame, so it gets tune=animation.
+    """
+    keyframes = {first_frame}
+    keyframes.update(f for f in page_flip_frames(word_positions, text_lines, pages, fps) if f >= first_frame)
+    params = {
+        "keyint": max(1, int(MAX_GOP_SECONDS * fps)),
+        "min-keyint": 1,
+        "scenecut": 0,
+        "rc-lookahead": min(RC_LOOKAHEAD, max(1, int(fps))),
+    }
+    options = {
+        "tune": "animation" if highlight else "stillimage",
+        "x264-params": ":".join(f"{k}={v}" for k, v in params.items()),
+        # a forced I frame becomes an IDR: the stream can be cut there
+        "forced-idr": "1",
+    }
+    if x264_preset:
+        options["preset"] = x264_preset
+    return {"keyframes": keyframes, "options": options}
+
+def segment_frames(word_positions, text_lines, pages, fps, num_frames, target_frames):
+    """
+    Split [0, num_frames) into (first_frame, end_frame) segments that start on page flips and are
+    at least target_frames long (except the last one): every segment begins on an IDR frame,
+    so independently encoded segments concatenate with a stream copy.
+    """
+    segments = []
+    start = 0
+    for flip in page_flip_frames(word_positions, text_lines, pages, fps):
+        if flip - start >= target_frames and flip < num_frames:
+            segments.append((start, flip))
+            start = flip
+    if start < num_frames or not segments:
+        segments.append((start, num_frames))
+    return segments
+
+def _picture_types(av):
+    """(I, NONE) picture types: an enum since PyAV 12, strings before."""
+    types = getattr(av.video.frame, "PictureType", None)
+    if types is not None:
+        return types.I, types.NONE
+    return "I", "NONE"
+
+def _frame_progress_event(frames_done, num_frames, fps, elapsed):
+    media_time = frames_done / fps
+    speed = media_time / elapsed if elapsed > 0 else 0.0
+    remaining = (num_frames - frames_done) / fps
+    return {
+        "frame": frames_done,
+        "time": media_time,
+        "speed": speed,
+        "percent": 100.0 * frames_done / max(num_frames, 1),
+        "eta": remaining / speed if speed > 0 else None,
+        "done": frames_done >= num_frames,
+    }
+
 # ========== MAIN FUNCTION ==========
-def generate_lyrics_video(mp3_path, lrc_path, out_path, fps=DEFAULT_FPS, font_gui=FONT_NAME, shadow=7):
-    y,sr = librosa.load(mp3_path, sr=None)
-    duration = librosa.get_duration(y=y,sr=sr)
+def audio_duration(path):
+    """Duration in seconds read from the container (no decoding); librosa decode as a fallback."""
+    import av
+    with av.open(path) as container:
+        if container.duration:
+            return container.duration / av.time_base
+    import librosa
+    y, sr = librosa.load(path, sr=None)
+    return librosa.get_duration(y=y, sr=sr)
 
-    font_name = (font_gui or "").strip()
-    if not font_name.endswith(".ttf"):
-        font_name += ".ttf"
-    font_path = os.path.join(FONTS_DIR,font_name)
+# ========== PAGE SEGMENTS ==========
+# Full renders are encoded as one segment per page kept in segment_dir under a content hash:
+# after a lyric edit only the segments whose pages changed are drawn and encoded again, the
+# others are reused byte for byte by the concat. One page per segment keeps every boundary
+# independent of the pages before it: adding or removing a page does not shift later segments.
+# Bump when drawing or encoding output changes.
+SEGMENT_CACHE_VERSION = 1
+
+def segment_key(word_positions, text_lines, pages, fps, first_frame, end_frame, params):
+    """
+    Content hash of frames [first_frame, end_frame): render params plus the words (timing, position)
+    of every page shown in that range. Segments start on page flips, so those are exactly the
+    pages whose first frame falls inside the range.
+    """
+    line_first_word = np.concatenate([[0], np.cumsum([len(line) for line in text_lines])])
+    shown = []
+    for first, start, end in page_first_frames(word_positions, text_lines, pages, fps):
+        if first_frame <= first < end_frame:
+            lo, hi = int(line_first_word[start]), int(line_first_word[min(end, len(text_lines))])
+            shown.append([text_lines[start:end],
+                          [[float(s), float(e), w, int(x), int(y), bool(em)]
+                           for s, e, w, x, y, em in word_positions[lo:hi]]])
+    data = json.dumps([SEGMENT_CACHE_VERSION, first_frame, end_frame, fps, params, shown], ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()[:20]
+
+def concat_segments(segment_paths, out_path, mp3_path=None):
+    """
+    Join segments that each start on an IDR frame with a stream copy; the audio (copied when it
+    fits in mp4) is added in the same ffmpeg pass.
+    """
+    list_path = out_path + ".concat.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    audio = ["-i", mp3_path, "-map", "0:v:0", "-map", "1:a:0", *audio_tools.mux_audio_args(mp3_path),
+             "-shortest"] if mp3_path else []
+    cmd = ["ffmpeg", "-y", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path, *audio,
+           "-c:v", "copy", out_path]
+    try:
+        with tracing.current().subprocess("ffmpeg concat", cmd):
+            proc = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    finally:
+        os.remove(list_path)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat failed: {proc.stderr.strip()[-500:]}")
+    return out_path
 
-    container = av.open(out_path+".noaudio.mp4", mode="w")
+def _encode_video(av, path, word_positions, text_lines, pages, font, fps, first_frame, num_frames, shadow,
+                  highlight, highlight_color, video_size, scale, x264_preset, on_frames):
+    """Draw and encode frames [first_frame, num_frames) to a video-only file; on_frames(n) after each frame."""
+    trace = tracing.current()
+    container = av.open(path, mode="w")
     stream = container.add_stream("libx264", rate=fps)
-    stream.width, stream.height = VIDEO_SIZE
+    stream.width, stream.height = canvas_size(video_size, scale)
     stream.pix_fmt = "yuv420p"
+    plan = plan_encoding(word_positions, text_lines, pages, fps, first_frame, highlight, x264_preset)
+    stream.options = plan["options"]
+    keyframes = plan["keyframes"]
+    pict_i, pict_none = _picture_types(av)
+    time_base = Fraction(1, fps)
 
     try:
-        font = ImageFont.truetype(font_path, FONT_SIZE)
-    except:
-        font = ImageFont.load_default()
-
-    words = parse_lrc_words(lrc_path)
-    word_positions, text_lines, pages = layout_text(words, font)
-    num_frames = int(duration*fps)
-
-    for i in range(num_frames):
-        current_time = i/fps
-        frame_np = draw_text_frame(word_positions, text_lines, pages, current_time, font, shadow)
-        frame = av.VideoFrame.from_ndarray(frame_np, format="rgb24")
-        for packet in stream.encode(frame):
-            container.mux(packet)
-
-    for packet in stream.encode():
-        container.mux(packet)
-    container.close()
-
-    # add audio
+        highlight_cache = {}
+        with trace.span("frames", frames=num_frames - first_frame, fps=fps,
+                        size=list(canvas_size(video_size, scale)), keyframes=len(keyframes)):
+            for first, end in static_spans(word_positions, fps, num_frames, highlight, first_frame):
+                # the frame is identical for the whole span: draw and convert it once
+                t_draw = time.perf_counter()
+                planes = None
+                if not highlight:
+                    planes = draw_text_planes(word_positions, text_lines, pages, first/fps, font, shadow,
+                                              video_size, scale)
+                if planes is not None:
+                    frame = av.VideoFrame.from_ndarray(planes, format="yuv420p")
+                elif highlight:
+                    frame_np = draw_highlight_frame(word_positions, text_lines, pages, first/fps, font, shadow,
+                                                    highlight_cache, highlight_color, video_size, scale)
+                    frame = av.VideoFrame.from_ndarray(frame_np, format="rgb24")
+                else:
+                    frame_np = draw_text_frame(word_positions, text_lines, pages, first/fps, font, shadow,
+                                               video_size, scale)
+                    frame = av.VideoFrame.from_ndarray(frame_np, format="rgb24")
+                trace.observe("draw", time.perf_counter() - t_draw)
+                for i in range(first, end):
+                    # the same frame object is encoded for the whole span: its timestamp must be set
+                    # on every repeat (a yuv420p frame is not reformatted, so PyAV would reuse the pts)
+                    frame.pts = i - first_frame
+                    frame.time_base = time_base
+                    # keyframes are page flips, which always start a span
+                    frame.pict_type = pict_i if i == first and first in keyframes else pict_none
+                    t_encode = time.perf_counter()
+                    for packet in stream.encode(frame):
+                        container.mux(packet)
+                    trace.observe("encode", time.perf_counter() - t_encode)
+                    # the callback may raise (job cancelled): the container is still closed below
+                    on_frames(1)
+
+            for packet in stream.encode():
+                container.mux(packet)
+    finally:
+        container.close()
+
+def generate_lyrics_video(mp3_path, lrc_path, out_path, fps=DEFAULT_FPS, font_gui=FONT_NAME, shadow=7,
+                          on_progress=None, highlight=False, highlight_color=HIGHLIGHT_COLOR,
+                          video_size=VIDEO_SIZE, preview=False, window=None, x264_preset=None, layout_seed=None,
+                          pagination=PAGINATION, duration=None, frames=None, segment_dir=None):
+    # on_progress(event) : mêmes événements que chroma_video.run_cmd (frame/time/speed/percent/eta/done)
+    # highlight: karaoke colour sweep (draw_highlight_frame) instead of words appearing one by one
+    # video_size: layout geometry (see pipeline.RENDER_PRESETS); the layout is cached next to the LRC
+    # preview: draw at PREVIEW_SCALE, at most PREVIEW_FPS, with the fastest x264 preset
+    # window: (start_s, end_s) renders only that part of the song (end_s None/-1: until the end)
+    # pagination: "timing" (paginate_by_timing) or "random" (paginate_lines, seeded by layout_seed,
+    # None: derived from the lyrics)
+    # duration: audio length in seconds when already known (decoded PCM cache), else probed
+    # frames: exact (first_frame, end_frame) range, end exclusive, instead of window (render farm segments)
+    # mp3_path None: video only, written straight to out_path (no audio mux)
+    # segment_dir: full render as reusable page segments (see SEGMENT_CACHE_VERSION)
+    # spans and per-frame histograms go to the active trace (tracing.activate), if any
+    # av is only needed here: import it lazily
+    import av
+
+    trace = tracing.current()
+    scale = PREVIEW_SCALE if preview else 1.0
+    if preview:
+        fps = min(fps, PREVIEW_FPS)
+        x264_preset = x264_preset or PREVIEW_X264_PRESET
+    if duration is None and frames is None:
+        with trace.span("probe_audio"):
+            duration = audio_duration(mp3_path)
+
+    with trace.span("layout"):
+        words = load_lyric_words(lrc_path)
+        word_positions, text_lines, pages = cached_layout(words, font_gui, video_size,
+                                                          layout_cache_path(lrc_path, video_size), layout_seed,
+                                                          pagination)
+        font = load_font(font_gui, video_size, scale)
+
+    if frames is not None:
+        first_frame, num_frames = (int(f) for f in frames)
+    else:
+        num_frames = int(duration*fps)
+        first_frame = 0
+        if window is not None:
+            start_s, end_s = window
+            first_frame = min(int(np.ceil(max(0.0, start_s) * fps)), num_frames)
+            if end_s is not None and end_s != -1:
+                num_frames = max(first_frame, min(num_frames, int(end_s * fps)))
+    total_frames = num_frames - first_frame
+
+    report_every = max(1, int(fps))
+    t0 = time.perf_counter()
+    frames_done = 0
+
+    def on_frames(count):
+        nonlocal frames_done
+        previous, frames_done = frames_done, frames_done + count
+        if on_progress is not None and (previous // report_every != frames_done // report_every
+                                        or frames_done == total_frames):
+            on_progress(_frame_progress_event(frames_done, total_frames, fps, time.perf_counter() - t0))
+
+    encode_args = (word_positions, text_lines, pages, font, fps)
+    encode_opts = (shadow, highlight, highlight_color, video_size, scale, x264_preset, on_frames)
+
+    if segment_dir and mp3_path and frames is None and window is None:
+        os.makedirs(segment_dir, exist_ok=True)
+        params = [font_gui, shadow, highlight, list(highlight_color), list(video_size), scale, x264_preset]
+        segment_paths, reused = [], 0
+        for first, end in segment_frames(word_positions, text_lines, pages, fps, num_frames, 1):
+            path = os.path.join(segment_dir,
+                                segment_key(word_positions, text_lines, pages, fps, first, end, params) + ".mp4")
+            if os.path.isfile(path):
+                reused += 1
+                on_frames(end - first)
+            else:
+                part_path = path[:-len(".mp4")] + ".part.mp4"
+                _encode_video(av, part_path, *encode_args, first, end, *encode_opts)
+                os.replace(part_path, path)
+            segment_paths.append(path)
+        # only the segments of this render are kept for the next one
+        keep = {os.path.basename(p) for p in segment_paths}
+        for name in os.listdir(segment_dir):
+            if name not in keep:
+                os.remove(os.path.join(segment_dir, name))
+        with trace.span("mux", segments=len(segment_paths), reused=reused):
+            concat_segments(segment_paths, out_path, mp3_path)
+        return
+
+    video_path = out_path+".noaudio.mp4" if mp3_path else out_path
+    _encode_video(av, video_path, *encode_args, first_frame, num_frames, *encode_opts)
+
+    if not mp3_path:
+        return
+
+    # add audio (only the rendered window of it); the video stream is copied, not re-encoded,
+    # and the audio too when the codec fits in mp4
+    audio_window = []
+    if first_frame:
+        audio_window = ["-ss", f"{first_frame / fps:.6f}"]
+    if window is not None:
+        audio_window += ["-t", f"{total_frames / fps:.6f}"]
     cmd = [
         "ffmpeg","-y",
         "-i", out_path+".noaudio.mp4",
-        "-i", mp3_path,
-        "-c:v","libx264","-c:a","aac","-shortest",
+        *audio_window, "-i", mp3_path,
+        "-map","0:v:0","-map","1:a:0",
+        "-c:v","copy",
+        *audio_tools.mux_audio_args(mp3_path),
+        "-shortest",
         out_path
     ]
-    subprocess.run(cmd, check=True)
+    with trace.span("mux"), trace.subprocess("ffmpeg mux", cmd):
+        subprocess.run(cmd, check=True)
 
 # ========== EXAMPLE USAGE ==========
 if __name__ == "__main__":
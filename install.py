@@ -5,16 +5,36 @@ import requests
 import zipfile
 import subprocess
 import sys
+import site
+import json
+import hashlib
 import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-GITHUB_VERSION_URL = "https://raw.githubusercontent.com/Oogghi/lyricgenerator/main/version.txt"
-GITHUB_ZIP_URL = "https://github.com/Oogghi/lyricgenerator/archive/refs/heads/main.zip"
+# surchargeables par variables d'environnement (ex: serveur HTTP local pour les tests)
+GITHUB_VERSION_URL = os.environ.get(
+    "LYRICGEN_VERSION_URL", "https://raw.githubusercontent.com/Oogghi/lyricgenerator/main/version.txt")
+GITHUB_ZIP_URL = os.environ.get(
+    "LYRICGEN_ZIP_URL", "https://github.com/Oogghi/lyricgenerator/archive/refs/heads/main.zip")
+# base des fichiers bruts (manifest.json + fichiers individuels) pour la mise à jour delta
+GITHUB_RAW_URL = os.environ.get(
+    "LYRICGEN_RAW_URL", "https://raw.githubusercontent.com/Oogghi/lyricgenerator/main/")
+VERSION_TIMEOUT = 5  # secondes
+HTTP_TIMEOUT = 30
+CHUNK_SIZE = 1024 * 1024
+
+DEPS_CACHE_PATH = ".deps_cache.json"
+HASH_CACHE_PATH = ".hash_cache.json"
+MANIFEST_NAME = "manifest.json"
+STAGING_DIR = "update_temp"
+DELTA_DIR = os.path.join(STAGING_DIR, "delta")
+# jamais écrasés par une mise à jour
+PROTECTED_FILES = {"update.py", "settings.json", DEPS_CACHE_PATH, HASH_CACHE_PATH}
 
 REQUIRED_MODULES = {
     "PyQt6": "PyQt6",
-    "pydub": "pydub",
     "librosa": "librosa",
     "numpy": "numpy",
     "Pillow": "PIL",
@@ -25,29 +45,86 @@ REQUIRED_MODULES = {
     "requests":"requests"
 }
 
-def install_missing_deps():
-    missing = []
-    for pip_name, import_name in REQUIRED_MODULES.items():
-        if importlib.util.find_spec(import_name) is None:
-            print(f"[Updater] Module manquant: {pip_name}")
-            missing.append(pip_name)
-        else:
-            print(f"[Updater] Module {pip_name} déjà installé")
-    
+def _site_packages_dirs():
+    dirs = []
+    try:
+        dirs += site.getsitepackages()
+    except AttributeError:  # virtualenv ancien
+        pass
+    if site.ENABLE_USER_SITE:
+        dirs.append(site.getusersitepackages())
+    # seuls les dossiers d'installation : pas le dossier de l'appli (sys.path[0]), dont le
+    # contenu change à chaque écriture de cache ou de réglages
+    return sorted({os.path.abspath(d) for d in dirs if os.path.isdir(d)})
+
+def environment_fingerprint():
+    """
+    Empreinte de l'environnement : interpréteur + distributions installées.
+    Installer/désinstaller une distribution crée/supprime un *.dist-info (ou *.egg-info) dans
+    site-packages : un listdir par dossier suffit, sans importer quoi que ce soit.
+    """
+    h = hashlib.sha256()
+    h.update(sys.executable.encode("utf-8"))
+    h.update(sys.version.encode("utf-8"))
+    for directory in _site_packages_dirs():
+        try:
+            names = sorted(n for n in os.listdir(directory) if n.endswith((".dist-info", ".egg-info")))
+        except OSError:
+            continue
+        h.update(directory.encode("utf-8"))
+        h.update("\n".join(names).encode("utf-8"))
+    h.update(json.dumps(REQUIRED_MODULES, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+def _load_deps_cache():
+    try:
+        with open(DEPS_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f).get("fingerprint")
+    except (OSError, ValueError):
+        return None
+
+def _save_deps_cache(fingerprint):
+    tmp_path = DEPS_CACHE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint}, f)
+    os.replace(tmp_path, DEPS_CACHE_PATH)
+
+def install_missing_deps(force=False):
+    # rien n'a changé depuis la dernière vérification réussie : on ne refait pas les find_spec
+    if not force and _load_deps_cache() == environment_fingerprint():
+        print("[Updater] Environnement inchangé, modules déjà vérifiés ✅")
+        return
+
+    missing = [pip_name for pip_name, import_name in REQUIRED_MODULES.items()
+               if importlib.util.find_spec(import_name) is None]
+
     if missing:
         print(f"[Updater] Installation des modules manquants: {', '.join(missing)}")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", *missing])
+        # une seule invocation : pip résout toutes les dépendances ensemble
+        subprocess.check_call([sys.executable, "-m", "pip", "install",
+                               "--disable-pip-version-check", *missing])
+        importlib.invalidate_caches()
     else:
         print("[Updater] Tous les modules requis sont déjà installés ✅")
 
-def get_remote_version():
+    # empreinte recalculée après pip : c'est l'état "vérifié" de référence
+    _save_deps_cache(environment_fingerprint())
+
+def get_remote_version(url=None, timeout=VERSION_TIMEOUT):
     try:
-        with urllib.request.urlopen(GITHUB_VERSION_URL) as response:
+        with urllib.request.urlopen(url or GITHUB_VERSION_URL, timeout=timeout) as response:
             return response.read().decode().strip()
     except Exception as e:
         print("Erreur lors de la récupération de la version distante:", e)
         return None
 
+def start_version_check(url=None):
+    """Lance get_remote_version en arrière-plan ; retourne un Future (result() -> str ou None)."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(get_remote_version, url)
+    executor.shutdown(wait=False)
+    return future
+
 def get_local_version():
     try:
         with open("version.txt", "r") as f:
@@ -55,53 +132,203 @@ def get_local_version():
     except FileNotFoundError:
         return None
 
-import requests
-import zipfile
-import os
-import shutil
+# ====== HASHS ======
+def _sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
 
-def download_update():
-    print("[Updater] Téléchargement de la nouvelle version...")
+def local_hashes(paths):
+    """
+    sha256 des fichiers locaux, avec un cache (taille, mtime) : les gros fichiers inchangés
+    (fonts/*.ttf) ne sont pas relus à chaque vérification.
+    """
+    try:
+        with open(HASH_CACHE_PATH, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
 
-    # téléchargement robuste avec requests
-    with requests.get(GITHUB_ZIP_URL, stream=True) as r:
+    result = {}
+    for rel in paths:
+        try:
+            st = os.stat(rel)
+        except OSError:
+            continue
+        entry = cache.get(rel)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            result[rel] = entry[2]
+        else:
+            result[rel] = _sha256_file(rel)
+            cache[rel] = [st.st_size, st.st_mtime_ns, result[rel]]
+
+    tmp_path = HASH_CACHE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, HASH_CACHE_PATH)
+    return result
+
+def write_manifest(path=MANIFEST_NAME):
+    """Génère le manifeste (chemin -> sha256/taille) des fichiers suivis par git, à publier avec chaque version."""
+    files = subprocess.check_output(["git", "ls-files", "-z"]).decode("utf-8").split("\0")
+    files = sorted(f for f in files if f and f != MANIFEST_NAME and os.path.isfile(f))
+    manifest = {
+        "version": get_local_version(),
+        "files": {f: {"sha256": _sha256_file(f), "size": os.path.getsize(f)} for f in files},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    print(f"[Updater] Manifeste écrit : {path} ({len(files)} fichiers)")
+
+# ====== TÉLÉCHARGEMENTS ======
+def fetch_to_file(url, dest, expected_sha256=None, session=None):
+    """
+    Télécharge url -> dest via dest + ".part" :
+    - reprise avec un header Range si un .part existe déjà (206), sinon téléchargement complet
+    - vérification sha256 optionnelle, puis os.replace (le fichier final n'est jamais à moitié écrit)
+    """
+    http = session or requests
+    part = dest + ".part"
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+
+    h = hashlib.sha256()
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+    with http.get(url, stream=True, headers=headers, timeout=HTTP_TIMEOUT) as r:
+        if r.status_code == 416:
+            # .part déjà complet (ou invalide) : on repart de zéro au prochain essai
+            os.remove(part)
+            raise IOError(f"plage invalide pour {url}")
         r.raise_for_status()
-        with open("update.zip", "wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
+        if offset and r.status_code == 206:
+            with open(part, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    h.update(chunk)
+            mode = "ab"
+        else:
+            mode = "wb"
+        with open(part, mode) as f:
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
                 f.write(chunk)
+                h.update(chunk)
 
-    # extraction du zip
-    with zipfile.ZipFile("update.zip", "r") as zip_ref:
-        zip_ref.extractall("update_temp")
+    if expected_sha256 and h.hexdigest() != expected_sha256:
+        os.remove(part)
+        raise IOError(f"sha256 invalide pour {url}")
+    os.replace(part, dest)
+    return dest
 
-    extracted_folder = os.path.join("update_temp", os.listdir("update_temp")[0])
+def get_remote_manifest(base_url=None):
+    try:
+        r = requests.get((base_url or GITHUB_RAW_URL) + MANIFEST_NAME, timeout=HTTP_TIMEOUT)
+        if r.status_code != 200:
+            return None
+        return r.json()
+    except (requests.RequestException, ValueError) as e:
+        print("[Updater] Manifeste distant indisponible:", e)
+        return None
+
+def download_delta_update(manifest, base_url=None):
+    """
+    Télécharge dans DELTA_DIR uniquement les fichiers dont le sha256 diffère du local.
+    Retourne le nombre de fichiers à mettre à jour.
+    """
+    base_url = base_url or GITHUB_RAW_URL
+    remote_files = {path: meta for path, meta in manifest["files"].items()
+                    if os.path.basename(path) not in PROTECTED_FILES}
+    current = local_hashes(remote_files)
+    changed = [path for path, meta in remote_files.items() if current.get(path) != meta["sha256"]]
+
+    total = sum(remote_files[p]["size"] for p in changed)
+    print(f"[Updater] {len(changed)} fichier(s) modifié(s) sur {len(remote_files)} ({total / 1e6:.1f} Mo)")
+    with requests.Session() as session:
+        for path in changed:
+            url = base_url + urllib.request.pathname2url(path).lstrip("/")
+            fetch_to_file(url, os.path.join(DELTA_DIR, path), remote_files[path]["sha256"], session)
+            print(f"[Updater] Téléchargé: {path}")
+
+    # le manifeste lui-même sert de référence pour la prochaine comparaison
+    with open(os.path.join(DELTA_DIR, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    return len(changed)
+
+def download_update(url=None, apply=True):
+    """
+    Télécharge la dernière version dans STAGING_DIR :
+    - delta (manifest.json publié) : seuls les fichiers modifiés, vérifiés par sha256
+    - sinon archive zip complète (reprise possible)
+    apply=False : la mise à jour reste en attente et sera appliquée par apply_staged_update
+    (quand main.py ne tourne plus).
+    """
+    print("[Updater] Téléchargement de la nouvelle version...")
+
+    manifest = None if url else get_remote_manifest()
+    staged = False
+    if manifest is not None:
+        try:
+            download_delta_update(manifest)
+            staged = True
+        except Exception as e:
+            print("[Updater] Mise à jour delta impossible, archive complète:", e)
+            shutil.rmtree(DELTA_DIR, ignore_errors=True)
+
+    if not staged:
+        fetch_to_file(url or GITHUB_ZIP_URL, "update.zip")
+        if os.path.isdir(STAGING_DIR):
+            shutil.rmtree(STAGING_DIR)
+        try:
+            with zipfile.ZipFile("update.zip", "r") as zip_ref:
+                zip_ref.extractall(STAGING_DIR)
+        finally:
+            # archive corrompue (ex: reprise d'un .part d'une autre version) : on ne la garde pas
+            os.remove("update.zip")
+
+    if apply:
+        apply_staged_update()
+    else:
+        print("[Updater] Mise à jour téléchargée, elle sera appliquée à la fermeture.")
+
+def apply_staged_update():
+    """
+    Applique la mise à jour en attente (STAGING_DIR) ; retourne False s'il n'y en a pas.
+    Les fichiers identiques sont ignorés, les autres remplacés atomiquement (os.replace).
+    """
+    if not os.path.isdir(STAGING_DIR) or not os.listdir(STAGING_DIR):
+        return False
+
+    extracted_folder = os.path.join(STAGING_DIR, os.listdir(STAGING_DIR)[0])
 
-    print("[Updater] Copie/merge des nouveaux fichiers...")
+    print("[Updater] Application de la mise à jour...")
+    replaced = 0
     for root, dirs, files in os.walk(extracted_folder):
         rel_path = os.path.relpath(root, extracted_folder)
         dest_dir = os.path.join(".", rel_path) if rel_path != "." else "."
-
-        if not os.path.exists(dest_dir):
-            os.makedirs(dest_dir)
+        os.makedirs(dest_dir, exist_ok=True)
 
         for file in files:
-            if file == "update.py":
-                print("[Updater] Ignorer update.py pendant la copie.")
+            if file in PROTECTED_FILES or file.endswith(".part"):
                 continue
 
             src_file = os.path.join(root, file)
             dst_file = os.path.join(dest_dir, file)
 
             try:
-                shutil.copy2(src_file, dst_file)
-                print(f"[Updater] Copié: {dst_file}")
+                if (os.path.exists(dst_file) and os.path.getsize(dst_file) == os.path.getsize(src_file)
+                        and _sha256_file(dst_file) == _sha256_file(src_file)):
+                    continue
+                os.replace(src_file, dst_file)
+                replaced += 1
+                print(f"[Updater] Mis à jour: {dst_file}")
             except Exception as e:
                 print(f"[Updater] Erreur copie {file}: {e}")
 
-    shutil.rmtree("update_temp")
-    os.remove("update.zip")
-    print("[Updater] Mise à jour terminée.")
-    
+    shutil.rmtree(STAGING_DIR)
+    print(f"[Updater] Mise à jour terminée ({replaced} fichier(s) remplacé(s)).")
+    return True
+
 def parse_version(v, length=3):
     v = v.strip()
     parts = list(map(int, v.split(".")))
@@ -109,40 +336,56 @@ def parse_version(v, length=3):
         parts.append(0)
     return tuple(parts[:length])
 
+def update_needed(local_version_str, remote_version_str):
+    if remote_version_str is None:
+        # hors ligne : on garde la version locale si elle existe
+        return local_version_str is None
+    if local_version_str is None:
+        return True
+    local_version = parse_version(local_version_str)
+    remote_version = parse_version(remote_version_str)
+    if local_version > remote_version:
+        print(f"[Updater] Tu as la version {local_version_str} alors que la dernière est {remote_version_str}, tu voyages dans le temps??")
+    return local_version != remote_version
+
+def launch_main():
+    return subprocess.Popen([sys.executable, "main.py"])
+
 if __name__ == "__main__":
+    if "--write-manifest" in sys.argv:
+        write_manifest()
+        sys.exit(0)
+
+    # la requête de version part tout de suite et ne bloque pas le lancement
+    version_future = start_version_check()
+
     print("[Updater] Vérification des modules...")
     install_missing_deps()
-    print("[Updater] Vérification de la version...")
+
+    # mise à jour téléchargée lors d'un lancement précédent mais pas encore appliquée
+    apply_staged_update()
+
     local_version_str = get_local_version()
-    remote_version_str = get_remote_version()
+    if local_version_str is None:
+        print("[Updater] Pas de version locale, installation...")
+        download_update()
+        local_version_str = get_local_version()
 
+    print("[Updater] Lancement de main.py...")
+    app = launch_main()
+
+    remote_version_str = version_future.result()
     if remote_version_str is None:
         print("[Updater] Impossible de trouver la version.")
-        print("[Updater] Installation de la dernière version")
-        download_update()
-        os.system("python main.py")
+    elif update_needed(local_version_str, remote_version_str):
+        print(f"[Updater] Nouvelle version détectée ({remote_version_str}).")
+        try:
+            download_update(apply=False)
+        except Exception as e:
+            print("[Updater] Échec du téléchargement de la mise à jour:", e)
     else:
-        local_version = parse_version(local_version_str) if local_version_str else None
-        remote_version = parse_version(remote_version_str)
-
-        if local_version is None:
-            print("[Updater] Pas de version locale, installation...")
-            download_update()
-            os.system("python main.py")
-        elif local_version == remote_version:
-            print("[Updater] Tout est PARFAIT ! :D")
-            print("[Updater] Lancement de main.py...")
-            os.system("python main.py")
-        elif local_version > remote_version:
-            print(f"[Updater] Tu as la version {local_version_str} alors que la dernière est {remote_version_str}, tu voyages dans le temps??")
-            download_update()
-            os.system("python main.py")
-        elif local_version < remote_version:
-            print(f"[Updater] Nouvelle version détectée ({remote_version_str}). Mise à jour...")
-            download_update()
-            os.system("python main.py")
-        else:
-            print("[Updater] euh, si tu vois ça c'est que t'as fait n'importe quoi, donc on va te mettre la dernière version stable ;)")  
-            download_update()
-            os.system("python main.py")
+        print("[Updater] Tout est PARFAIT ! :D")
 
+    app.wait()
+    if apply_staged_update():
+        print("[Updater] Elle sera active au prochain lancement.")
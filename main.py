@@ -1,97 +1,63 @@
 import sys
 import json
 import os
-import yt_dlp
 import re
+import threading
+import importlib.util
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QLineEdit, QTextEdit,
-    QFileDialog, QVBoxLayout, QHBoxLayout, QProgressBar, QSpinBox, QComboBox
+    QFileDialog, QVBoxLayout, QHBoxLayout, QProgressBar, QSpinBox, QComboBox,
+    QListWidget, QListWidgetItem, QCheckBox, QSlider
 )
-from PyQt6.QtGui import QFont, QKeySequence
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QPoint
-from pydub import AudioSegment
-
-# Try to import dependencies
-HAS_DEPS = True
-try:
-    from force_align import generate_lrc
-    from generate_vid import generate_lyrics_video
-    import chroma_video
-except ImportError:
-    HAS_DEPS = False
+from PyQt6.QtGui import QFont, QKeySequence, QImage, QPixmap
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, QPoint, QTimer
+from pipeline import RENDER_PRESETS
+
+# Dépendances lourdes : on vérifie seulement qu'elles existent (find_spec n'importe rien).
+# Elles sont chargées à la première utilisation, dans les process de rendu.
+HEAVY_MODULES = ("forcealign", "num2words", "librosa", "av", "numpy", "PIL", "yt_dlp")
+HAS_DEPS = all(importlib.util.find_spec(m) is not None for m in HEAVY_MODULES)
+if HAS_DEPS:
+    from render_queue import RenderQueue, Scheduler, RUNNING
 
 SETTINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "settings.json")
 
 # Worker (only works if deps exist)
 if HAS_DEPS:
-    class Worker(QThread):
-        progress = pyqtSignal(str)
-        finished = pyqtSignal(bool, str)
+    class QueueWorker(QThread):
+        """Fait tourner le Scheduler de la file hors du thread GUI ; l'UI ne reçoit que des signaux."""
+        job_started = pyqtSignal(str)
+        job_progress = pyqtSignal(str, str, int)  # id, message, pourcentage global du job
+        job_finished = pyqtSignal(str, bool, str)
 
-        def __init__(self, audio_file, text_file, output_dir, fps, shadow, bg_video, chroma_start,
-                     chroma_speed, chroma_sim, chroma_blend, font_name, encoder, preset):
+        def __init__(self, render_queue, warm_up=True):
             super().__init__()
-            self.audio_file = audio_file
-            self.text_file = text_file
-            self.output_dir = output_dir
-            self.fps = fps
-            self.shadow = shadow
-            self.bg_video = bg_video
-            self.chroma_start = chroma_start
-            self.chroma_speed = chroma_speed
-            self.chroma_sim = chroma_sim
-            self.chroma_blend = chroma_blend
-            self.font_name = font_name
-            self.encoder = encoder
-            self.preset = preset
+            self.stop_event = threading.Event()
+            self.scheduler = Scheduler(render_queue, on_event=self._on_event, warm_up=warm_up)
+
+        def _on_event(self, kind, job_id, *args):
+            if kind == "progress":
+                self.job_progress.emit(job_id, *args)
+            elif kind == "started":
+                self.job_started.emit(job_id)
+            elif kind == "finished":
+                self.job_finished.emit(job_id, *args)
+
+        def submit(self, job):
+            return self.scheduler.submit(job)
+
+        def cancel(self, job_id):
+            self.scheduler.cancel(job_id)
+
+        def stop(self):
+            self.stop_event.set()
+            self.wait()
 
         def run(self):
             try:
-                os.makedirs(self.output_dir, exist_ok=True)
-                base_name = os.path.splitext(os.path.basename(self.audio_file))[0]
-
-                # 1) LRC
-                self.progress.emit("📝 Génération du fichier LRC...")
-                lrc_path = os.path.join(self.output_dir, f"{base_name}.lrc")
-                generate_lrc(self.audio_file, self.text_file, lrc_path)
-
-                # 2) Lyrics video
-                self.progress.emit("🎬 Génération de la vidéo des paroles...")
-                lyrics_video_path = os.path.join(self.output_dir, f"{base_name}_lyrics.mp4")
-                generate_lyrics_video(
-                    mp3_path=self.audio_file,
-                    lrc_path=lrc_path,
-                    out_path=lyrics_video_path,
-                    fps=self.fps,
-                    shadow=self.shadow,
-                    font_gui=self.font_name
-                )
-
-                # 3) Optional chroma overlay
-                if self.bg_video:
-                    self.progress.emit("🖌️ Superposition de la vidéo...")
-                    final_path = os.path.join(self.output_dir, f"{base_name}_final.mp4")
-                    rc, log = chroma_video.overlay_chroma(
-                        bg_path=self.bg_video,
-                        fg_path=lyrics_video_path,
-                        out_path=final_path,
-                        start_time=self.chroma_start,
-                        speed=self.chroma_speed,
-                        similarity=self.chroma_sim,
-                        blend=self.chroma_blend,
-                        bg_color="00ff00",
-                        encoder=self.encoder,
-                        preset=self.preset
-                    )
-                    if rc == 0:
-                        self.finished.emit(True, final_path)
-                    else:
-                        self.finished.emit(False, log)
-                else:
-                    self.finished.emit(True, lyrics_video_path)
-
+                self.scheduler.run(stop_event=self.stop_event, keep_alive=True)
             except Exception as e:
-                self.finished.emit(False, str(e))
+                print("Erreur scheduler:", e)
 
 class PlainTextEdit(QTextEdit):
     def insertFromMimeData(self, source):
@@ -100,11 +66,6 @@ class PlainTextEdit(QTextEdit):
         else:
             super().insertFromMimeData(source)
 
-def sanitize_filename(name: str) -> str:
-        """Remplace tous les caractères problématiques par '_' et limite la longueur"""
-        name = re.sub(r'[^\w\-_.]', '_', name)
-        return name[:200]
-
 class CustomTitleBar(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -172,12 +133,68 @@ class CustomTitleBar(QWidget):
     def mouseReleaseEvent(self, event):
         self.startPos = None
 
+class PreviewWindow(QWidget):
+    """
+    Aperçu image par image : la mise en page est calculée une fois (cache partagé avec le rendu),
+    puis chaque position du curseur ne dessine qu'une image basse résolution (mémorisée par page).
+    """
+
+    def __init__(self, lrc_path, font_name, shadow, highlight, video_preset):
+        super().__init__()
+        # numpy/PIL seulement à l'ouverture de l'aperçu, pas au démarrage de l'appli
+        import generate_vid
+        from pipeline import video_size
+
+        self.generate_vid = generate_vid
+        self.setWindowTitle(f"Aperçu — {os.path.basename(lrc_path)}")
+        self.setStyleSheet("background-color: black; color: white;")
+
+        self.video_size = video_size(video_preset)
+        self.shadow = shadow
+        self.highlight = highlight
+        words = generate_vid.load_lyric_words(lrc_path)
+        self.layout = generate_vid.cached_layout(
+            words, font_name, self.video_size, generate_vid.layout_cache_path(lrc_path, self.video_size)
+        )
+        self.font = generate_vid.load_font(font_name, self.video_size, generate_vid.PREVIEW_SCALE)
+        self.cache = {}
+        duration_ms = int(1000 * (words[-1][1] if words else 0)) + 1000
+
+        layout = QVBoxLayout()
+        self.image_label = QLabel()
+        self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addWidget(self.image_label)
+
+        h_slider = QHBoxLayout()
+        self.slider = QSlider(Qt.Orientation.Horizontal)
+        self.slider.setRange(0, duration_ms)
+        self.slider.valueChanged.connect(self.show_time)
+        self.time_label = QLabel("00:00.00")
+        h_slider.addWidget(self.slider)
+        h_slider.addWidget(self.time_label)
+        layout.addLayout(h_slider)
+        self.setLayout(layout)
+
+        self.show_time(0)
+
+    def show_time(self, ms):
+        t = ms / 1000.0
+        word_positions, text_lines, pages = self.layout
+        frame = self.generate_vid.preview_frame(
+            word_positions, text_lines, pages, t, self.font, self.shadow, self.cache,
+            highlight=self.highlight, video_size=self.video_size
+        )
+        h, w, _ = frame.shape
+        image = QImage(frame.data, w, h, 3 * w, QImage.Format.Format_RGB888).copy()
+        self.image_label.setPixmap(QPixmap.fromImage(image))
+        self.time_label.setText(f"{int(t // 60):02d}:{t % 60:05.2f}")
+
 class KaraokeApp(QWidget):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("🎶 Générateur de paroles par Oogghi")
-        self.setFixedSize(780, 720)
-        self.setMinimumSize(780, 720)
+        self.setFixedSize(780, 910)
+        self.setMinimumSize(780, 910)
         self.setWindowFlag(Qt.WindowType.FramelessWindowHint)
         self.setStyleSheet("background-color: black; color: white;")
 
@@ -342,7 +359,54 @@ class KaraokeApp(QWidget):
         self.preset_input.setCurrentText("ultrafast")
         h_params2.addWidget(self.preset_input)
 
+        self.highlight_input = QCheckBox("Surlignage karaoké")
+        h_params2.addWidget(self.highlight_input)
+
         params_layout.addLayout(h_params2)
+
+        # --- Third row (Format + Preview)
+        h_params3 = QHBoxLayout()
+
+        h_params3.addWidget(QLabel("Format :"))
+        self.video_preset_input = QComboBox()
+        self.video_preset_input.setStyleSheet("background-color: #222; padding: 6px; border-radius: 4px;")
+        self.video_preset_input.addItems(list(RENDER_PRESETS))
+        self.video_preset_input.setCurrentText("1:1")
+        h_params3.addWidget(self.video_preset_input)
+
+        h_params3.addWidget(QLabel("Aperçu de :"))
+        self.preview_start_input = QLineEdit()
+        self.preview_start_input.setPlaceholderText("MM:SS")
+        self.preview_start_input.setStyleSheet("background-color: #222; padding: 6px; border-radius: 4px;")
+        h_params3.addWidget(self.preview_start_input)
+
+        h_params3.addWidget(QLabel("à :"))
+        self.preview_end_input = QLineEdit()
+        self.preview_end_input.setPlaceholderText("MM:SS ou -1")
+        self.preview_end_input.setStyleSheet("background-color: #222; padding: 6px; border-radius: 4px;")
+        h_params3.addWidget(self.preview_end_input)
+
+        self.btn_preview = QPushButton("Aperçu rapide")
+        self.btn_preview.setStyleSheet("""
+            QPushButton {
+                background-color: #444;
+                color: white;
+                border-radius: 4px;
+                padding: 6px;
+            }
+            QPushButton:hover {
+                background-color: #3399FF;
+            }
+        """)
+        self.btn_preview.clicked.connect(self.preview)
+        h_params3.addWidget(self.btn_preview)
+
+        self.btn_frame_preview = QPushButton("Aperçu image")
+        self.btn_frame_preview.setStyleSheet(self.btn_preview.styleSheet())
+        self.btn_frame_preview.clicked.connect(self.open_frame_preview)
+        h_params3.addWidget(self.btn_frame_preview)
+
+        params_layout.addLayout(h_params3)
         layout.addLayout(params_layout)
 
         # --- Progress
@@ -364,8 +428,15 @@ class KaraokeApp(QWidget):
         layout.addWidget(self.progress_label)
         layout.addWidget(self.progress_bar)
 
+        # --- File de rendu
+        layout.addWidget(QLabel("File d'attente :"))
+        self.queue_list = QListWidget()
+        self.queue_list.setFixedHeight(110)
+        self.queue_list.setStyleSheet("background-color: #222; padding: 4px; border-radius: 4px;")
+        layout.addWidget(self.queue_list)
+
         # --- Generate button
-        self.btn_generate = QPushButton("Générer la vidéo karaoké")
+        self.btn_generate = QPushButton("Ajouter à la file")
         self.btn_generate.setFont(QFont("Arial", 12, QFont.Weight.Bold))
         self.btn_generate.setStyleSheet("""
             QPushButton {
@@ -382,11 +453,37 @@ class KaraokeApp(QWidget):
             }
         """)
         self.btn_generate.clicked.connect(self.generate)
-        layout.addWidget(self.btn_generate)
+
+        self.btn_cancel = QPushButton("Annuler")
+        self.btn_cancel.setStyleSheet("""
+            QPushButton {
+                background-color: #444;
+                color: white;
+                border-radius: 8px;
+                padding: 10px;
+            }
+            QPushButton:hover {
+                background-color: #e74c3c;
+            }
+        """)
+        self.btn_cancel.clicked.connect(self.cancel_generation)
+
+        h_buttons = QHBoxLayout()
+        h_buttons.addWidget(self.btn_generate, 3)
+        h_buttons.addWidget(self.btn_cancel, 1)
+        layout.addLayout(h_buttons)
 
         self.setLayout(layout)
 
+        self.queue_items = {}
+        self.preview_window = None
+        self.render_queue = None
+        self.queue_worker = None
+        self.warm_up = True
+
         self.load_settings()
+        # la file (et le préchargement de l'aligneur) démarre une fois la fenêtre affichée
+        QTimer.singleShot(0, self.start_queue)
 
     def load_settings(self):
         """Charge les réglages depuis settings.json (s'ils existent)"""
@@ -428,6 +525,14 @@ class KaraokeApp(QWidget):
             self.encoder_input.setCurrentText(s.get("encoder", self.encoder_input.currentText()))
             self.preset_input.setCurrentText(s.get("preset", self.preset_input.currentText()))
 
+            self.highlight_input.setChecked(bool(s.get("highlight", False)))
+            self.video_preset_input.setCurrentText(s.get("video_preset", self.video_preset_input.currentText()))
+            self.preview_start_input.setText(s.get("preview_start", ""))
+            self.preview_end_input.setText(s.get("preview_end", ""))
+
+            # préchargement de l'aligneur dans les process de rendu au lancement
+            self.warm_up = bool(s.get("warm_up", True))
+
         except Exception as e:
             # ne pas planter l'UI si le fichier est corrompu
             print("Erreur load_settings:", e)
@@ -450,7 +555,12 @@ class KaraokeApp(QWidget):
                 "chroma_blend": self.chroma_blend_input.text().strip(),
                 "font_name": self.font_input.currentText(),
                 "encoder": self.encoder_input.currentText(),
-                "preset": self.preset_input.currentText()
+                "preset": self.preset_input.currentText(),
+                "highlight": self.highlight_input.isChecked(),
+                "video_preset": self.video_preset_input.currentText(),
+                "preview_start": self.preview_start_input.text().strip(),
+                "preview_end": self.preview_end_input.text().strip(),
+                "warm_up": self.warm_up
             }
 
             tmp_path = SETTINGS_PATH + ".tmp"
@@ -472,6 +582,9 @@ class KaraokeApp(QWidget):
             self.save_settings()
         except Exception as e:
             print("Erreur lors de la sauvegarde à la fermeture:", e)
+        # les jobs en cours repasseront en attente au prochain lancement
+        if self.queue_worker is not None:
+            self.queue_worker.stop()
         # accepter la fermeture
         event.accept()
 
@@ -541,184 +654,41 @@ class KaraokeApp(QWidget):
         pattern = r"(https?://)?(www\.)?(youtube\.com|youtu\.?be)/.+"
         return re.match(pattern, url) is not None
 
-    def download_youtube_audio(self, url, output_dir):
-        try:
-            ydl_opts = {
-                "format": "bestaudio/best",
-                "outtmpl": os.path.join(output_dir, "%(title)s.%(ext)s"),
-                "postprocessors": [{
-                    "key": "FFmpegExtractAudio",
-                    "preferredcodec": "mp3",
-                    "preferredquality": "320",
-                }],
-                "quiet": True,
-                "no_warnings": True,
-            }
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                filename = ydl.prepare_filename(info)
-                return os.path.splitext(filename)[0] + ".mp3"
-        except Exception as e:
-            self.progress_label.setText(f"❌ Erreur téléchargement audio: {e}")
-            return None
-
-    def download_youtube_video(self, url, output_dir):
-        try:
-            ydl_opts = {
-                "format": "bestvideo[ext=mp4]+bestaudio/best",
-                "merge_output_format": "mp4",
-                "outtmpl": os.path.join(output_dir, "%(title)s.%(ext)s"),
-                "quiet": True,
-                "no_warnings": True,
-            }
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
-                filename = ydl.prepare_filename(info)
-                return filename
-        except Exception as e:
-            self.progress_label.setText(f"❌ Erreur téléchargement vidéo: {e}")
-            return None
-
     # --- Generate logic
-    def generate(self):
+    def build_job(self):
+        """Valide le formulaire et retourne le job (dict), ou None après avoir affiché l'erreur."""
         self.save_settings()
-        self.btn_generate.setEnabled(False)
         self.progress_bar.setValue(0)
-        self.progress_label.setText("Démarrage...")
-        QApplication.processEvents()
-        self.progress_bar.setValue(1)
 
         audio_path = self.audio_input.text().strip()
         if not audio_path:
             self.progress_label.setText("❌ Sélectionnez un fichier audio ou collez un lien YouTube !")
-            self.btn_generate.setEnabled(True)
-            return
+            return None
 
         if not os.path.isfile(audio_path):
             if not self.is_youtube_url(audio_path):
                 self.progress_label.setText("❌ Sélectionnez un fichier audio valide ou un lien YouTube !")
-                self.btn_generate.setEnabled(True)
-                return
+                return None
 
         lyrics_text = self.text_edit.toPlainText().strip()
         if not lyrics_text:
             self.progress_label.setText("❌ Écrivez ou collez les paroles d'abord !")
-            self.btn_generate.setEnabled(True)
-            return
+            return None
 
         out_dir = self.get_output_dir().strip()
         if not out_dir:
             self.progress_label.setText("❌ Sélectionnez un dossier de sortie !")
-            self.btn_generate.setEnabled(True)
-            return
-
-        if not os.path.exists(out_dir):
-            os.makedirs(out_dir, exist_ok=True)
-
-        # --- Download YouTube audio if needed ---
-        if self.is_youtube_url(audio_path):
-            self.progress_label.setText("🔽 Connexion pour téléchargement audio...")
-            QApplication.processEvents()
-            self.progress_bar.setValue(5)
-
-            self.progress_label.setText("🔽 Téléchargement audio...")
-            QApplication.processEvents()
-            audio_path = self.download_youtube_audio(audio_path, out_dir)
-            if not audio_path:
-                self.btn_generate.setEnabled(True)
-                return
-
-            # sanitize filename
-            base, ext = os.path.splitext(os.path.basename(audio_path))
-            safe_name = sanitize_filename(base) + ext
-            safe_path = os.path.join(out_dir, safe_name)
-            if audio_path != safe_path:
-                os.rename(audio_path, safe_path)
-                audio_path = safe_path
-            self.audio_input.setText(audio_path)
-
-            self.progress_label.setText("✅ Audio téléchargé")
-            QApplication.processEvents()
-            self.progress_bar.setValue(10)
-
-        # --- Download YouTube background video if needed ---
-        bg_path = self.bg_input.text().strip()
-        if bg_path and self.is_youtube_url(bg_path):
-            self.progress_label.setText("🔽 Connexion pour téléchargement vidéo...")
-            QApplication.processEvents()
-            self.progress_bar.setValue(12)
-
-            self.progress_label.setText("🔽 Téléchargement vidéo...")
-            QApplication.processEvents()
-            bg_path = self.download_youtube_video(bg_path, out_dir)
-            if not bg_path:
-                self.btn_generate.setEnabled(True)
-                return
-
-            # sanitize filename
-            base, ext = os.path.splitext(os.path.basename(bg_path))
-            safe_name = sanitize_filename(base) + ext
-            safe_path = os.path.join(out_dir, safe_name)
-            if bg_path != safe_path:
-                os.rename(bg_path, safe_path)
-                bg_path = safe_path
-            self.bg_input.setText(bg_path)
-
-            self.progress_label.setText("✅ Vidéo téléchargée")
-            QApplication.processEvents()
-            self.progress_bar.setValue(13)
-
-        # --- Save lyrics ---
-        temp_txt = os.path.join(out_dir, "transcript.txt")
-        with open(temp_txt, "w", encoding="utf-8") as f:
-            f.write(lyrics_text)
+            return None
 
         # --- Parse timecodes ---
         try:
-            start_tc = self.audio_start_input.text().strip()
-            end_tc = self.audio_end_input.text().strip()
-            audio_start_s = KaraokeApp.parse_timecode_to_seconds(start_tc)
-            self.progress_bar.setValue(15)
-            QApplication.processEvents()
-
-            audio_end_s = KaraokeApp.parse_timecode_to_seconds(end_tc)
-            self.progress_bar.setValue(20)
+            audio_start_s = KaraokeApp.parse_timecode_to_seconds(self.audio_start_input.text().strip())
+            audio_end_s = KaraokeApp.parse_timecode_to_seconds(self.audio_end_input.text().strip())
         except ValueError as e:
             self.progress_label.setText(f"❌ Erreur de timecode : {e}")
-            self.btn_generate.setEnabled(True)
-            return
-
-        # --- Trim audio ---
-        try:
-            self.progress_label.setText("✂️ Lecture audio...")
-            QApplication.processEvents()
-            audio = AudioSegment.from_file(audio_path)
-            self.progress_bar.setValue(30)
-
-            self.progress_label.setText("✂️ Découpe audio...")
-            QApplication.processEvents()
-            start_ms = int(audio_start_s * 1000)
-            end_ms = int(audio_end_s * 1000) if audio_end_s != -1 else None
-            trimmed_segment = audio[start_ms:end_ms] if end_ms else audio[start_ms:]
-            self.progress_bar.setValue(40)
-
-            ext = os.path.splitext(audio_path)[1].lstrip('.').lower()
-            base_name = os.path.splitext(os.path.basename(audio_path))[0]
-            trimmed_audio_name = sanitize_filename(base_name + "_trimmed") + f".{ext}"
-            trimmed_audio_path = os.path.join(out_dir, trimmed_audio_name)
-
-            self.progress_label.setText("✂️ Export audio...")
-            QApplication.processEvents()
-            trimmed_segment.export(trimmed_audio_path, format=ext)
-            self.progress_bar.setValue(50)
-
-            self.progress_label.setText("✅ Audio découpé")
-            QApplication.processEvents()
-            self.progress_bar.setValue(65)
-        except Exception as e:
-            self.progress_label.setText(f"❌ Erreur découpe audio : {e}")
-            self.btn_generate.setEnabled(True)
-            return
+            return None
+        # "" ou "-1" pour le début = depuis le début
+        audio_start_s = max(0.0, audio_start_s)
 
         # --- Chroma parameters ---
         try:
@@ -728,46 +698,142 @@ class KaraokeApp(QWidget):
             chroma_blend = float(self.chroma_blend_input.text().strip())
         except ValueError as e:
             self.progress_label.setText(f"❌ Erreur paramètres chroma : {e}")
-            self.btn_generate.setEnabled(True)
+            return None
+
+        job = {
+            "audio": audio_path,
+            "lyrics": lyrics_text,
+            "output_dir": out_dir,
+            "audio_start": audio_start_s,
+            "audio_end": audio_end_s,
+            "bg_video": self.bg_input.text().strip() or None,
+            "fps": self.fps_input.value(),
+            "shadow": self.shadow_input.value(),
+            "chroma_start": chroma_start,
+            "chroma_speed": chroma_speed,
+            "chroma_sim": chroma_sim,
+            "chroma_blend": chroma_blend,
+            "font_name": self.font_input.currentText(),
+            "encoder": self.encoder_input.currentText(),
+            "preset": self.preset_input.currentText(),
+            "highlight": self.highlight_input.isChecked(),
+            "video_preset": self.video_preset_input.currentText(),
+        }
+        return job
+
+    def submit_job(self, job):
+        if self.queue_worker is None:
+            self.progress_label.setText("❌ Dépendances manquantes, lancez install.py")
             return
+        job_id = self.queue_worker.submit(job)
+        self._add_queue_item(job_id, self.render_queue.get(job_id))
+        self.progress_label.setText("📥 Ajouté à la file")
 
-        self.progress_bar.setValue(80)
-
-        # --- Start worker ---
-        self.worker = Worker(
-            audio_file=trimmed_audio_path,
-            text_file=temp_txt,
-            output_dir=out_dir,
-            fps=self.fps_input.value(),
-            shadow=self.shadow_input.value(),
-            bg_video=self.bg_input.text().strip() or None,
-            chroma_start=chroma_start,
-            chroma_speed=chroma_speed,
-            chroma_sim=chroma_sim,
-            chroma_blend=chroma_blend,
-            font_name=self.font_input.currentText(),
-            encoder=self.encoder_input.currentText(),
-            preset=self.preset_input.currentText()
-        )
-        self.worker.progress.connect(self.update_progress)
-        self.worker.finished.connect(self.finish_progress)
-        self.worker.start()
+    def generate(self):
+        """Ajoute le job du formulaire à la file de rendu (aucun travail bloquant ici)."""
+        job = self.build_job()
+        if job is not None:
+            self.submit_job(job)
+
+    def preview(self):
+        """Aperçu basse résolution (éventuellement d'une fenêtre du morceau), même mise en page que le rendu final."""
+        job = self.build_job()
+        if job is None:
+            return
+        try:
+            start_s = KaraokeApp.parse_timecode_to_seconds(self.preview_start_input.text().strip())
+            end_s = KaraokeApp.parse_timecode_to_seconds(self.preview_end_input.text().strip())
+        except ValueError as e:
+            self.progress_label.setText(f"❌ Erreur de timecode (aperçu) : {e}")
+            return
+        job["preview"] = True
+        if start_s != -1 or end_s != -1:
+            job["preview_window"] = [max(0.0, start_s), end_s]
+        self.submit_job(job)
+
+    def open_frame_preview(self):
+        """Ouvre l'aperçu image par image sur le dernier LRC du projet (aligné au moins une fois)."""
+        out_dir = self.get_output_dir()
+        lrcs = [os.path.join(out_dir, f) for f in os.listdir(out_dir) if f.endswith(".lrc")]
+        if not lrcs:
+            self.progress_label.setText("❌ Aucun fichier LRC dans le projet : lancez d'abord un aperçu ou un rendu")
+            return
+        lrc_path = max(lrcs, key=os.path.getmtime)
+        try:
+            self.preview_window = PreviewWindow(
+                lrc_path,
+                self.font_input.currentText(),
+                self.shadow_input.value(),
+                self.highlight_input.isChecked(),
+                self.video_preset_input.currentText(),
+            )
+        except Exception as e:
+            self.progress_label.setText(f"❌ Aperçu impossible : {e}")
+            return
+        self.preview_window.show()
+
+    def cancel_generation(self):
+        """Annule le job sélectionné dans la file (ou, à défaut, les jobs en cours)."""
+        if self.queue_worker is None:
+            return
+        selected = self.queue_list.selectedItems()
+        if selected:
+            job_ids = [item.data(Qt.ItemDataRole.UserRole) for item in selected]
+        else:
+            job_ids = self.render_queue.ids(RUNNING)
+        for job_id in job_ids:
+            self.queue_worker.cancel(job_id)
+        if job_ids:
+            self.progress_label.setText("⏹️ Annulation...")
+
+    # --- File de rendu
+    def start_queue(self):
+        if not HAS_DEPS:
+            self.progress_label.setText("❌ Dépendances manquantes, lancez install.py")
+            return
+        self.render_queue = RenderQueue()
+        # on ne réaffiche que ce qui reste à faire (les jobs interrompus reprennent)
+        self.render_queue.clear_finished()
+        for rec in self.render_queue.records:
+            self._add_queue_item(rec["id"], rec)
+        self.queue_worker = QueueWorker(self.render_queue, warm_up=self.warm_up)
+        self.queue_worker.job_started.connect(self.job_started)
+        self.queue_worker.job_progress.connect(self.update_progress)
+        self.queue_worker.job_finished.connect(self.finish_progress)
+        self.queue_worker.start()
+
+    def _add_queue_item(self, job_id, rec):
+        item = QListWidgetItem()
+        item.setData(Qt.ItemDataRole.UserRole, job_id)
+        self.queue_list.addItem(item)
+        self.queue_items[job_id] = item
+        self._set_queue_item(job_id, "⏳ en attente")
+
+    def _set_queue_item(self, job_id, text):
+        item = self.queue_items.get(job_id)
+        if item is not None:
+            rec = self.render_queue.get(job_id)
+            item.setText(f"{rec['label'] if rec else job_id} — {text}")
+
+    def job_started(self, job_id: str):
+        self._set_queue_item(job_id, "▶️ démarrage...")
 
     # petites fonctions utilitaires pour mettre à jour l'UI depuis le worker
-    def update_progress(self, message: str):
+    def update_progress(self, job_id: str, message: str, percent: int = -1):
+        self._set_queue_item(job_id, f"{max(percent, 0)}% {message}")
         self.progress_label.setText(message)
-        # on augmente légèrement la barre pour donner du feedback ; le worker émet des étapes
-        current = self.progress_bar.value()
-        self.progress_bar.setValue(min(100, current + 10))
+        # le worker envoie un pourcentage global réel (-1 = garder la valeur actuelle)
+        if percent >= 0:
+            self.progress_bar.setValue(min(100, percent))
 
-    def finish_progress(self, success: bool, payload: str):
+    def finish_progress(self, job_id: str, success: bool, payload: str):
+        self._set_queue_item(job_id, f"✅ {payload}" if success else f"❌ {payload}")
         if success:
             self.progress_label.setText(f"✅ Terminé : {payload}")
             self.progress_bar.setValue(100)
         else:
             self.progress_label.setText(f"❌ Erreur : {payload}")
             self.progress_bar.setValue(0)
-        self.btn_generate.setEnabled(True)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
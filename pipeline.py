@@ -0,0 +1,561 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import chroma_video
+import audio_tools
+import downloads
+import tracing
+from downloads import is_youtube_url
+
+# ====== PIPELINE ======
+# download -> trim -> align -> render -> overlay
+# Chaque étape est chronométrée ; l'annulation est vérifiée entre les étapes
+# et à chaque événement de progression (téléchargement, rendu, ffmpeg).
+STAGES = ("download", "trim", "align", "render", "overlay")
+
+# part de la barre de progression globale pour chaque étape (render s'étend si pas d'overlay)
+STAGE_RANGES = {
+    "download": (0, 10),
+    "trim": (10, 15),
+    "align": (15, 30),
+    "render": (30, 75),
+    "overlay": (75, 100),
+}
+
+# géométries de sortie (largeur, hauteur) ; le texte suit le petit côté
+RENDER_PRESETS = {
+    "1:1": (1080, 1080),
+    "9:16": (1080, 1920),
+    "16:9": (1920, 1080),
+    "4K 16:9": (3840, 2160),
+    "4K 9:16": (2160, 3840),
+}
+
+DEFAULT_JOB = {
+    "audio": "",
+    "lyrics": "",
+    "output_dir": "",
+    "audio_start": 0.0,
+    "audio_end": -1,
+    "bg_video": None,
+    "fps": 60,
+    "shadow": 7,
+    "chroma_start": chroma_video.DEFAULT_START,
+    "chroma_speed": chroma_video.DEFAULT_SPEED,
+    "chroma_sim": chroma_video.DEFAULT_SIMILARITY,
+    "chroma_blend": chroma_video.DEFAULT_BLEND,
+    "font_name": "COMICBD",
+    "highlight": False,
+    "encoder": chroma_video.DEFAULT_ENCODER,
+    "preset": chroma_video.DEFAULT_PRESET,
+    "video_preset": "1:1",
+    # pagination "timing" (durée des pages + coupures aux silences) ou "random" (1 à 3 lignes,
+    # graine layout_seed ; None : dérivée des paroles)
+    "pagination": "timing",
+    "layout_seed": None,
+    # aperçu : basse résolution/fps, x264 ultrafast, sans overlay ; preview_window = [début, fin] en secondes
+    "preview": False,
+    "preview_window": None,
+    # profileur des étapes CPU : None, "cprofile" ou "pyinstrument" (fichier à côté de la sortie)
+    "profile": None,
+    # sorties multiples [{"video_preset": "9:16", "bitrate": "6M", "name": optionnel}, ...] : alignement
+    # une fois, une vidéo des paroles par géométrie, un seul passage d'overlay pour toutes
+    # (sans fond : une sortie par géométrie, débit ignoré). None : une sortie en video_preset.
+    "renditions": None,
+    # rendu du texte : "pil" (image par image) ou "ass" (script ASS incrusté par libass en un seul
+    # passage ffmpeg, sur le fond ou sur le vert du chroma ; les paroles avec emoji restent en "pil")
+    "renderer": "pil",
+    # écrit aussi <base>.ass et <base>.vtt (mêmes pages et mêmes temps que la vidéo)
+    "export_subtitles": False,
+}
+
+class JobCancelled(Exception):
+    pass
+
+def sanitize_filename(name: str) -> str:
+    """Remplace tous les caractères problématiques par '_' et limite la longueur"""
+    name = re.sub(r'[^\w\-_.]', '_', name)
+    return name[:200]
+
+def trim_audio(audio_path, output_dir, start_s, end_s):
+    """Découpe l'audio dans output_dir (stream copy ffmpeg, voir audio_tools.trim_audio)."""
+    ext = os.path.splitext(audio_path)[1].lower()
+    base_name = downloads.cache_title(audio_path)
+    trimmed_audio_path = os.path.join(output_dir, sanitize_filename(base_name + "_trimmed") + ext)
+    return audio_tools.trim_audio(audio_path, trimmed_audio_path, start_s, end_s)
+
+def video_size(preset):
+    """Nom de RENDER_PRESETS, "LxH" ou (l, h)."""
+    if isinstance(preset, (list, tuple)):
+        return tuple(int(v) for v in preset)
+    if preset in RENDER_PRESETS:
+        return RENDER_PRESETS[preset]
+    width, height = str(preset).lower().split("x")
+    return int(width), int(height)
+
+def _file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _alignment_key(audio_path, transcript_path):
+    """Empreintes de l'audio et des paroles d'un alignement (stockées dans <lrc>.key)."""
+    return {"audio": _file_sha1(audio_path), "transcript": _file_sha1(transcript_path)}
+
+def _read_alignment_key(lrc_path):
+    stamp = lrc_path + ".key"
+    if not os.path.isfile(lrc_path) or not os.path.isfile(stamp):
+        return None
+    try:
+        with open(stamp, "r", encoding="utf-8") as f:
+            key = json.load(f)
+    except ValueError:
+        return None  # ancien format : une seule empreinte
+    return key if isinstance(key, dict) else None
+
+def _write_alignment_key(lrc_path, key):
+    with open(lrc_path + ".key", "w", encoding="utf-8") as f:
+        json.dump(key, f)
+
+def _alignment_is_fresh(lrc_path, key):
+    return _read_alignment_key(lrc_path) == key
+
+def _run_downloads(tasks, st):
+    """Lance les téléchargements en même temps ; la progression affichée est leur moyenne."""
+    percents = dict.fromkeys(tasks, 0.0)
+    failed = threading.Event()
+
+    def progress_for(kind):
+        def cb(ev):
+            # un téléchargement en échec (ou une annulation) arrête aussi l'autre
+            st.check()
+            if failed.is_set():
+                raise RuntimeError("téléchargement interrompu")
+            percents[kind] = ev["percent"] or 0.0
+            total = sum(percents.values()) / len(percents)
+            st.emit(f"🔽 Téléchargement ({', '.join(percents)}) {total:.0f}%", total)
+        return cb
+
+    resolved = {}
+    with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+        futures = {
+            kind: pool.submit(func, url, on_progress=progress_for(kind), **kwargs)
+            for kind, (func, url, kwargs) in tasks.items()
+        }
+        try:
+            for kind, fut in futures.items():
+                resolved[kind] = fut.result()
+        except BaseException:
+            failed.set()
+            raise
+    return resolved
+
+class _Stage:
+    """Chronomètre une étape (timings + span de la trace) et fabrique ses callbacks de progression/annulation."""
+
+    def __init__(self, name, lo, hi, timings, on_progress, cancel_event, trace=tracing.NULL_TRACE):
+        self.name = name
+        self.lo = lo
+        self.hi = hi
+        self.timings = timings
+        self.on_progress = on_progress
+        self.cancel_event = cancel_event
+        self.span = trace.span(name)
+
+    def __enter__(self):
+        self.check()
+        self.span.__enter__()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings[self.name] = time.perf_counter() - self.t0
+        self.span.__exit__(*exc)
+        return False
+
+    def check(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise JobCancelled(self.name)
+
+    def emit(self, message, percent=0.0):
+        if self.on_progress is not None:
+            self.on_progress(self.name, message, int(self.lo + (self.hi - self.lo) * percent / 100))
+
+    def callback(self, label):
+        """Callback pour les événements frame/time/speed/percent/eta (rendu, ffmpeg, yt-dlp)."""
+        def cb(ev):
+            self.check()
+            if ev["percent"] is None:
+                return
+            msg = f"{label} {ev['percent']:.0f}%"
+            if ev["eta"] is not None:
+                msg += f" (reste {ev['eta']:.0f}s)"
+            self.emit(msg, ev["percent"])
+        return cb
+
+def _stage_factory(timings, on_progress, cancel_event, trace=tracing.NULL_TRACE):
+    def stage(name, hi=None):
+        lo, default_hi = STAGE_RANGES[name]
+        return _Stage(name, lo, hi if hi is not None else default_hi, timings, on_progress, cancel_event, trace)
+    return stage
+
+def prepare_job(job, on_progress=None, cancel_event=None, on_source=None, trace=None):
+    """
+    Étapes I/O du job : téléchargements puis découpe audio + écriture des paroles.
+    Retourne un contexte (dict sérialisable) à passer à render_prepared.
+    trace : tracing.Trace à compléter (une nouvelle sinon), transmise dans le contexte.
+    """
+    job = {**DEFAULT_JOB, **job}
+    timings = {}
+    out_dir = job["output_dir"]
+    os.makedirs(out_dir, exist_ok=True)
+    trace = trace or tracing.Trace(os.path.basename(out_dir.rstrip("/\\")))
+    stage = _stage_factory(timings, on_progress, cancel_event, trace)
+
+    # 1) Téléchargements (audio et fond en parallèle, cache local par id/format)
+    audio_path = job["audio"]
+    bg_path = job["bg_video"] or None
+    chroma_start = job["chroma_start"]
+    with stage("download") as st:
+        tasks = {}
+        if is_youtube_url(audio_path):
+            tasks["audio"] = (downloads.download_youtube_audio, audio_path, {})
+        if bg_path and is_youtube_url(bg_path):
+            # seule la section utile du fond est téléchargée : elle commence donc à 0
+            tasks["bg_video"] = (downloads.download_youtube_video, bg_path, {"start": chroma_start})
+        if tasks:
+            resolved = _run_downloads(tasks, st)
+            if "audio" in resolved:
+                audio_path = resolved["audio"]
+            if "bg_video" in resolved:
+                bg_path = resolved["bg_video"]
+                chroma_start = 0.0
+            if on_source is not None:
+                for kind, path in resolved.items():
+                    on_source(kind, path)
+        st.emit("✅ Sources prêtes", 100)
+
+    # 2) Découpe audio + paroles
+    with stage("trim") as st, tracing.activate(trace):
+        st.emit("✂️ Découpe audio...")
+        trimmed_audio_path = trim_audio(audio_path, out_dir, job["audio_start"], job["audio_end"])
+        transcript = os.path.join(out_dir, "transcript.txt")
+        with open(transcript, "w", encoding="utf-8") as f:
+            f.write(job["lyrics"])
+        # seul décodage du job : PCM 16 kHz mono pour l'aligneur, qui donne aussi la durée exacte ;
+        # le fichier découpé (stream copy) reste la source du mux
+        st.emit("🔊 Décodage audio...", 50)
+        base_name = os.path.splitext(os.path.basename(trimmed_audio_path))[0]
+        align_audio = os.path.join(out_dir, f"{base_name}_16k.wav")
+        if os.path.exists(align_audio) and os.path.getmtime(align_audio) >= os.path.getmtime(trimmed_audio_path):
+            duration = audio_tools.wav_duration(align_audio)
+        else:
+            duration = audio_tools.decode_pcm(trimmed_audio_path, align_audio)
+        st.emit("✅ Audio découpé", 100)
+
+    return {
+        "job": job,
+        "audio": trimmed_audio_path,
+        "transcript": transcript,
+        "bg_video": bg_path,
+        "chroma_start": chroma_start,
+        "align_audio": align_audio,
+        "duration": duration,
+        "base_name": base_name,
+        "timings": timings,
+        "trace": trace.to_dict(),
+    }
+
+def render_prepared(ctx, on_progress=None, cancel_event=None):
+    """
+    Étapes CPU du job (alignement, rendu, overlay) à partir du contexte de prepare_job.
+    Peut tourner dans un autre process : ctx et le résultat sont de simples dicts.
+    Écrit le rapport de trace (<sortie>.trace.json) et, si job["profile"], le profil à côté.
+    """
+    job = ctx["job"]
+    trace = tracing.Trace.from_dict(ctx.get("trace"))
+    profile_base = os.path.join(job["output_dir"], ctx["base_name"])
+    with tracing.activate(trace), tracing.profiled(job.get("profile"), profile_base) as profile_path:
+        result = _render_stages(ctx, trace, on_progress, cancel_event)
+    result["report"] = trace.write(os.path.splitext(result["output"])[0] + ".trace.json")
+    if profile_path:
+        result["profile"] = profile_path
+    return result
+
+def _render_stages(ctx, trace, on_progress, cancel_event):
+    # imports lourds (torch, librosa, av) seulement dans le process qui fait le rendu
+    from force_align import generate_lrc, update_lrc
+    from generate_vid import generate_lyrics_video
+
+    job = ctx["job"]
+    timings = dict(ctx["timings"])
+    out_dir = job["output_dir"]
+    base_name = ctx["base_name"]
+    audio_path = ctx["audio"]
+    bg_path = ctx["bg_video"]
+    stage = _stage_factory(timings, on_progress, cancel_event, trace)
+
+    # 3) Alignement
+    # même audio + mêmes paroles : le LRC existant est réutilisé (aperçu puis rendu final) ;
+    # même audio + paroles retouchées : seuls les passages modifiés sont réalignés
+    with stage("align") as st:
+        lrc_path = os.path.join(out_dir, f"{base_name}.lrc")
+        key = _alignment_key(audio_path, ctx["transcript"])
+        previous = _read_alignment_key(lrc_path)
+        if previous == key:
+            st.emit("📝 Fichier LRC à jour, alignement ignoré", 100)
+        elif previous and previous.get("audio") == key["audio"] and ctx.get("align_audio") \
+                and update_lrc(ctx["align_audio"], ctx["transcript"], lrc_path):
+            st.emit("📝 LRC mis à jour (passages modifiés seulement)", 100)
+            _write_alignment_key(lrc_path, key)
+        else:
+            st.emit("📝 Génération du fichier LRC...")
+            generate_lrc(ctx.get("align_audio") or audio_path, ctx["transcript"], lrc_path)
+            _write_alignment_key(lrc_path, key)
+
+    renditions = job.get("renditions")
+    if renditions and not job["preview"]:
+        return _render_renditions(ctx, renditions, lrc_path, timings, stage)
+
+    preview = job["preview"]
+    if job["renderer"] == "ass" and not preview:
+        result = _render_ass(ctx, lrc_path, timings, stage)
+        if result is not None:
+            return result
+
+    # 4) Vidéo des paroles (l'aperçu s'arrête là : pas d'overlay)
+    if preview:
+        bg_path = None
+    render_hi = None if bg_path else 100
+    with stage("render", render_hi) as st:
+        st.emit("🎬 Génération de l'aperçu..." if preview else "🎬 Génération de la vidéo des paroles...")
+        suffix = "_preview" if preview else "_lyrics"
+        lyrics_video_path = os.path.join(out_dir, f"{base_name}{suffix}.mp4")
+        generate_lyrics_video(
+            mp3_path=audio_path,
+            duration=ctx.get("duration"),
+            lrc_path=lrc_path,
+            out_path=lyrics_video_path,
+            fps=job["fps"],
+            shadow=job["shadow"],
+            font_gui=job["font_name"],
+            highlight=job["highlight"],
+            video_size=video_size(job["video_preset"]),
+            layout_seed=job["layout_seed"],
+            pagination=job["pagination"],
+            preview=preview,
+            window=job["preview_window"] if preview else None,
+            # segments par pages gardés d'un rendu à l'autre : après une retouche, seuls
+            # les segments dont les pages ont changé sont ré-encodés
+            segment_dir=None if preview else os.path.join(out_dir, f"{base_name}_segments"),
+            on_progress=st.callback("🎬 Aperçu" if preview else "🎬 Vidéo des paroles")
+        )
+        subtitles = None
+        if job["export_subtitles"] and not preview:
+            size = video_size(job["video_preset"])
+            subtitles = _write_subtitles(ctx, _subtitle_layout(ctx, lrc_path, size), size)
+
+    if not bg_path:
+        return {"output": lyrics_video_path, "timings": timings, "subtitles": subtitles}
+
+    # 5) Superposition chroma
+    with stage("overlay") as st:
+        final_path = overlay(ctx, lyrics_video_path, st)
+
+    return {"output": final_path, "timings": timings, "subtitles": subtitles}
+
+def _subtitle_layout(ctx, lrc_path, size):
+    """Mise en page du rendu PIL (même cache) : (word_positions, text_lines, pages)."""
+    from generate_vid import load_lyric_words, cached_layout, layout_cache_path
+
+    job = ctx["job"]
+    return cached_layout(load_lyric_words(lrc_path), job["font_name"], size, layout_cache_path(lrc_path, size),
+                         job["layout_seed"], job["pagination"])
+
+def _write_subtitles(ctx, layout, size):
+    """<base>.ass et <base>.vtt dans le dossier de sortie ; retourne leurs chemins."""
+    import subtitles
+
+    job = ctx["job"]
+    word_positions, text_lines, pages = layout
+    return subtitles.write_subtitles(
+        os.path.join(job["output_dir"], ctx["base_name"]), word_positions, text_lines, pages,
+        font_gui=job["font_name"], video_size=size, shadow=job["shadow"], highlight=job["highlight"],
+        duration=ctx.get("duration"),
+    )
+
+def _render_ass(ctx, lrc_path, timings, stage):
+    """
+    Étapes 4 et 5 en un passage : le script ASS est incrusté par libass directement sur le fond
+    (ou sur le vert du chroma sans fond). None si les paroles ont des emoji (rendu PIL).
+    """
+    import subtitles
+    from generate_vid import FONTS_DIR
+
+    job = ctx["job"]
+    size = video_size(job["video_preset"])
+    layout = _subtitle_layout(ctx, lrc_path, size)
+    if subtitles.has_emoji(layout[0]):
+        return None
+
+    bg_path = ctx["bg_video"]
+    suffix = "_final" if bg_path else "_lyrics"
+    out_path = os.path.join(job["output_dir"], f"{ctx['base_name']}{suffix}.mp4")
+    with stage("render", 100) as st:
+        st.emit("📝 Écriture des sous-titres...")
+        ass_path, vtt_path = _write_subtitles(ctx, layout, size)
+        st.emit("🎬 Incrustation des sous-titres..." if bg_path else "🎬 Vidéo des paroles (libass)...", 5)
+        options = _chroma_options(ctx)
+        for key in ("similarity", "blend"):
+            options.pop(key)
+        rc, log = chroma_video.burn_subtitles(
+            ass_path=ass_path,
+            audio_path=ctx["audio"],
+            out_path=out_path,
+            duration=ctx["duration"],
+            size=size,
+            fps=job["fps"],
+            bg_path=bg_path,
+            fonts_dir=FONTS_DIR,
+            on_progress=st.callback("🎬 Incrustation"),
+            **options
+        )
+        if rc != 0:
+            raise RuntimeError(f"ffmpeg a échoué (code {rc}), voir {log}")
+
+    return {"output": out_path, "timings": timings, "subtitles": [ass_path, vtt_path]}
+
+def _chroma_options(ctx):
+    job = ctx["job"]
+    return {
+        "start_time": ctx["chroma_start"],
+        "speed": job["chroma_speed"],
+        "similarity": job["chroma_sim"],
+        "blend": job["chroma_blend"],
+        "bg_color": "00ff00",
+        "encoder": job["encoder"],
+        "preset": job["preset"],
+    }
+
+def overlay(ctx, lyrics_video_path, st):
+    """Superpose la vidéo des paroles sur le fond (étape "overlay", st : _Stage). Retourne la sortie finale."""
+    st.emit("🖌️ Superposition de la vidéo...")
+    final_path = os.path.join(ctx["job"]["output_dir"], f"{ctx['base_name']}_final.mp4")
+    rc, log = chroma_video.overlay_chroma(
+        bg_path=ctx["bg_video"],
+        fg_path=lyrics_video_path,
+        out_path=final_path,
+        on_progress=st.callback("🖌️ Superposition"),
+        **_chroma_options(ctx)
+    )
+    if rc != 0:
+        raise RuntimeError(f"ffmpeg a échoué (code {rc}), voir {log}")
+    return final_path
+
+def rendition_tag(rendition):
+    """Suffixe de fichier d'une rendition : son "name", sinon "9x16", "4K_16x9_6M"..."""
+    if rendition.get("name"):
+        return sanitize_filename(rendition["name"])
+    tag = rendition["video_preset"].replace(":", "x").replace(" ", "_")
+    return f"{tag}_{rendition['bitrate']}" if rendition.get("bitrate") else tag
+
+def check_rendition_tags(renditions):
+    """ValueError si deux renditions donneraient le même fichier de sortie."""
+    seen = set()
+    for rendition in renditions:
+        # insensible à la casse : même fichier sur Windows/macOS
+        tag = rendition_tag(rendition).lower()
+        if tag in seen:
+            raise ValueError(f"renditions en double ({rendition_tag(rendition)}) : donner un \"name\" distinct")
+        seen.add(tag)
+
+def _render_renditions(ctx, renditions, lrc_path, timings, stage):
+    """Étapes 4 et 5 pour une liste de renditions (voir DEFAULT_JOB["renditions"])."""
+    from generate_vid import generate_lyrics_video
+
+    check_rendition_tags(renditions)
+    job = ctx["job"]
+    out_dir = job["output_dir"]
+    base_name = ctx["base_name"]
+    presets = list(dict.fromkeys(r["video_preset"] for r in renditions))
+
+    # 4) Une vidéo des paroles par géométrie (mise en page et segments propres à chacune)
+    lyrics_videos = {}
+    with stage("render", None if ctx["bg_video"] else 100) as st:
+        for n, preset in enumerate(presets):
+            tag = rendition_tag({"video_preset": preset})
+
+            def on_progress(ev, n=n, preset=preset):
+                st.check()
+                if ev["percent"] is not None:
+                    st.emit(f"🎬 Paroles {preset} {ev['percent']:.0f}%", (100 * n + ev["percent"]) / len(presets))
+
+            st.emit(f"🎬 Vidéo des paroles {preset} ({n + 1}/{len(presets)})...", 100 * n / len(presets))
+            lyrics_videos[preset] = os.path.join(out_dir, f"{base_name}_lyrics_{tag}.mp4")
+            generate_lyrics_video(
+                mp3_path=ctx["audio"],
+                duration=ctx.get("duration"),
+                lrc_path=lrc_path,
+                out_path=lyrics_videos[preset],
+                fps=job["fps"],
+                shadow=job["shadow"],
+                font_gui=job["font_name"],
+                highlight=job["highlight"],
+                video_size=video_size(preset),
+                layout_seed=job["layout_seed"],
+                pagination=job["pagination"],
+                segment_dir=os.path.join(out_dir, f"{base_name}_segments_{tag}"),
+                on_progress=on_progress
+            )
+
+    if not ctx["bg_video"]:
+        outputs = [lyrics_videos[p] for p in presets]
+        return {"output": outputs[0], "outputs": outputs, "timings": timings}
+
+    # 5) Un seul passage ffmpeg : fond décodé une fois, toutes les sorties encodées ensemble
+    with stage("overlay") as st:
+        st.emit(f"🖌️ Superposition de {len(renditions)} renditions...")
+        items = [{
+            "fg_path": lyrics_videos[r["video_preset"]],
+            "out_path": os.path.join(out_dir, f"{base_name}_final_{rendition_tag(r)}.mp4"),
+            "size": video_size(r["video_preset"]),
+            "bitrate": r.get("bitrate"),
+        } for r in renditions]
+        rc, log = chroma_video.overlay_chroma_multi(
+            bg_path=ctx["bg_video"],
+            renditions=items,
+            on_progress=st.callback("🖌️ Superposition"),
+            **_chroma_options(ctx)
+        )
+        if rc != 0:
+            raise RuntimeError(f"ffmpeg a échoué (code {rc}), voir {log}")
+
+    outputs = [item["out_path"] for item in items]
+    return {"output": outputs[0], "outputs": outputs, "timings": timings}
+
+def run_job(job, on_progress=None, cancel_event=None, on_source=None):
+    """
+    Exécute un job complet (voir DEFAULT_JOB pour les clés) dans le thread courant.
+    - on_progress(stage, message, percent_global)
+    - cancel_event : threading.Event ; lève JobCancelled dès qu'il est positionné
+    - on_source(kind, path) : appelé quand un lien YouTube a été résolu en fichier local ("audio"/"bg_video")
+    Retourne {"output": chemin final, "timings": {étape: secondes}}.
+    """
+    ctx = prepare_job(job, on_progress, cancel_event, on_source)
+    return render_prepared(ctx, on_progress, cancel_event)
+
+def warm_up():
+    """Précharge l'aligneur et les libs de rendu (à appeler dans un thread/process en arrière-plan)."""
+    import force_align
+    import generate_vid
+    force_align.warm_up()
+    generate_vid.warm_up()
+
+def format_timings(timings):
+    return ", ".join(f"{name} {timings[name]:.1f}s" for name in STAGES if name in timings)
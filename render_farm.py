@@ -0,0 +1,519 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import socket
+import sqlite3
+import argparse
+import tempfile
+import threading
+import traceback
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pipeline
+import tracing
+
+# ====== FERME DE RENDU ======
+# Un coordinateur prépare chaque job (téléchargements, découpe) puis le découpe en tâches :
+# une tâche d'alignement, puis des segments de rendu alignés sur les pages (chaque segment
+# commence sur un changement de page, donc sur une IDR : la concaténation se fait en copie de flux).
+# Les tâches passent par un broker local, sans service externe : SQLite par défaut, ou un spool
+# de fichiers (à préférer sur un partage réseau, où le verrouillage SQLite n'est pas fiable).
+# Les workers, sur n'importe quelle machine qui voit le dossier partagé (store), réclament les
+# tâches sous bail, rendent en local et publient le résultat dans le store. Un bail expiré
+# (worker tombé) remet la tâche en attente, jusqu'à MAX_ATTEMPTS essais.
+SEGMENT_SECONDS = 20.0
+LEASE_SECONDS = 120.0
+MAX_ATTEMPTS = 3
+POLL_SECONDS = 0.5
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+
+# ====== BROKERS ======
+class SqliteBroker:
+    """Tâches dans une base SQLite : une connexion par appel, réclamation dans une transaction IMMEDIATE."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY, farm TEXT, kind TEXT, payload TEXT, status TEXT,
+            worker TEXT, lease REAL, attempts INTEGER DEFAULT 0, result TEXT, error TEXT, created REAL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, created);
+        CREATE INDEX IF NOT EXISTS tasks_farm ON tasks (farm);
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _task(row):
+        task = dict(row)
+        task["payload"] = json.loads(task["payload"])
+        task["result"] = json.loads(task["result"]) if task["result"] else None
+        return task
+
+    def put(self, farm, kind, payload):
+        task_id = uuid.uuid4().hex[:12]
+        with self._db() as db:
+            db.execute("INSERT INTO tasks (id, farm, kind, payload, status, created) VALUES (?, ?, ?, ?, ?, ?)",
+                       (task_id, farm, kind, json.dumps(payload), PENDING, time.time()))
+        return task_id
+
+    def claim(self, worker):
+        now = time.time()
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("UPDATE tasks SET status = ?, error = ? WHERE status = ? AND lease < ? AND attempts >= ?",
+                           (FAILED, "bail expiré", RUNNING, now, MAX_ATTEMPTS))
+                row = db.execute("SELECT * FROM tasks WHERE status = ? OR (status = ? AND lease < ?) "
+                                 "ORDER BY created LIMIT 1", (PENDING, RUNNING, now)).fetchone()
+                if row is not None:
+                    db.execute("UPDATE tasks SET status = ?, worker = ?, lease = ?, attempts = attempts + 1 WHERE id = ?",
+                               (RUNNING, worker, now + LEASE_SECONDS, row["id"]))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        task = self._task(row)
+        task.update(status=RUNNING, worker=worker, attempts=task["attempts"] + 1)
+        return task
+
+    def renew(self, task_id, worker):
+        with self._db() as db:
+            cur = db.execute("UPDATE tasks SET lease = ? WHERE id = ? AND worker = ? AND status = ?",
+                             (time.time() + LEASE_SECONDS, task_id, worker, RUNNING))
+        return cur.rowcount == 1
+
+    def complete(self, task_id, worker, result):
+        with self._db() as db:
+            db.execute("UPDATE tasks SET status = ?, result = ? WHERE id = ? AND worker = ? AND status = ?",
+                       (DONE, json.dumps(result), task_id, worker, RUNNING))
+
+    def fail(self, task_id, worker, error):
+        with self._db() as db:
+            db.execute("UPDATE tasks SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, error = ?, lease = NULL "
+                       "WHERE id = ? AND worker = ? AND status = ?",
+                       (MAX_ATTEMPTS, FAILED, PENDING, error, task_id, worker, RUNNING))
+
+    def cancel(self, farm):
+        with self._db() as db:
+            db.execute("UPDATE tasks SET status = ? WHERE farm = ? AND status = ?", (CANCELLED, farm, PENDING))
+
+    def tasks(self, farm):
+        with self._db() as db:
+            return [self._task(row) for row in db.execute("SELECT * FROM tasks WHERE farm = ?", (farm,))]
+
+class SpoolBroker:
+    """
+    Tâches en fichiers JSON, un dossier par statut. Réclamer = os.rename de pending/ vers running/ :
+    atomique, un seul worker gagne, y compris sur un partage réseau.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        for status in (PENDING, RUNNING, DONE, FAILED, CANCELLED):
+            os.makedirs(os.path.join(root, status), exist_ok=True)
+
+    def _path(self, status, task_id):
+        return os.path.join(self.root, status, task_id + ".json")
+
+    @staticmethod
+    def _read(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write(path, task):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(task, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _names(self, status):
+        return sorted(n for n in os.listdir(os.path.join(self.root, status)) if n.endswith(".json"))
+
+    def put(self, farm, kind, payload):
+        # l'ordre des noms est l'ordre d'arrivée
+        task_id = f"{time.time_ns():020d}-{farm}-{uuid.uuid4().hex[:6]}"
+        self._write(self._path(PENDING, task_id), {
+            "id": task_id, "farm": farm, "kind": kind, "payload": payload, "worker": None,
+            "lease": None, "attempts": 0, "result": None, "error": None, "created": time.time(),
+        })
+        return task_id
+
+    def _requeue_expired(self):
+        now = time.time()
+        for name in self._names(RUNNING):
+            path = os.path.join(self.root, RUNNING, name)
+            try:
+                task = self._read(path)
+            except (OSError, ValueError):
+                continue
+            if task["lease"] is None or task["lease"] >= now:
+                continue
+            # le renommage désigne un seul process pour la remise en file
+            claimed = f"{path}.{os.getpid()}.expired"
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+            task.update(lease=None, error="bail expiré")
+            status = FAILED if task["attempts"] >= MAX_ATTEMPTS else PENDING
+            self._write(self._path(status, task["id"]), task)
+            os.remove(claimed)
+
+    def claim(self, worker):
+        self._requeue_expired()
+        for name in self._names(PENDING):
+            path = os.path.join(self.root, RUNNING, name)
+            try:
+                os.rename(os.path.join(self.root, PENDING, name), path)
+            except OSError:
+                continue
+            task = self._read(path)
+            task.update(status=RUNNING, worker=worker, lease=time.time() + LEASE_SECONDS,
+                        attempts=task["attempts"] + 1)
+            self._write(path, task)
+            return task
+        return None
+
+    def _owned(self, task_id, worker):
+        path = self._path(RUNNING, task_id)
+        try:
+            task = self._read(path)
+        except (OSError, ValueError):
+            return path, None
+        return path, task if task["worker"] == worker else None
+
+    def renew(self, task_id, worker):
+        path, task = self._owned(task_id, worker)
+        if task is None:
+            return False
+        task["lease"] = time.time() + LEASE_SECONDS
+        self._write(path, task)
+        return True
+
+    def _finish(self, task_id, worker, status, **fields):
+        path, task = self._owned(task_id, worker)
+        if task is None:
+            return
+        task.update(fields)
+        self._write(path, task)
+        os.rename(path, self._path(status, task_id))
+
+    def complete(self, task_id, worker, result):
+        self._finish(task_id, worker, DONE, result=result)
+
+    def fail(self, task_id, worker, error):
+        path, task = self._owned(task_id, worker)
+        if task is not None:
+            self._finish(task_id, worker, FAILED if task["attempts"] >= MAX_ATTEMPTS else PENDING,
+                         error=error, lease=None)
+
+    def cancel(self, farm):
+        for name in self._names(PENDING):
+            if f"-{farm}-" in name:
+                try:
+                    os.rename(os.path.join(self.root, PENDING, name), os.path.join(self.root, CANCELLED, name))
+                except OSError:
+                    pass
+
+    def tasks(self, farm):
+        tasks = []
+        for status in (PENDING, RUNNING, DONE, FAILED, CANCELLED):
+            for name in self._names(status):
+                if f"-{farm}-" not in name:
+                    continue
+                try:
+                    task = self._read(os.path.join(self.root, status, name))
+                except (OSError, ValueError):
+                    continue  # déplacé entre le listing et la lecture
+                task["status"] = status
+                tasks.append(task)
+        return tasks
+
+def open_broker(spec, store):
+    """
+    "sqlite:<fichier>" ou "spool:<dossier>" ; un chemin en .db/.sqlite est une base, un autre chemin un spool.
+    None : <store>/farm.db.
+    """
+    if not spec:
+        return SqliteBroker(os.path.join(store, "farm.db"))
+    if spec.startswith("sqlite:"):
+        return SqliteBroker(spec[len("sqlite:"):])
+    if spec.startswith("spool:"):
+        return SpoolBroker(spec[len("spool:"):])
+    if spec.endswith((".db", ".sqlite")):
+        return SqliteBroker(spec)
+    return SpoolBroker(spec)
+
+# ====== STORE PARTAGÉ ======
+def _publish(src, dst):
+    """Copie atomique (mtime conservé : le .lrt doit rester plus récent que son LRC)."""
+    os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+    tmp_path = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dst)
+    return dst
+
+def _publish_lrc(src, dst):
+    from timings import timings_path
+    _publish(src, dst)
+    if os.path.isfile(timings_path(src)):
+        _publish(timings_path(src), timings_path(dst))
+
+# ====== COORDINATEUR ======
+def _wait(broker, farm, task_ids, st, label):
+    """Attend la fin des tâches (progression de l'étape st) ; retourne les tâches terminées, dans l'ordre."""
+    wanted = set(task_ids)
+    while True:
+        st.check()
+        tasks = {t["id"]: t for t in broker.tasks(farm) if t["id"] in wanted}
+        for task in tasks.values():
+            if task["status"] in (FAILED, CANCELLED):
+                raise RuntimeError(f"tâche {task['kind']} en échec après {task['attempts']} essai(s) : {task['error']}")
+        done = sum(1 for t in tasks.values() if t["status"] == DONE)
+        st.emit(f"{label} {done}/{len(wanted)}", 100.0 * done / len(wanted))
+        if done == len(wanted):
+            return [tasks[i] for i in task_ids]
+        time.sleep(POLL_SECONDS)
+
+def run_farm_job(job, broker, store, on_progress=None, cancel_event=None, segment_seconds=SEGMENT_SECONDS):
+    """
+    Coordinateur d'un job : préparation locale, alignement et segments sur la ferme,
+    concaténation puis overlay en local. Même retour que pipeline.render_prepared.
+    """
+    from generate_vid import load_lyric_words, cached_layout, layout_cache_path, segment_frames, concat_segments
+
+    job = {**pipeline.DEFAULT_JOB, **job}
+    ctx = pipeline.prepare_job(job, on_progress, cancel_event)
+    if job["preview"] or job["renditions"] or job["renderer"] == "ass":
+        # un aperçu est trop court pour valoir un découpage ; les renditions partagent un seul overlay local ;
+        # le rendu libass est déjà un seul passage ffmpeg
+        return pipeline.render_prepared(ctx, on_progress, cancel_event)
+
+    farm = uuid.uuid4().hex[:12]
+    farm_dir = os.path.join(store, farm)
+    timings = dict(ctx["timings"])
+    trace = tracing.Trace.from_dict(ctx["trace"])
+    stage = pipeline._stage_factory(timings, on_progress, cancel_event, trace)
+    out_dir = job["output_dir"]
+    base_name = ctx["base_name"]
+    lrc_path = os.path.join(out_dir, f"{base_name}.lrc")
+    remote_lrc = f"{farm}/{base_name}.lrc"
+
+    try:
+        with tracing.activate(trace):
+            # 3) Alignement par un worker, sauf si le LRC local est à jour
+            with stage("align") as st:
+                key = pipeline._alignment_key(ctx["audio"], ctx["transcript"])
+                if pipeline._alignment_is_fresh(lrc_path, key):
+                    st.emit("📝 Fichier LRC à jour, alignement ignoré", 100)
+                    _publish_lrc(lrc_path, os.path.join(store, remote_lrc))
+                else:
+                    payload = {"audio": f"{farm}/{os.path.basename(ctx['align_audio'])}",
+                               "transcript": f"{farm}/transcript.txt", "lrc": remote_lrc}
+                    _publish(ctx["align_audio"], os.path.join(store, payload["audio"]))
+                    _publish(ctx["transcript"], os.path.join(store, payload["transcript"]))
+                    task, = _wait(broker, farm, [broker.put(farm, "align", payload)], st, "📝 Alignement sur la ferme")
+                    trace.add_span("farm_align", task["result"]["seconds"], worker=task["worker"])
+                    _publish_lrc(os.path.join(store, remote_lrc), lrc_path)
+                    pipeline._write_alignment_key(lrc_path, key)
+
+            # 4) Segments alignés sur les pages, rendus par les workers
+            render_hi = None if ctx["bg_video"] else 100
+            with stage("render", render_hi) as st:
+                st.emit("🎬 Découpage en segments...")
+                size = pipeline.video_size(job["video_preset"])
+                store_lrc = os.path.join(store, remote_lrc)
+                # mise en page calculée une fois ici : les workers relisent le cache du store
+                word_positions, text_lines, pages = cached_layout(
+                    load_lyric_words(store_lrc), job["font_name"], size, layout_cache_path(store_lrc, size),
+                    job["layout_seed"], job["pagination"])
+                fps = job["fps"]
+                segments = segment_frames(word_positions, text_lines, pages, fps, int(ctx["duration"] * fps),
+                                          max(1, int(segment_seconds * fps)))
+                params = {k: job[k] for k in ("fps", "shadow", "font_name", "highlight", "layout_seed", "pagination")}
+                task_ids = [broker.put(farm, "render", {**params, "lrc": remote_lrc, "video_size": list(size),
+                                                        "frames": [first, end], "out": f"{farm}/seg_{i:04d}.mp4"})
+                            for i, (first, end) in enumerate(segments)]
+                done = _wait(broker, farm, task_ids, st, "🎬 Segments")
+                for task in done:
+                    trace.add_span("farm_segment", task["result"]["seconds"], worker=task["worker"],
+                                   frames=task["payload"]["frames"])
+                st.emit("🎬 Concaténation des segments...", 100)
+                lyrics_video_path = concat_segments([os.path.join(store, t["payload"]["out"]) for t in done],
+                                                    os.path.join(out_dir, f"{base_name}_lyrics.mp4"), ctx["audio"])
+
+            # 5) Superposition chroma
+            output = lyrics_video_path
+            if ctx["bg_video"]:
+                with stage("overlay") as st:
+                    output = pipeline.overlay(ctx, lyrics_video_path, st)
+    except BaseException:
+        broker.cancel(farm)
+        raise
+    finally:
+        # succès ou échec : les fichiers du job sur le store ne servent plus (un worker encore
+        # en cours sur une tâche annulée peut y republier un segment orphelin)
+        shutil.rmtree(farm_dir, ignore_errors=True)
+
+    report = trace.write(os.path.splitext(output)[0] + ".trace.json")
+    return {"output": output, "timings": timings, "report": report}
+
+# ====== WORKER ======
+def _execute(task, store):
+    p = task["payload"]
+    with tempfile.TemporaryDirectory(prefix="farm_") as tmp:
+        if task["kind"] == "align":
+            from force_align import generate_lrc
+            # generate_lrc écrit sa version prétraitée à côté du transcript : copie locale
+            transcript = _publish(os.path.join(store, p["transcript"]), os.path.join(tmp, "transcript.txt"))
+            local_lrc = os.path.join(tmp, os.path.basename(p["lrc"]))
+            generate_lrc(os.path.join(store, p["audio"]), transcript, local_lrc)
+            _publish_lrc(local_lrc, os.path.join(store, p["lrc"]))
+            return {}
+        if task["kind"] == "render":
+            from generate_vid import generate_lyrics_video
+            local_out = os.path.join(tmp, os.path.basename(p["out"]))
+            generate_lyrics_video(
+                mp3_path=None,
+                lrc_path=os.path.join(store, p["lrc"]),
+                out_path=local_out,
+                fps=p["fps"],
+                shadow=p["shadow"],
+                font_gui=p["font_name"],
+                highlight=p["highlight"],
+                video_size=tuple(p["video_size"]),
+                layout_seed=p["layout_seed"],
+                pagination=p["pagination"],
+                frames=tuple(p["frames"]),
+            )
+            _publish(local_out, os.path.join(store, p["out"]))
+            return {"frames": p["frames"][1] - p["frames"][0]}
+    raise ValueError(f"type de tâche inconnu : {task['kind']}")
+
+def run_worker(broker_spec, store, worker_id=None, stop_event=None, idle_exit=None, warm_up=False):
+    """
+    Boucle d'un worker : réclame une tâche, l'exécute (bail renouvelé en arrière-plan), publie le résultat.
+    idle_exit : rend la main après autant de secondes sans tâche (None : jusqu'à stop_event).
+    """
+    broker = open_broker(broker_spec, store)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    if warm_up:
+        try:
+            pipeline.warm_up()
+        except Exception as e:
+            print("Préchargement de l'aligneur impossible:", e)
+
+    idle_since = time.monotonic()
+    while stop_event is None or not stop_event.is_set():
+        task = broker.claim(worker_id)
+        if task is None:
+            if idle_exit is not None and time.monotonic() - idle_since > idle_exit:
+                return
+            time.sleep(POLL_SECONDS)
+            continue
+
+        released = threading.Event()
+
+        def keep_lease(task_id=task["id"]):
+            while not released.wait(LEASE_SECONDS / 3):
+                if not broker.renew(task_id, worker_id):
+                    return
+
+        threading.Thread(target=keep_lease, daemon=True).start()
+        t0 = time.perf_counter()
+        try:
+            result = _execute(task, store)
+        except Exception:
+            print(f"[{worker_id}] ❌ {task['kind']} {task['id']}", flush=True)
+            broker.fail(task["id"], worker_id, traceback.format_exc()[-2000:])
+        else:
+            result["seconds"] = round(time.perf_counter() - t0, 3)
+            broker.complete(task["id"], worker_id, result)
+            print(f"[{worker_id}] ✅ {task['kind']} {task['id']} ({result['seconds']:.1f}s)", flush=True)
+        finally:
+            released.set()
+        idle_since = time.monotonic()
+
+# ====== CLI ======
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ferme de rendu : coordinateur et workers.")
+    sub = parser.add_subparsers(dest="mode", required=True)
+    for mode in ("coordinator", "worker"):
+        p = sub.add_parser(mode)
+        p.add_argument("--store", required=True, help="dossier partagé entre le coordinateur et les workers")
+        p.add_argument("--broker", help="sqlite:<fichier> ou spool:<dossier> (défaut : <store>/farm.db)")
+        if mode == "coordinator":
+            p.add_argument("manifest", help="manifeste JSON ou JSONL de jobs (voir render_queue.load_manifest)")
+            p.add_argument("--jobs", type=int, default=2, help="jobs coordonnés en parallèle")
+            p.add_argument("--local-workers", type=int, default=0, help="workers lancés sur cette machine")
+            p.add_argument("--segment-seconds", type=float, default=SEGMENT_SECONDS)
+        else:
+            p.add_argument("--id", help="nom du worker (défaut : hôte-pid)")
+            p.add_argument("--idle-exit", type=float, default=None, help="s'arrête après N secondes sans tâche")
+    args = parser.parse_args(argv)
+    store = os.path.abspath(args.store)
+    os.makedirs(store, exist_ok=True)
+
+    if args.mode == "worker":
+        run_worker(args.broker, store, args.id, idle_exit=args.idle_exit, warm_up=True)
+        return 0
+
+    import render_queue
+    broker = open_broker(args.broker, store)
+    stop = multiprocessing.Event()
+    workers = [multiprocessing.Process(target=run_worker, args=(args.broker, store),
+                                       kwargs={"stop_event": stop, "warm_up": True}, daemon=True)
+               for _ in range(args.local_workers)]
+    for w in workers:
+        w.start()
+
+    def on_progress_for(job_id):
+        def on_progress(stage, message, percent):
+            print(f"[{job_id}] {percent:3d}% {message}", flush=True)
+        return on_progress
+
+    failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            futures = {pool.submit(run_farm_job, job, broker, store, on_progress_for(job_id),
+                                   segment_seconds=args.segment_seconds): job_id
+                       for job_id, job in render_queue.load_manifest(args.manifest)}
+            for fut in as_completed(futures):
+                job_id = futures[fut]
+                try:
+                    result = fut.result()
+                    print(f"[{job_id}] ✅ {result['output']} ({pipeline.format_timings(result['timings'])})", flush=True)
+                except Exception as e:
+                    failed += 1
+                    print(f"[{job_id}] ❌ {e}", flush=True)
+    finally:
+        stop.set()
+        for w in workers:
+            w.join()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+import os
+import sys
+import json
+import time
+import uuid
+import hashlib
+import argparse
+import threading
+import multiprocessing
+import queue as queue_mod
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import pipeline
+import tracing
+
+# ====== FILE DE RENDU ======
+# Les étapes I/O (téléchargement, découpe) tournent dans des threads, les étapes CPU
+# (alignement, rendu, overlay) dans un pool de process borné. La file est un JSON
+# persistant : un job "running" au moment d'un arrêt repasse en "pending" au redémarrage.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUEUE_PATH = os.path.join(BASE_DIR, "songs", "queue.json")
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+def default_workers():
+    # x264/ffmpeg sont déjà multi-threadés : un job CPU pour deux cœurs
+    return max(1, (os.cpu_count() or 2) // 2)
+
+def job_label(job):
+    audio = job.get("audio", "")
+    label = os.path.basename(job.get("output_dir", "").rstrip("/\\")) or os.path.basename(audio) or audio
+    return label + " (aperçu)" if job.get("preview") else label
+
+class RenderQueue:
+    """
+    Liste de jobs persistée dans un fichier JSON (écriture atomique).
+    keep_finished : nombre de jobs terminés conservés (les plus anciens sont oubliés), None = tous.
+    """
+
+    def __init__(self, path=QUEUE_PATH, keep_finished=None):
+        self.path = path
+        self.keep_finished = keep_finished
+        self._lock = threading.Lock()
+        self.records = []
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.records = json.load(f)
+            except Exception as e:
+                print("Erreur lecture de la file:", e)
+        for rec in self.records:
+            if rec["status"] == RUNNING:
+                rec["status"] = PENDING
+        self._index = {rec["id"]: rec for rec in self.records}
+        self._prune()
+
+    def _prune(self):
+        if self.keep_finished is None:
+            return
+        finished = [rec["id"] for rec in self.records if rec["status"] in FINISHED]
+        dropped = set(finished[:max(0, len(finished) - self.keep_finished)])
+        if dropped:
+            self.records = [rec for rec in self.records if rec["id"] not in dropped]
+            for job_id in dropped:
+                del self._index[job_id]
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.records, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def add(self, job, job_id=None):
+        """Ajoute un job ; un job_id déjà présent n'est pas ré-ajouté (reprise d'un manifeste)."""
+        with self._lock:
+            job_id = job_id or uuid.uuid4().hex[:12]
+            if self.get(job_id) is None:
+                self._index[job_id] = {
+                    "id": job_id, "status": PENDING, "job": job,
+                    "label": job_label(job), "output": None, "outputs": None, "error": None, "timings": {},
+                    "submitted_at": time.time(), "report": None,
+                }
+                self.records.append(self._index[job_id])
+                self._save()
+            return job_id
+
+    def get(self, job_id):
+        return self._index.get(job_id)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            rec = self.get(job_id)
+            if rec is not None:
+                rec.update(fields)
+                if fields.get("status") in FINISHED:
+                    self._prune()
+                self._save()
+
+    def ids(self, status):
+        with self._lock:
+            return [rec["id"] for rec in self.records if rec["status"] == status]
+
+    def clear_finished(self):
+        with self._lock:
+            self.records = [rec for rec in self.records if rec["status"] in (PENDING, RUNNING)]
+            self._index = {rec["id"]: rec for rec in self.records}
+            self._save()
+
+def _warm_up_worker():
+    # un échec de préchargement ne doit pas casser le pool : l'erreur réapparaîtra au rendu
+    try:
+        pipeline.warm_up()
+    except Exception as e:
+        print("Préchargement de l'aligneur impossible:", e)
+
+def _render_in_process(job_id, ctx, events, cancel_event):
+    """Point d'entrée du pool de process : étapes CPU d'un job."""
+    def on_progress(stage, message, percent):
+        events.put(("progress", job_id, message, percent))
+    return pipeline.render_prepared(ctx, on_progress, cancel_event)
+
+class Scheduler:
+    """
+    Exécute les jobs "pending" d'une RenderQueue.
+    on_event(kind, job_id, *args) :
+      - ("progress", id, message, percent)
+      - ("started", id) / ("finished", id, success, payload)
+    """
+
+    def __init__(self, render_queue, max_workers=None, on_event=None, warm_up=False):
+        self.queue = render_queue
+        self.warm_up = warm_up
+        self.max_workers = max_workers or default_workers()
+        self.on_event = on_event or (lambda *args: None)
+        self._wake = threading.Event()
+        self._cancel = {}
+        self._manager = None
+        self._stopping = False
+
+    def submit(self, job, job_id=None):
+        job_id = self.queue.add(job, job_id)
+        self._wake.set()
+        return job_id
+
+    def cancel(self, job_id):
+        rec = self.queue.get(job_id)
+        if rec is None:
+            return
+        if rec["status"] == PENDING:
+            self.queue.update(job_id, status=CANCELLED)
+            self.on_event("finished", job_id, False, "annulé")
+        elif job_id in self._cancel:
+            self._cancel[job_id].set()
+
+    def _run_one(self, job_id, cpu_pool, events):
+        rec = self.queue.get(job_id)
+        cancel_event = self._cancel[job_id]
+
+        def on_progress(stage, message, percent):
+            events.put(("progress", job_id, message, percent))
+
+        # le temps passé dans la file fait partie de la trace du job
+        trace = tracing.Trace(rec["label"])
+        if rec.get("submitted_at"):
+            trace.add_span("queued", max(0.0, trace.started_at - rec["submitted_at"]))
+
+        try:
+            ctx = pipeline.prepare_job(rec["job"], on_progress, cancel_event, trace=trace)
+            result = cpu_pool.submit(_render_in_process, job_id, ctx, events, cancel_event).result()
+            self.queue.update(job_id, status=DONE, output=result["output"], outputs=result.get("outputs"),
+                              timings=result["timings"], report=result.get("report"))
+            events.put(("finished", job_id, True, result["output"]))
+        except pipeline.JobCancelled as e:
+            # arrêt de l'appli : le job reprendra au prochain lancement
+            status = PENDING if self._stopping else CANCELLED
+            self.queue.update(job_id, status=status)
+            events.put(("finished", job_id, False, f"annulé pendant l'étape {e}"))
+        except Exception as e:
+            self.queue.update(job_id, status=FAILED, error=str(e))
+            events.put(("finished", job_id, False, str(e)))
+
+    def run(self, stop_event=None, keep_alive=False):
+        """
+        Boucle du scheduler. Avec keep_alive, attend de nouveaux jobs jusqu'à stop_event ;
+        sinon rend la main quand la file est vide.
+        """
+        self._stopping = False
+        self._manager = multiprocessing.Manager()
+        events = self._manager.Queue()
+        in_flight = {}
+        # un job de plus que de slots CPU : le suivant télécharge pendant que les autres rendent
+        # warm_up : chaque process du pool précharge l'aligneur dès son démarrage
+        initializer = _warm_up_worker if self.warm_up else None
+        with ThreadPoolExecutor(max_workers=self.max_workers + 1) as io_pool, \
+                ProcessPoolExecutor(max_workers=self.max_workers, initializer=initializer) as cpu_pool:
+            if self.warm_up:
+                # le pool ne démarre ses process qu'à la première soumission
+                for _ in range(self.max_workers):
+                    cpu_pool.submit(int)
+            try:
+                while True:
+                    if stop_event is not None and stop_event.is_set():
+                        break
+                    for job_id in self.queue.ids(PENDING):
+                        if len(in_flight) > self.max_workers:
+                            break
+                        self.queue.update(job_id, status=RUNNING)
+                        self._cancel[job_id] = self._manager.Event()
+                        in_flight[job_id] = io_pool.submit(self._run_one, job_id, cpu_pool, events)
+                        self.on_event("started", job_id)
+
+                    self._drain(events, timeout=0.2)
+                    for job_id in [j for j, fut in in_flight.items() if fut.done()]:
+                        in_flight.pop(job_id)
+                        self._cancel.pop(job_id, None)
+
+                    if not in_flight and not self.queue.ids(PENDING):
+                        if not keep_alive:
+                            break
+                        self._wake.wait(0.5)
+                        self._wake.clear()
+            finally:
+                self._stopping = True
+                for cancel_event in self._cancel.values():
+                    cancel_event.set()
+                for fut in in_flight.values():
+                    fut.exception()
+                self._drain(events, timeout=0)
+                self._manager.shutdown()
+
+    def _drain(self, events, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                event = events.get(timeout=max(0.0, deadline - time.monotonic())) if timeout else events.get_nowait()
+            except queue_mod.Empty:
+                return
+            self.on_event(*event)
+            timeout = 0
+
+# ====== MODE HEADLESS ======
+def _seconds(value, default):
+    """Accepte un nombre ou un timecode "MM:SS" / "H:MM:SS" ; None/"" -> default."""
+    if value in (None, ""):
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    total = 0.0
+    for part in str(value).strip().split(":"):
+        total = total * 60 + float(part)
+    return total
+
+def load_manifest(path):
+    """
+    Lit un manifeste JSON (liste de jobs) ou JSONL (un job par ligne).
+    Clés en plus de pipeline.DEFAULT_JOB : "lyrics_file" (au lieu de "lyrics"), "name" (dossier dans songs/).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        entries = json.loads(stripped)
+    else:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for i, entry in enumerate(entries):
+        job = dict(entry)
+        if "lyrics_file" in job:
+            with open(os.path.join(base, job.pop("lyrics_file")), "r", encoding="utf-8") as f:
+                job["lyrics"] = f.read()
+        name = job.pop("name", None) or f"job_{i:03d}"
+        job.setdefault("output_dir", os.path.join(BASE_DIR, "songs", name))
+        job["audio_start"] = max(0.0, _seconds(job.get("audio_start"), 0.0))
+        job["audio_end"] = _seconds(job.get("audio_end"), -1)
+        # id stable : relancer le même manifeste reprend là où il s'était arrêté
+        digest = hashlib.sha1(json.dumps(job, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        jobs.append((f"{i:03d}-{digest}", job))
+    return jobs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rendu headless d'une file de vidéos karaoké.")
+    parser.add_argument("manifest", help="manifeste JSON ou JSONL de jobs")
+    parser.add_argument("--queue", help="fichier de file persistant (défaut : <manifeste>.queue.json)")
+    parser.add_argument("--workers", type=int, default=None, help="jobs CPU en parallèle")
+    args = parser.parse_args(argv)
+
+    rq = RenderQueue(args.queue or args.manifest + ".queue.json")
+    for job_id, job in load_manifest(args.manifest):
+        rq.add(job, job_id)
+
+    def on_event(kind, job_id, *rest):
+        if kind == "progress":
+            message, percent = rest
+            print(f"[{job_id}] {percent:3d}% {message}", flush=True)
+        elif kind == "started":
+            print(f"[{job_id}] démarré", flush=True)
+        elif kind == "finished":
+            success, payload = rest
+            print(f"[{job_id}] {'✅' if success else '❌'} {payload}", flush=True)
+
+    Scheduler(rq, args.workers, on_event, warm_up=True).run()
+    failed = rq.ids(FAILED)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
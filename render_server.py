@@ -0,0 +1,361 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pipeline
+import downloads
+import tracing
+import render_queue
+from render_queue import PENDING, RUNNING, DONE, FAILED, CANCELLED, FINISHED
+
+# ====== SERVICE HTTP ======
+# API JSON locale au-dessus du Scheduler de render_queue (pool de process préchauffé :
+# aligneur et police chargés au démarrage de chaque process, réutilisés d'un job à l'autre).
+#   POST   /jobs              soumet un job (clés de pipeline.DEFAULT_JOB) -> 202 {"id", ...}
+#   GET    /jobs              liste des jobs
+#   GET    /jobs/<id>         statut, progression, sortie, erreur, timings
+#   GET    /jobs/<id>/events  progression en continu (text/event-stream) jusqu'à la fin du job
+#   GET    /jobs/<id>/result  la vidéo finale, ?n=<i> : i-ème rendition (409 tant que le job n'est pas terminé)
+#   DELETE /jobs/<id>         annule le job
+#   GET    /metrics           attente dans la file et durée de traitement (histogrammes sur les
+#                             METRICS_WINDOW derniers jobs), compteurs
+# File pleine (max_queue jobs en attente) : 503 + Retry-After, le client réessaie plus tard.
+# Seuls les KEEP_FINISHED derniers jobs terminés restent consultables (404 ensuite).
+# Chemins : chaque job écrit dans <jobs_root>/<id>/ (output_dir refusé) ; un audio ou un fond local
+# doit être dans un des media_dirs du serveur, sinon seules les URL YouTube sont acceptées.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_QUEUE_PATH = os.path.join(BASE_DIR, "songs", "server_queue.json")
+SERVER_JOBS_ROOT = os.path.join(BASE_DIR, "songs", "server_jobs")
+DEFAULT_MEDIA_DIRS = (os.path.join(BASE_DIR, "songs", "media"),)
+DEFAULT_PORT = 8765
+DEFAULT_MAX_QUEUE = 16
+RETRY_AFTER_SECONDS = 30
+KEEPALIVE_SECONDS = 15
+# histogrammes de /metrics sur les derniers jobs seulement : mémoire bornée pour un service qui tourne longtemps
+METRICS_WINDOW = 1000
+# jobs terminés gardés dans la file (statut, résultat) ; au-delà les plus anciens sont oubliés
+KEEP_FINISHED = 500
+BITRATE = re.compile(r"^\d+(\.\d+)?[kKmM]?$")
+
+class QueueFull(Exception):
+    pass
+
+class RenderService:
+    """Scheduler en arrière-plan et état partagé avec les requêtes (progression, métriques)."""
+
+    def __init__(self, queue_path=SERVER_QUEUE_PATH, max_workers=None, max_queue=DEFAULT_MAX_QUEUE,
+                 jobs_root=SERVER_JOBS_ROOT, media_dirs=DEFAULT_MEDIA_DIRS, keep_finished=KEEP_FINISHED):
+        self.queue = render_queue.RenderQueue(queue_path, keep_finished)
+        self.jobs_root = os.path.realpath(jobs_root)
+        self.media_dirs = [os.path.realpath(d) for d in media_dirs]
+        self.scheduler = render_queue.Scheduler(self.queue, max_workers, self._on_event, warm_up=True)
+        self.max_queue = max_queue
+        # attente = soumission -> prise en charge ; traitement = prise en charge -> fin
+        self.metrics = tracing.Trace("render_server", max_samples=METRICS_WINDOW)
+        self.counters = {"submitted": 0, "rejected": 0, DONE: 0, FAILED: 0, CANCELLED: 0}
+        self._progress = {}
+        self._started = {}
+        self._changed = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.scheduler.run, args=(self._stop, True), daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def submit(self, job):
+        job_id = uuid.uuid4().hex[:12]
+        job["output_dir"] = os.path.join(self.jobs_root, job_id)
+        with self._changed:
+            if len(self.queue.ids(PENDING)) >= self.max_queue:
+                self.counters["rejected"] += 1
+                raise QueueFull()
+            self.counters["submitted"] += 1
+            return self.scheduler.submit(job, job_id)
+
+    def cancel(self, job_id):
+        self.scheduler.cancel(job_id)
+
+    def status(self, job_id):
+        rec = self.queue.get(job_id)
+        if rec is None:
+            return None
+        with self._changed:
+            progress = dict(self._progress.get(job_id, {}))
+        return {
+            "id": rec["id"], "label": rec["label"], "status": rec["status"],
+            "message": progress.get("message"), "percent": progress.get("percent"),
+            "output": rec["output"], "outputs": rec.get("outputs"), "error": rec["error"], "timings": rec["timings"], "report": rec.get("report"),
+        }
+
+    def _on_event(self, kind, job_id, *args):
+        now = time.time()
+        with self._changed:
+            progress = self._progress.setdefault(job_id, {"seq": 0, "message": None, "percent": None})
+            if kind == "started":
+                self._started[job_id] = now
+                rec = self.queue.get(job_id)
+                if rec and rec.get("submitted_at"):
+                    self.metrics.observe("queue_wait", max(0.0, now - rec["submitted_at"]))
+            elif kind == "progress":
+                progress["message"], progress["percent"] = args
+            elif kind == "finished":
+                success, payload = args
+                started = self._started.pop(job_id, None)
+                if started is not None:
+                    self.metrics.observe("processing", now - started)
+                rec = self.queue.get(job_id)
+                status = rec["status"] if rec else (DONE if success else FAILED)
+                if status in self.counters:
+                    self.counters[status] += 1
+                progress["message"] = payload
+                if success:
+                    progress["percent"] = 100
+                # progression des jobs sortis de la file : même rétention que la file
+                for stale in [j for j in self._progress if self.queue.get(j) is None]:
+                    del self._progress[stale]
+            progress["seq"] += 1
+            self._changed.notify_all()
+
+    def wait_event(self, job_id, seq, timeout):
+        """Attend une progression plus récente que seq ; retourne (seq, progression) ou None (délai écoulé)."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._progress.get(job_id, {}).get("seq", 0) > seq, timeout)
+            progress = self._progress.get(job_id)
+            if progress is None or progress["seq"] <= seq:
+                return None
+            return progress["seq"], dict(progress)
+
+    def snapshot(self):
+        report = self.metrics.report()
+        with self._changed:
+            counters = dict(self.counters)
+        return {
+            "queue": {
+                "pending": len(self.queue.ids(PENDING)),
+                "running": len(self.queue.ids(RUNNING)),
+                "max_queue": self.max_queue,
+                "workers": self.scheduler.max_workers,
+            },
+            "jobs": counters,
+            "queue_wait": report["histograms"].get("queue_wait", {"count": 0}),
+            "processing": report["histograms"].get("processing", {"count": 0}),
+        }
+
+def is_within(path, directory):
+    """path (résolu, liens suivis) est-il dans directory (déjà résolu) ?"""
+    path = os.path.realpath(path)
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+def validate_job(data, media_dirs=()):
+    """Job JSON du client -> job ; ValueError si invalide. media_dirs : dossiers résolus autorisés."""
+    if not isinstance(data, dict):
+        raise ValueError("le corps doit être un objet JSON")
+    if "output_dir" in data:
+        raise ValueError("output_dir est choisi par le serveur")
+    unknown = sorted(set(data) - set(pipeline.DEFAULT_JOB))
+    if unknown:
+        raise ValueError(f"clés inconnues : {', '.join(unknown)}")
+    if not data.get("audio") or not str(data.get("lyrics", "")).strip():
+        raise ValueError("'audio' et 'lyrics' sont obligatoires")
+    for key in ("audio", "bg_video"):
+        source = data.get(key)
+        if not source or downloads.is_youtube_url(source):
+            continue
+        if not isinstance(source, str) or not any(is_within(source, d) for d in media_dirs):
+            raise ValueError(f"{key} : URL YouTube ou fichier des dossiers média du serveur attendu")
+    if data.get("video_preset", "1:1") not in pipeline.RENDER_PRESETS:
+        raise ValueError(f"video_preset inconnu (attendu : {', '.join(pipeline.RENDER_PRESETS)})")
+    if data.get("pagination", "timing") not in ("timing", "random"):
+        raise ValueError("pagination : 'timing' ou 'random'")
+    if data.get("renderer", "pil") not in ("pil", "ass"):
+        raise ValueError("renderer : 'pil' ou 'ass'")
+    for rendition in data.get("renditions") or []:
+        if not isinstance(rendition, dict) or rendition.get("video_preset") not in pipeline.RENDER_PRESETS:
+            raise ValueError("chaque rendition doit avoir un video_preset connu")
+        if rendition.get("bitrate") and not BITRATE.match(str(rendition["bitrate"])):
+            raise ValueError(f"débit invalide : {rendition['bitrate']} (ex. 6M, 2500k)")
+    pipeline.check_rendition_tags(data.get("renditions") or [])
+    job = dict(data)
+    for key in ("audio_start", "audio_end"):
+        if key in job:
+            job[key] = render_queue._seconds(job[key], pipeline.DEFAULT_JOB[key])
+    return job
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "KaraokeRender/1.0"
+    JOB_PATH = re.compile(r"^/jobs/([0-9a-zA-Z_-]+)(/events|/result)?/?$")
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[http] {self.address_string()} {format % args}\n")
+
+    def _json(self, code, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, code, message, headers=None):
+        self._json(code, {"error": message}, headers)
+
+    def _route(self):
+        path = self.path.split("?", 1)[0]
+        m = self.JOB_PATH.match(path)
+        if m:
+            return path, m.group(1), m.group(2)
+        return path.rstrip("/") or "/", None, None
+
+    def do_GET(self):
+        path, job_id, sub = self._route()
+        if path == "/metrics":
+            return self._json(200, self.service.snapshot())
+        if path == "/jobs":
+            return self._json(200, [self.service.status(rec["id"]) for rec in list(self.service.queue.records)])
+        if job_id is None:
+            return self._error(404, "introuvable")
+        status = self.service.status(job_id)
+        if status is None:
+            return self._error(404, f"job inconnu : {job_id}")
+        if sub is None:
+            return self._json(200, status)
+        if sub == "/events":
+            return self._stream(job_id)
+        return self._result(status)
+
+    def do_POST(self):
+        path, _, _ = self._route()
+        if path != "/jobs":
+            return self._error(404, "introuvable")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            job = validate_job(json.loads(self.rfile.read(length).decode("utf-8") or "null"),
+                               self.service.media_dirs)
+        except ValueError as e:
+            return self._error(400, str(e))
+        try:
+            job_id = self.service.submit(job)
+        except QueueFull:
+            return self._error(503, "file pleine, réessayer plus tard",
+                               {"Retry-After": str(RETRY_AFTER_SECONDS)})
+        self._json(202, {"id": job_id, "status": f"/jobs/{job_id}", "events": f"/jobs/{job_id}/events",
+                         "result": f"/jobs/{job_id}/result"}, {"Location": f"/jobs/{job_id}"})
+
+    def do_DELETE(self):
+        _, job_id, sub = self._route()
+        if job_id is None or sub is not None:
+            return self._error(404, "introuvable")
+        if self.service.status(job_id) is None:
+            return self._error(404, f"job inconnu : {job_id}")
+        self.service.cancel(job_id)
+        self._json(202, self.service.status(job_id))
+
+    def _stream(self, job_id):
+        """Server-sent events : un événement "progress" par changement, "finished" à la fin."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        seq = -1
+        try:
+            while True:
+                status = self.service.status(job_id)
+                if status is None:  # sorti de la file (rétention)
+                    return
+                if status["status"] in FINISHED:
+                    self._send_event("finished", status)
+                    return
+                if seq < 0:
+                    self._send_event("progress", status)
+                    seq = 0
+                event = self.service.wait_event(job_id, seq, KEEPALIVE_SECONDS)
+                if event is None:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    continue
+                seq, _ = event
+                self._send_event("progress", self.service.status(job_id))
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client parti
+
+    def _send_event(self, name, data):
+        self.wfile.write(f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _result(self, status):
+        if status["status"] != DONE:
+            retry = {"Retry-After": "5"} if status["status"] not in FINISHED else None
+            return self._error(409, f"job {status['status']}", retry)
+        outputs = status["outputs"] or [status["output"]]
+        try:
+            n = int(parse_qs(urlsplit(self.path).query).get("n", ["0"])[0])
+        except ValueError:
+            n = -1
+        if not 0 <= n < len(outputs):
+            return self._error(404, f"rendition inconnue (0 à {len(outputs) - 1})")
+        path = outputs[n]
+        if not path or not is_within(path, self.service.jobs_root):
+            return self._error(403, "sortie hors du dossier des jobs")
+        if not os.path.isfile(path):
+            return self._error(410, "fichier de sortie absent")
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(path)}"')
+        self.end_headers()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile)
+
+def make_server(service, host="127.0.0.1", port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Service HTTP/JSON de rendu de vidéos karaoké.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="jobs CPU en parallèle")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE, help="jobs en attente avant refus (503)")
+    parser.add_argument("--queue", default=SERVER_QUEUE_PATH, help="fichier de file persistant")
+    parser.add_argument("--jobs-root", default=SERVER_JOBS_ROOT, help="dossier des sorties (un sous-dossier par job)")
+    parser.add_argument("--media-dir", action="append", default=None,
+                        help="dossier d'où les jobs peuvent lire audio/fond locaux (répétable)")
+    args = parser.parse_args(argv)
+
+    service = RenderService(args.queue, args.workers, args.max_queue, args.jobs_root,
+                            args.media_dir or DEFAULT_MEDIA_DIRS)
+    service.start()
+    server = make_server(service, args.host, args.port)
+    print(f"Service de rendu sur http://{args.host}:{args.port} ({service.scheduler.max_workers} workers)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
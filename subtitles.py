@@ -0,0 +1,130 @@
+import numpy as np
+
+from generate_vid import (FONT_NAME, VIDEO_SIZE, TEXT_COLOR, SHADOW_COLOR, HIGHLIGHT_COLOR, LAST_WORD_HOLD,
+                          load_font, page_geometry, text_scale, word_lines)
+
+# ========== SUBTITLE EXPORT ==========
+# The same pages as the PIL renderer, as text: an ASS script (libass draws it inside ffmpeg's
+# subtitles filter, see chroma_video.burn_subtitles) and a WebVTT file. Every word is its own ASS
+# event, placed at its layout position, from its start to the end of its page; with highlight, the
+# whole page shows at once and a \kf sweep crosses each word during [start, end).
+# Emoji are PNGs drawn by PIL: lyrics with emoji keep the PIL path (has_emoji).
+
+def has_emoji(word_positions):
+    return any(p[5] for p in word_positions)
+
+def page_intervals(word_positions, text_lines, pages, duration=None):
+    """
+    [(start, end, start_line, end_line, word indices)] in page order: a page is shown from its first
+    word until the next page's first word; the last one until `duration` (or its last word + hold).
+    """
+    line_first_word = np.concatenate([[0], np.cumsum([len(line) for line in text_lines])]).astype(int)
+    shown = []
+    for start_line, end_line in pages.values():
+        lo, hi = line_first_word[start_line], line_first_word[min(end_line, len(text_lines))]
+        hi = min(hi, len(word_positions))
+        if lo < hi:
+            shown.append((start_line, end_line, list(range(lo, hi))))
+    intervals = []
+    for n, (start_line, end_line, indices) in enumerate(shown):
+        start = word_positions[indices[0]][0]
+        if n + 1 < len(shown):
+            end = word_positions[shown[n + 1][2][0]][0]
+        else:
+            end = duration if duration is not None else word_positions[indices[-1]][1] + LAST_WORD_HOLD
+        intervals.append((start, max(start, end), start_line, end_line, indices))
+    return intervals
+
+def ass_color(rgb, alpha=0):
+    r, g, b = rgb
+    return f"&H{alpha:02X}{b:02X}{g:02X}{r:02X}"
+
+def ass_time(t):
+    cs = max(0, int(round(t * 100)))
+    return f"{cs // 360000}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+def vtt_time(t):
+    ms = max(0, int(round(t * 1000)))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+def _ass_text(word):
+    # braces open override blocks, a backslash starts a tag
+    return word.replace("\\", "\\\\").replace("{", "(").replace("}", ")")
+
+def write_ass(path, word_positions, text_lines, pages, font_gui=FONT_NAME, video_size=VIDEO_SIZE, shadow=7,
+              highlight=False, highlight_color=HIGHLIGHT_COLOR, duration=None):
+    """ASS script of the layout, at video_size (PlayRes), using the font file's family name."""
+    font = load_font(font_gui, video_size)
+    family, style = font.getname()
+    # libass sizes a font by its ascent + descent, PIL by its em: keep PIL's line box
+    ascent, descent = font.getmetrics()
+    shadow_px = round(shadow * text_scale(video_size))
+    # plain: words appear in TEXT_COLOR; highlight: \kf fills from Secondary (text) to Primary (highlight)
+    primary = highlight_color if highlight else TEXT_COLOR
+    width, height = video_size
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 2",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, "
+        "Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, "
+        "MarginL, MarginR, MarginV, Encoding",
+        f"Style: Lyrics,{family},{ascent + descent},{ass_color(primary)},{ass_color(TEXT_COLOR)},"
+        f"{ass_color(SHADOW_COLOR)},{ass_color(SHADOW_COLOR)},{-1 if 'Bold' in style else 0},"
+        f"{-1 if 'Italic' in style else 0},0,0,100,100,0,0,1,0,{shadow_px},7,0,0,0,1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    word_to_line = word_lines(text_lines)
+    for page_start, page_end, start_line, end_line, indices in page_intervals(word_positions, text_lines, pages,
+                                                                               duration):
+        y_start, line_height = page_geometry(font, start_line, end_line, video_size)
+        for i in indices:
+            start, end, word, x, _, _ = word_positions[i]
+            y = y_start + (word_to_line[i] - start_line) * line_height
+            # PIL only offsets the shadow to the right
+            tags = f"\\pos({x},{y})\\xshad{shadow_px}\\yshad0"
+            if highlight:
+                delay = max(0, int(round((start - page_start) * 100)))
+                sweep = max(1, int(round((end - start) * 100)))
+                text, event_start = f"{{{tags}\\k{delay}}}{{\\kf{sweep}}}{_ass_text(word)}", page_start
+            else:
+                text, event_start = f"{{{tags}}}{_ass_text(word)}", start
+            lines.append(f"Dialogue: 0,{ass_time(event_start)},{ass_time(page_end)},Lyrics,,0,0,0,,{text}")
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+def write_vtt(path, word_positions, text_lines, pages, duration=None):
+    """WebVTT: one cue per page, words after the first carry karaoke timestamp tags."""
+    word_to_line = word_lines(text_lines)
+    cues = ["WEBVTT", ""]
+    for n, (page_start, page_end, start_line, _, indices) in enumerate(
+            page_intervals(word_positions, text_lines, pages, duration)):
+        rows = {}
+        for i in indices:
+            start, _, word, _, _, _ = word_positions[i]
+            word = word.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+            tag = f"<{vtt_time(start)}>" if start > page_start else ""
+            rows.setdefault(word_to_line[i], []).append(tag + word)
+        cues += [str(n + 1), f"{vtt_time(page_start)} --> {vtt_time(page_end)}",
+                 *(" ".join(rows[li]) for li in sorted(rows)), ""]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(cues))
+    return path
+
+def write_subtitles(base_path, word_positions, text_lines, pages, font_gui=FONT_NAME, video_size=VIDEO_SIZE,
+                    shadow=7, highlight=False, highlight_color=HIGHLIGHT_COLOR, duration=None):
+    """<base_path>.ass and <base_path>.vtt; returns both paths."""
+    ass_path = write_ass(base_path + ".ass", word_positions, text_lines, pages, font_gui, video_size, shadow,
+                         highlight, highlight_color, duration)
+    vtt_path = write_vtt(base_path + ".vtt", word_positions, text_lines, pages, duration)
+    return [ass_path, vtt_path]
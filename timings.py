@@ -0,0 +1,76 @@
+import os
+import struct
+import numpy as np
+
+# ========== BINARY TIMING SIDECAR (.lrt) ==========
+# Layout (little endian):
+#   header   : magic "LYRT", uint32 version, uint64 count, uint64 blob_len
+#   starts   : int64[count]    word start, microseconds
+#   ends     : int64[count]    word end, microseconds
+#   offsets  : uint64[count+1] byte offsets of each word in the blob
+#   blob     : UTF-8 text of all words, concatenated
+# Every section is 8-byte aligned, so the file can be memory-mapped directly with numpy.
+MAGIC = b"LYRT"
+VERSION = 1
+_HEADER = struct.Struct("<4sIQQ")
+SIDECAR_EXT = ".lrt"
+
+def timings_path(lrc_path):
+    return os.path.splitext(lrc_path)[0] + SIDECAR_EXT
+
+def write_timings(path, starts, ends, words):
+    """Write start/end times (seconds) and the matching words to a .lrt sidecar."""
+    starts_us = np.round(np.asarray(starts, dtype=np.float64) * 1e6).astype("<i8")
+    ends_us = np.round(np.asarray(ends, dtype=np.float64) * 1e6).astype("<i8")
+    encoded = [w.encode("utf-8") for w in words]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = b"".join(encoded)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(encoded), len(blob)))
+        f.write(starts_us.tobytes())
+        f.write(ends_us.tobytes())
+        f.write(offsets.tobytes())
+        f.write(blob)
+    os.replace(tmp_path, path)
+
+class Timings:
+    """Memory-mapped view of a .lrt sidecar."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic, version, count, blob_len = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a v{VERSION} timing sidecar: {path}")
+        pos = _HEADER.size
+        self.starts_us = np.memmap(path, dtype="<i8", mode="r", offset=pos, shape=(count,)) if count else np.zeros(0, "<i8")
+        pos += 8 * count
+        self.ends_us = np.memmap(path, dtype="<i8", mode="r", offset=pos, shape=(count,)) if count else np.zeros(0, "<i8")
+        pos += 8 * count
+        self.offsets = np.memmap(path, dtype="<u8", mode="r", offset=pos, shape=(count + 1,))
+        pos += 8 * (count + 1)
+        self.blob = np.memmap(path, dtype=np.uint8, mode="r", offset=pos, shape=(blob_len,)) if blob_len else b""
+
+    def __len__(self):
+        return len(self.starts_us)
+
+    @property
+    def starts(self):
+        return self.starts_us / 1e6
+
+    @property
+    def ends(self):
+        return self.ends_us / 1e6
+
+    def word(self, i):
+        return bytes(self.blob[int(self.offsets[i]):int(self.offsets[i + 1])]).decode("utf-8")
+
+    def words(self):
+        text = bytes(self.blob)
+        offsets = self.offsets.tolist()
+        return [text[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(self))]
+
+def read_timings(path):
+    return Timings(path)
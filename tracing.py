@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# ====== TRACES DE JOB ======
+# Une Trace regroupe les spans (durée mur + CPU du process), les histogrammes par image
+# (dessin, encodage) et le CPU des sous-process (ffmpeg). Elle se sérialise en dict pour passer
+# du thread de préparation au process de rendu, et finit en rapport JSON à côté de la sortie.
+# Le code instrumenté appelle tracing.current() : sans trace active, tout est no-op.
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+PROFILERS = ("cprofile", "pyinstrument")
+
+try:
+    import resource
+except ImportError:  # Windows : pas de CPU des sous-process
+    resource = None
+
+def _children_cpu():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class Trace:
+    """max_samples : fenêtre glissante par histogramme (process de longue durée), None = tout garder."""
+
+    def __init__(self, name="", data=None, max_samples=None):
+        data = data or {}
+        self.name = data.get("name", name)
+        self.started_at = data.get("started_at", time.time())
+        self.spans = list(data.get("spans", []))
+        self.max_samples = max_samples
+        self.samples = {k: self._new_samples(v) for k, v in data.get("samples", {}).items()}
+        self.subprocesses = list(data.get("subprocesses", []))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "spans": self.spans,
+            "samples": {k: list(v) for k, v in self.samples.items()},
+            "subprocesses": self.subprocesses,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data=data)
+
+    def _new_samples(self, values=()):
+        return deque(values, maxlen=self.max_samples) if self.max_samples else list(values)
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Durée mur et CPU (process entier, tous threads) d'un bloc ; les spans s'imbriquent par thread."""
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        start = time.time()
+        t0 = time.perf_counter()
+        cpu0 = time.process_time()
+        try:
+            yield
+        finally:
+            stack.pop()
+            record = {
+                "name": name,
+                "parent": parent,
+                "start": round(start - self.started_at, 6),
+                "wall": round(time.perf_counter() - t0, 6),
+                "cpu": round(time.process_time() - cpu0, 6),
+                "pid": os.getpid(),
+            }
+            if attrs:
+                record["attrs"] = attrs
+            with self._lock:
+                self.spans.append(record)
+
+    def add_span(self, name, wall, **attrs):
+        """Span mesuré ailleurs (ex. attente dans la file)."""
+        with self._lock:
+            self.spans.append({"name": name, "parent": None, "start": None, "wall": round(wall, 6),
+                               "cpu": None, "pid": os.getpid(), **({"attrs": attrs} if attrs else {})})
+
+    def observe(self, name, seconds):
+        """Un échantillon d'histogramme (ex. temps de dessin d'une image)."""
+        samples = self.samples.get(name)
+        if samples is None:
+            with self._lock:
+                samples = self.samples.setdefault(name, self._new_samples())
+        samples.append(seconds)
+
+    @contextmanager
+    def subprocess(self, name, cmd=None):
+        """
+        CPU (user+sys) des sous-process terminés pendant le bloc (RUSAGE_CHILDREN).
+        Approximatif si d'autres threads du même process lancent des sous-process en même temps.
+        """
+        cpu0 = _children_cpu()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            cpu1 = _children_cpu()
+            record = {
+                "name": name,
+                "wall": round(time.perf_counter() - t0, 6),
+                "cpu": round(cpu1 - cpu0, 6) if cpu0 is not None else None,
+            }
+            if cmd:
+                record["cmd"] = os.path.basename(str(cmd[0]))
+            with self._lock:
+                self.subprocesses.append(record)
+
+    def report(self):
+        """Rapport JSON : spans, histogrammes résumés, CPU des sous-process."""
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "wall": round(time.time() - self.started_at, 6),
+            "spans": self.spans,
+            "histograms": {name: summarize(values) for name, values in self.samples.items()},
+            "subprocesses": self.subprocesses,
+            "subprocess_cpu": round(sum(p["cpu"] or 0.0 for p in self.subprocesses), 6),
+        }
+
+    def write(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+def summarize(values):
+    """count/total/moyenne/percentiles (ms) et répartition par seuils HISTOGRAM_BUCKETS_MS."""
+    if not values:
+        return {"count": 0}
+    ms = sorted(v * 1000.0 for v in values)
+    n = len(ms)
+
+    def pct(p):
+        return round(ms[min(n - 1, int(p * n))], 3)
+
+    buckets = {}
+    i = 0
+    for bound in HISTOGRAM_BUCKETS_MS:
+        count = 0
+        while i < n and ms[i] <= bound:
+            count += 1
+            i += 1
+        buckets[f"<={bound}ms"] = count
+    buckets[f">{HISTOGRAM_BUCKETS_MS[-1]}ms"] = n - i
+    return {
+        "count": n,
+        "total_ms": round(sum(ms), 3),
+        "mean_ms": round(sum(ms) / n, 3),
+        "p50_ms": pct(0.50),
+        "p90_ms": pct(0.90),
+        "p99_ms": pct(0.99),
+        "max_ms": round(ms[-1], 3),
+        "buckets": buckets,
+    }
+
+class _NullTrace:
+    """Trace inactive : mêmes méthodes, ne mesure rien."""
+
+    @contextmanager
+    def span(self, name, **attrs):
+        yield
+
+    def add_span(self, name, wall, **attrs):
+        pass
+
+    def observe(self, name, seconds):
+        pass
+
+    @contextmanager
+    def subprocess(self, name, cmd=None):
+        yield
+
+NULL_TRACE = _NullTrace()
+_active = threading.local()
+
+def current():
+    """Trace active dans ce thread (NULL_TRACE sinon)."""
+    return getattr(_active, "trace", None) or NULL_TRACE
+
+@contextmanager
+def activate(trace):
+    previous = getattr(_active, "trace", None)
+    _active.trace = trace
+    try:
+        yield trace
+    finally:
+        _active.trace = previous
+
+@contextmanager
+def profiled(kind, path_base):
+    """
+    Profileur optionnel autour d'un bloc : "cprofile" -> <path_base>.prof (pstats/snakeviz),
+    "pyinstrument" -> <path_base>.profile.html. kind None : rien.
+    """
+    if not kind:
+        yield None
+        return
+    if kind not in PROFILERS:
+        raise ValueError(f"profileur inconnu : {kind} (attendu : {', '.join(PROFILERS)})")
+    if kind == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield path_base + ".prof"
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path_base + ".prof")
+    else:
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield path_base + ".profile.html"
+        finally:
+            profiler.stop()
+            with open(path_base + ".profile.html", "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())